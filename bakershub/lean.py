@@ -0,0 +1,149 @@
+"""Lean read-only serialization for hot list endpoints.
+
+A LeanSerializer is compiled once per class from a regular ModelSerializer:
+every readable field becomes a column read with values_list() and a
+converter picked for its field type (most are a no-op on database values).
+Rows are then turned into dicts without model instances, attribute lookups
+or per-field to_representation() calls. The output matches
+serializer_class(many=True).data key for key and type for type, so it
+renders to the same bytes (the contract tests check this).
+
+Supported fields are plain model fields, primary key relations and dotted
+sources through foreign keys (ex `ingredient.name`, left out of the row when
+the relation is null, as DRF does). Anything else, nested serializers and
+SerializerMethodFields included, is listed in `computed_fields` and filled
+by a `get_<name>(row)` method of the subclass, or mapped to a column with
+`sources`.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations
+from rest_framework.fields import empty
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+ISO_8601 = "iso-8601"
+
+# fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (fields.IntegerField, fields.CharField, fields.ReadOnlyField, relations.PrimaryKeyRelatedField)
+
+def _converter(field):
+    """Function turning a non-null database value into what field.to_representation returns, None for no-op."""
+    if type(field) in PASSTHROUGH_FIELDS and getattr(field, "pk_field", None) is None:
+        return None
+    if type(field) is fields.FloatField:
+        return float
+    if type(field) is fields.DecimalField:
+        # the database returns values quantized to the model field's decimal places already
+        if getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING) and not field.localize \
+                and not field.normalize_output:
+            return "{:f}".format
+    if type(field) is fields.DateField and getattr(field, "format", api_settings.DATE_FORMAT) == ISO_8601:
+        return lambda value: value.isoformat() if value else None
+    return field.to_representation
+
+
+class LeanSerializer:
+    serializer_class = None
+    # fields a subclass fills with get_<name>(row)
+    computed_fields = ()
+    # field name -> dotted source, for method fields that are only a column lookup
+    sources = {}
+    # more columns to read, ex for grouping rows or computed fields
+    extra_columns = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.columns, self.plan = self.compiled()
+        self.index = {column: position for position, column in enumerate(self.columns)}
+
+    @classmethod
+    def compiled(cls):
+        if "_compiled" not in cls.__dict__:
+            cls._compiled = cls.compile(cls.serializer_class())
+        return cls._compiled
+
+    @classmethod
+    def compile(cls, serializer):
+        """(columns, plan) for a serializer, plan entries are (name, column, converter, relation column)."""
+        columns, plan = [], []
+
+        def column(path):
+            if path not in columns:
+                columns.append(path)
+            return columns.index(path)
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in cls.computed_fields:
+                plan.append((name, None, getattr(cls, f"get_{name}"), None))
+                continue
+            source = cls.sources.get(name, field.source)
+            unsupported = (fields.SerializerMethodField, relations.ManyRelatedField, BaseSerializer)
+            if (isinstance(field, unsupported) and name not in cls.sources) or source == "*":
+                raise ImproperlyConfigured(f"{cls.__name__} can't compile '{name}', list it in computed_fields.")
+
+            attrs = source.split(".")
+            relation = None
+            if len(attrs) > 1 and name not in cls.sources and not field.allow_null:
+                if field.default is not empty or field.required:
+                    raise ImproperlyConfigured(f"{cls.__name__} can't compile '{name}', list it in computed_fields.")
+                # DRF leaves the key out when a relation on the way is null
+                relation = column(attrs[0])
+            converter = None if name in cls.sources else _converter(field)
+            plan.append((name, column("__".join(attrs)), converter, relation))
+
+        for path in cls.extra_columns:
+            column(path)
+        return columns, plan
+
+    def to_representation(self, row):
+        data = {}
+        for name, position, convert, relation in self.plan:
+            if position is None:
+                data[name] = convert(self, row)
+                continue
+            value = row[position]
+            if value is None:
+                if relation is not None and row[relation] is None:
+                    continue
+                data[name] = None
+            else:
+                data[name] = value if convert is None else convert(value)
+        return data
+
+    def prepare(self, rows):
+        """Hook run on every batch of rows before they are converted, ex to load related rows in bulk."""
+
+    def iterate(self, queryset, chunk_size=2000):
+        """Converted rows of queryset, read chunk_size rows at a time."""
+        chunk = []
+        for row in queryset.values_list(*self.columns).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield from self.convert(chunk)
+                chunk = []
+        if chunk:
+            yield from self.convert(chunk)
+
+    def convert(self, rows):
+        self.prepare(rows)
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+    def many(self, queryset):
+        return self.convert(list(queryset.values_list(*self.columns)))
+
+
+class LeanListMixin:
+    """List views answering with lean_serializer_class instead of the view's serializer."""
+    lean_serializer_class = None
+
+    def get_lean_serializer(self):
+        return self.lean_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if self.lean_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return Response(self.get_lean_serializer().many(self.filter_queryset(self.get_queryset())))
@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import replica_reads, replicas_allowed, reset_replica_reads
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinningMiddleware:
+    """Let safe requests read from the replicas, unless the client wrote something moments ago.
+
+    A client is recognised by its Authorization header (or session cookie). After
+    any request of theirs writes, their requests stay on the primary for
+    REPLICA_PIN_SECONDS. The pins live in the default cache, which must be shared
+    by all workers (Redis, Memcached) when the API runs in several processes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = self.client_key(request)
+        safe = request.method in SAFE_METHODS
+        allowed = safe and not (key and cache.get(key))
+        token = replica_reads(allowed)
+        try:
+            response = self.get_response(request)
+            # the router drops replica reads as soon as the request writes
+            wrote = not safe or (allowed and not replicas_allowed())
+        finally:
+            reset_replica_reads(token)
+
+        if wrote and key:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        elif allowed and not wrote and response.streaming:
+            response.streaming_content = self.stream_from_replica(response.streaming_content)
+        return response
+
+    def client_key(self, request):
+        client = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not client:
+            return None
+        return "replica-pin:" + hashlib.sha256(client.encode()).hexdigest()
+
+    # streamed lists read their rows after the view returned
+    def stream_from_replica(self, content):
+        replica_reads(True)
+        try:
+            yield from content
+        finally:
+            replica_reads(False)
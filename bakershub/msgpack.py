@@ -0,0 +1,246 @@
+"""Self-contained MessagePack encoder / decoder (https://msgpack.org/).
+
+Only the types API responses use are supported. Values JSON has no native
+type for are encoded exactly like the JSON renderer does, so a client gets the
+same structure from either format:
+
+* Decimal -> string, ex "4.99" (never a float, so no precision is lost)
+* date / datetime / time -> ISO 8601 string, ex "2025-12-31"
+* other types (UUID, lazy strings, ...) -> as rest_framework's JSONEncoder
+
+Floats are always written as float 64. Extension types are not supported.
+"""
+import struct
+from decimal import Decimal
+
+from rest_framework.utils.encoders import JSONEncoder
+
+_json_default = JSONEncoder().default
+
+_pack_float64 = struct.Struct(">Bd").pack
+_unpack_float32 = struct.Struct(">f").unpack_from
+_unpack_float64 = struct.Struct(">d").unpack_from
+
+
+class MessagePackError(ValueError):
+    pass
+
+
+def pack(obj):
+    """Encode obj as MessagePack bytes."""
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _pack_int(value, out):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -0x20 <= value < 0:
+        out.append(value & 0xff)
+    elif value >= 0:
+        if value <= 0xff:
+            out += b"\xcc" + value.to_bytes(1, "big")
+        elif value <= 0xffff:
+            out += b"\xcd" + value.to_bytes(2, "big")
+        elif value <= 0xffffffff:
+            out += b"\xce" + value.to_bytes(4, "big")
+        elif value <= 0xffffffffffffffff:
+            out += b"\xcf" + value.to_bytes(8, "big")
+        else:
+            raise MessagePackError("Integer too large for MessagePack.")
+    else:
+        if value >= -0x80:
+            out += b"\xd0" + value.to_bytes(1, "big", signed=True)
+        elif value >= -0x8000:
+            out += b"\xd1" + value.to_bytes(2, "big", signed=True)
+        elif value >= -0x80000000:
+            out += b"\xd2" + value.to_bytes(4, "big", signed=True)
+        elif value >= -0x8000000000000000:
+            out += b"\xd3" + value.to_bytes(8, "big", signed=True)
+        else:
+            raise MessagePackError("Integer too small for MessagePack.")
+
+
+def _pack_header(length, fix, fix_max, markers, out):
+    # markers are the 8, 16 and 32 bit length variants (None when the type has no 8 bit form)
+    if length <= fix_max:
+        out.append(fix | length)
+    elif markers[0] is not None and length <= 0xff:
+        out.append(markers[0])
+        out.append(length)
+    elif length <= 0xffff:
+        out.append(markers[1])
+        out += length.to_bytes(2, "big")
+    elif length <= 0xffffffff:
+        out.append(markers[2])
+        out += length.to_bytes(4, "big")
+    else:
+        raise MessagePackError("Value too long for MessagePack.")
+
+
+def _pack_str(obj, out):
+    data = obj.encode("utf-8")
+    length = len(data)
+    # short strings (most keys and values) skip the generic header logic
+    if length <= 31:
+        out.append(0xa0 | length)
+    else:
+        _pack_header(length, 0xa0, 31, (0xd9, 0xda, 0xdb), out)
+    out += data
+
+
+def _pack_list(obj, out):
+    _pack_header(len(obj), 0x90, 15, (None, 0xdc, 0xdd), out)
+    for item in obj:
+        _pack(item, out)
+
+
+def _pack_dict(obj, out):
+    _pack_header(len(obj), 0x80, 15, (None, 0xde, 0xdf), out)
+    for key, value in obj.items():
+        _pack(key, out)
+        _pack(value, out)
+
+
+def _pack_float(obj, out):
+    out += _pack_float64(0xcb, obj)
+
+
+def _pack_none(obj, out):
+    out.append(0xc0)
+
+
+def _pack_bool(obj, out):
+    out.append(0xc3 if obj else 0xc2)
+
+
+def _pack_bytes(obj, out):
+    data = bytes(obj)
+    length = len(data)
+    if length <= 0xff:
+        out.append(0xc4)
+        out.append(length)
+    elif length <= 0xffff:
+        out.append(0xc5)
+        out += length.to_bytes(2, "big")
+    else:
+        out.append(0xc6)
+        out += length.to_bytes(4, "big")
+    out += data
+
+
+def _pack_decimal(obj, out):
+    _pack_str(str(obj), out)
+
+
+# exact type lookup first; subclasses (OrderedDict, ReturnList, ...) fall back to isinstance checks
+_packers = {
+    str: _pack_str, int: _pack_int, dict: _pack_dict, list: _pack_list, tuple: _pack_list,
+    float: _pack_float, type(None): _pack_none, bool: _pack_bool, Decimal: _pack_decimal,
+    bytes: _pack_bytes, bytearray: _pack_bytes, memoryview: _pack_bytes,
+}
+
+
+def _pack(obj, out):
+    packer = _packers.get(type(obj))
+    if packer is not None:
+        packer(obj, out)
+        return
+    for base, packer in _packers.items():
+        if isinstance(obj, base):
+            packer(obj, out)
+            return
+    _pack(_json_default(obj), out)
+
+
+def unpack(data):
+    """Decode a single MessagePack value from bytes."""
+    data = bytes(data)
+    try:
+        value, position = _unpack(data, 0)
+    except (IndexError, struct.error):
+        raise MessagePackError("Truncated MessagePack data.")
+    except UnicodeDecodeError:
+        raise MessagePackError("Invalid UTF-8 string in MessagePack data.")
+    except RecursionError:
+        raise MessagePackError("MessagePack data is nested too deeply.")
+    if position != len(data):
+        raise MessagePackError("Extra data after MessagePack value.")
+    return value
+
+
+def _unpack_array(data, position, length):
+    items = []
+    for _ in range(length):
+        item, position = _unpack(data, position)
+        items.append(item)
+    return items, position
+
+
+def _unpack_map(data, position, length):
+    result = {}
+    for _ in range(length):
+        key, position = _unpack(data, position)
+        value, position = _unpack(data, position)
+        try:
+            result[key] = value
+        except TypeError:
+            raise MessagePackError("Unsupported map key in MessagePack data.")
+    return result, position
+
+
+def _read(data, position, length):
+    end = position + length
+    if end > len(data):
+        raise IndexError
+    return data[position:end], end
+
+
+def _unpack(data, position):
+    marker = data[position]
+    position += 1
+
+    if marker <= 0x7f:
+        return marker, position
+    if marker >= 0xe0:
+        return marker - 0x100, position
+    if 0xa0 <= marker <= 0xbf:
+        end = position + (marker & 0x1f)
+        if end > len(data):
+            raise IndexError
+        return data[position:end].decode("utf-8"), end
+    if 0x90 <= marker <= 0x9f:
+        return _unpack_array(data, position, marker & 0x0f)
+    if 0x80 <= marker <= 0x8f:
+        return _unpack_map(data, position, marker & 0x0f)
+
+    if marker == 0xc0:
+        return None, position
+    if marker == 0xc2:
+        return False, position
+    if marker == 0xc3:
+        return True, position
+    if marker in (0xcc, 0xcd, 0xce, 0xcf):
+        raw, position = _read(data, position, 1 << (marker - 0xcc))
+        return int.from_bytes(raw, "big"), position
+    if marker in (0xd0, 0xd1, 0xd2, 0xd3):
+        raw, position = _read(data, position, 1 << (marker - 0xd0))
+        return int.from_bytes(raw, "big", signed=True), position
+    if marker == 0xca:
+        return _unpack_float32(data, position)[0], position + 4
+    if marker == 0xcb:
+        return _unpack_float64(data, position)[0], position + 8
+    if marker in (0xd9, 0xda, 0xdb, 0xc4, 0xc5, 0xc6):
+        size = 1 << ((marker - 0xd9) if marker >= 0xd9 else (marker - 0xc4))
+        raw, position = _read(data, position, size)
+        raw, position = _read(data, position, int.from_bytes(raw, "big"))
+        return (raw.decode("utf-8") if marker >= 0xd9 else raw), position
+    if marker in (0xdc, 0xdd):
+        raw, position = _read(data, position, 2 if marker == 0xdc else 4)
+        return _unpack_array(data, position, int.from_bytes(raw, "big"))
+    if marker in (0xde, 0xdf):
+        raw, position = _read(data, position, 2 if marker == 0xde else 4)
+        return _unpack_map(data, position, int.from_bytes(raw, "big"))
+
+    raise MessagePackError(f"Unsupported MessagePack type 0x{marker:02x}.")
@@ -0,0 +1,15 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .msgpack import MessagePackError, unpack
+
+
+class MessagePackParser(BaseParser):
+    """Parses request bodies sent as `Content-Type: application/msgpack`."""
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpack(stream.read())
+        except MessagePackError as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
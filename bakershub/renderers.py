@@ -0,0 +1,19 @@
+from rest_framework.renderers import BaseRenderer
+
+from .msgpack import pack
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack for clients sending `Accept: application/msgpack`.
+
+    Decimals are sent as strings and dates as ISO 8601 strings, as in JSON.
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return pack(data)
@@ -0,0 +1,68 @@
+"""Read replica routing.
+
+Reads made while serving a safe request (GET, HEAD, OPTIONS) go to one of the
+aliases in settings.DATABASE_REPLICAS. Everything else goes to the primary
+("default"): writes, reads inside a transaction, reads from management
+commands and the job worker, and every read once the request has written
+something. ReplicaPinningMiddleware also keeps a client on the primary for
+REPLICA_PIN_SECONDS after a write, so a bake is followed by fresh stock
+levels even while the replicas catch up.
+
+With no replicas configured the router routes nothing and Django behaves as
+if it wasn't installed.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+
+# auth tokens, memberships and queued jobs are read right after they are written
+# by another request (login, invite, queue then poll), they stay on the primary
+PRIMARY_ONLY_APPS = {"authtoken", "users", "jobs"}
+
+# True while a request may read from a replica, outside requests nothing is routed
+_use_replica = ContextVar("use_replica", default=False)
+
+def replica_reads(allowed):
+    """Allow (or stop) replica reads for the current request, returns a token for reset_replica_reads."""
+    return _use_replica.set(allowed)
+
+def reset_replica_reads(token):
+    _use_replica.reset(token)
+
+def pin_to_primary():
+    """Send the rest of the current request's reads to the primary."""
+    _use_replica.set(False)
+
+def replicas_allowed():
+    return _use_replica.get()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not _use_replica.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        # reads in a transaction must see its own writes and hold its locks
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # read your own writes for the rest of the request
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        pool = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from the primary
+        return db not in settings.DATABASE_REPLICAS
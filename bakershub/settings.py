@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,9 @@ INSTALLED_APPS = [
     "corsheaders",
     "users",
     "inventory",
-    "recipes"
+    "recipes",
+    "jobs",
+    "outbox",
 ]
 
 REST_FRAMEWORK = {
@@ -51,12 +54,25 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # JSON stays the default; POS terminals ask for MessagePack with Accept / Content-Type
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'bakershub.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'bakershub.parsers.MessagePackParser',
+    ],
 }
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "bakershub.middleware.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -95,6 +111,40 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASES that safe requests read from (see bakershub/routers.py).
+# Each replica is a read-only copy of "default", ex for Postgres
+#   DATABASES["replica"] = {"ENGINE": "django.db.backends.postgresql", "HOST": "replica-host", ...,
+#                           "TEST": {"MIRROR": "default"}}
+# Locally, BAKERSHUB_REPLICA_DB=db-replica.sqlite3 reads from a copy of db.sqlite3 (copy it to "replicate").
+DATABASE_REPLICAS = []
+if os.environ.get("BAKERSHUB_REPLICA_DB"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.environ["BAKERSHUB_REPLICA_DB"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS = ["replica"]
+
+DATABASE_ROUTERS = ["bakershub.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 5 # a client reads from the primary for this long after it wrote something
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # serialized recipe details, least recently used entries are evicted first
+    "recipes": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recipe-detail",
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 10},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,4 +182,31 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # cors permissions
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# background job queue
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 5 # seconds before the first retry, doubled after every failed attempt
+JOBS_RETRY_BACKOFF_MAX = 300
+JOBS_LOCK_TIMEOUT = 600 # requeue running jobs whose worker went silent for this many seconds
+JOBS_HEARTBEAT_INTERVAL = 60 # seconds between refreshes of a running job's lock, well under JOBS_LOCK_TIMEOUT
+
+# event outbox, delivered to the ordering system by `manage.py dispatch_events`
+OUTBOX_URL = os.environ.get("BAKERSHUB_OUTBOX_URL", "") # receiver of the POSTed event batches
+OUTBOX_SECRET = os.environ.get("BAKERSHUB_OUTBOX_SECRET", "") # signs the batches when set
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_TIMEOUT = 10 # seconds to wait for the receiver
+OUTBOX_MAX_ATTEMPTS = 12
+OUTBOX_RETRY_BACKOFF = 5 # seconds before the first retry, doubled after every failed attempt
+OUTBOX_RETRY_BACKOFF_MAX = 3600
+
+# login throttling and password hashing pool
+LOGIN_HASH_WORKERS = 4 # password hashes computed at once
+LOGIN_HASH_BACKLOG = 32 # logins allowed to wait for a hashing thread before answering 503
+LOGIN_HASH_TIMEOUT = 10 # seconds
+LOGIN_FAILURE_LIMIT = 5 # failed logins per username within the window before answering 429
+LOGIN_IP_FAILURE_LIMIT = 20 # failed logins per client IP within the window, staff may share one
+LOGIN_FAILURE_WINDOW = 300 # seconds
+
+# warm a worker up before it takes traffic (see bakershub/warmup.py), on in the API-only profile
+WARM_UP = False
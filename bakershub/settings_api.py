@@ -0,0 +1,43 @@
+"""API-only settings for autoscaled workers.
+
+Same as bakershub.settings without the parts a token-authenticated JSON API
+never uses: the admin, sessions, messages, static files and the browsable API
+(with its templates), and the middleware that came with them. Workers start
+faster and answer their first request sooner (python -m benchmarks.startup).
+Migrations and the admin keep using bakershub.settings, the database is the same.
+
+    DJANGO_SETTINGS_MODULE=bakershub.settings_api gunicorn bakershub.wsgi
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+API_UNUSED_APPS = {
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_UNUSED_APPS]
+
+# DRF authenticates every request itself and API views are exempt from CSRF
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+)]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": [renderer for renderer in REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]
+                                 if renderer != "rest_framework.renderers.BrowsableAPIRenderer"],
+}
+TEMPLATES = []
+# nothing reads sessions, the test client's logout() still looks for a store without tables
+SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
+# keep the connections opened by the warm-up instead of reconnecting on every request
+DATABASES = {alias: {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True, **database} for alias, database in DATABASES.items()}
+
+# connect to the databases and build URL resolvers and serializer fields before taking traffic
+WARM_UP = True
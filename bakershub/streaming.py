@@ -0,0 +1,58 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+
+class StreamingListMixin:
+    """Opt-in streaming for list views, requested with `?stream=1`.
+
+    Rows are read with queryset.iterator() and serialized one at a time into a
+    StreamingHttpResponse, so memory stays flat however many rows a list has.
+    The bytes sent are the same as the regular JSON response. Other formats
+    (MessagePack, the browsable API) are always rendered in one piece. Views
+    with a lean_serializer_class (see bakershub/lean.py) stream its rows.
+    """
+    stream_chunk_size = 500
+    # prefetches applied per chunk of streamed rows
+    stream_prefetch_related = ()
+
+    def list(self, request, *args, **kwargs):
+        if (request.query_params.get("stream") not in ("1", "true")
+                or type(request.accepted_renderer) is not JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_rows(queryset), content_type="application/json")
+
+    # same encoding options as rest_framework.renderers.JSONRenderer
+    def encode_row(self, data):
+        ret = json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=not api_settings.UNICODE_JSON,
+                         allow_nan=not api_settings.STRICT_JSON,
+                         separators=SHORT_SEPARATORS if api_settings.COMPACT_JSON else LONG_SEPARATORS)
+        return ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+    def stream_items(self, queryset):
+        if getattr(self, "lean_serializer_class", None) is not None:
+            return self.get_lean_serializer().iterate(queryset, self.stream_chunk_size)
+        # build the serializer fields once and reuse them for every row
+        serializer = self.get_serializer()
+        queryset = queryset.prefetch_related(*self.stream_prefetch_related)
+        return map(serializer.to_representation, queryset.iterator(chunk_size=self.stream_chunk_size))
+
+    def stream_rows(self, queryset):
+        yield "["
+        rows = []
+        first = True
+        for item in self.stream_items(queryset):
+            rows.append(self.encode_row(item))
+            # send a chunk of rows at a time rather than one tiny write per row
+            if len(rows) == self.stream_chunk_size:
+                yield ("" if first else ",") + ",".join(rows)
+                rows, first = [], False
+        if rows:
+            yield ("" if first else ",") + ",".join(rows)
+        yield "]"
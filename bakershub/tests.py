@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from inventory.models import Ingredient
+from recipes.models import Recipe
+from recipes.cache import get_cached_detail
+from users.tenancy import default_membership
+from .middleware import ReplicaPinningMiddleware
+from .routers import PrimaryReplicaRouter, replica_reads, reset_replica_reads
+
+# Testing suite for read replica routing, the "replica" alias is never connected to.
+# Not a TestCase: its wrapping transaction would keep every read on the primary
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    # run a request through the middleware, recording where a read made by the view would go
+    def request(self, method, write=False, auth="Token abc"):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Recipe))
+            if write:
+                self.router.db_for_write(Ingredient)
+                seen.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        request = getattr(self.factory, method)("/api/recipes/", HTTP_AUTHORIZATION=auth)
+        ReplicaPinningMiddleware(view)(request)
+        return seen
+
+    def test_router_outside_requests(self):
+        """Test that the worker, commands and transactions always read from the primary."""
+        self.assertEqual(self.router.db_for_read(Recipe), "default")
+        token = replica_reads(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), "replica")
+            self.assertEqual(self.router.db_for_read(Token), "default")
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(Recipe), "default")
+            self.assertEqual(self.router.db_for_write(Recipe), "default")
+            self.assertEqual(self.router.db_for_read(Recipe), "default")
+        finally:
+            reset_replica_reads(token)
+        self.assertFalse(self.router.allow_migrate("replica", "recipes"))
+        self.assertTrue(self.router.allow_migrate("default", "recipes"))
+
+    def test_reads_after_writes_pinned(self):
+        """Test that a client is pinned to the primary after writing, within the request and after it."""
+        self.assertEqual(self.request("get"), ["replica"])
+        self.assertEqual(self.request("get", write=True), ["replica", "default"])
+        self.assertEqual(self.request("get"), ["default"])
+        # other clients keep reading from the replica
+        self.assertEqual(self.request("get", auth="Token other"), ["replica"])
+        self.assertEqual(self.request("post", auth="Token other"), ["default"])
+        self.assertEqual(self.request("get", auth="Token other"), ["default"])
+
+    def test_pin_expires(self):
+        """Test that the pin only lasts REPLICA_PIN_SECONDS."""
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.request("post")
+        self.assertEqual(self.request("get"), ["replica"])
+
+    def test_cached_detail_read_from_primary(self):
+        """Test that a recipe detail is cached from the primary, never from a replica lagging behind."""
+        caches["recipes"].clear()
+        user = User.objects.create_user(username="baker", password="testpass")
+        organization = default_membership(user).organization
+        recipe = Recipe.objects.create(user=user, organization=organization, name="Bread", servings=4)
+        auth = "Token " + Token.objects.create(user=user).key
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=auth)
+        # the "replica" alias doesn't exist, a read sent there would fail the request
+        response = client.get(f"/api/recipes/{recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_cached_detail(organization.id, recipe.id)["name"], "Bread")
+        # and reading the primary didn't pin the client like a write
+        self.assertEqual(self.request("get", auth=auth), ["replica"])
@@ -0,0 +1,48 @@
+"""Worker warm-up, run by wsgi.py / asgi.py when settings.WARM_UP is on.
+
+A fresh worker otherwise pays for these on its first requests: importing
+every view module and compiling the URL patterns, Django's model metadata
+caches behind each serializer's fields, the lean serializers' compiled
+plans, and opening the database connections (kept open by CONN_MAX_AGE).
+"""
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+
+
+def _patterns(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern)
+        else:
+            yield pattern
+
+def warm_up_urls():
+    """Import every view, compile every URL pattern and return the view classes."""
+    resolver = get_resolver()
+    # builds the reverse() lookups, importing every URLconf on the way
+    resolver.reverse_dict
+    views = []
+    for pattern in _patterns(resolver):
+        pattern.pattern.regex
+        view = getattr(pattern.callback, "cls", None) or getattr(pattern.callback, "view_class", None)
+        if view is not None:
+            views.append(view)
+    return views
+
+def warm_up_serializers(views):
+    for view in views:
+        serializer_class = getattr(view, "serializer_class", None)
+        if serializer_class is not None:
+            serializer_class().fields
+        lean_serializer_class = getattr(view, "lean_serializer_class", None)
+        if lean_serializer_class is not None:
+            lean_serializer_class.compiled()
+
+def warm_up_databases():
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+def warm_up():
+    warm_up_serializers(warm_up_urls())
+    warm_up_databases()
@@ -0,0 +1,37 @@
+"""Performance benchmarks, run as `python -m benchmarks.<name>` from the repository root.
+
+Every benchmark works on a throwaway SQLite database, never on db.sqlite3.
+"""
+import logging
+import os
+import statistics
+import tempfile
+
+
+def setup_django(database=None, **overrides):
+    """Point Django at a database (a fresh temporary one by default), apply settings overrides and migrate it."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bakershub.settings")
+    import django
+    from django.conf import settings
+
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix="bakershub-bench-"), "bench.sqlite3")
+    settings.DATABASES["default"]["NAME"] = database
+    settings.ALLOWED_HOSTS = ["testserver"]
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+    # expected 4xx responses would otherwise be logged on every request
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+    return database
+
+
+def report(title, samples):
+    """Print median / p95 / max of a list of durations in seconds."""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{title:<45} median {statistics.median(samples) * 1000:8.2f} ms   "
+          f"p95 {p95 * 1000:8.2f} ms   max {samples[-1] * 1000:8.2f} ms")
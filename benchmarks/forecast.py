@@ -0,0 +1,83 @@
+"""Demand forecast time for a catalog with a full bake history, uncached and cached.
+
+    python -m benchmarks.forecast --ingredients 5000 --bakes 20
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks import report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ingredients", type=int, default=5000)
+    parser.add_argument("--bakes", type=int, default=20, help="bakes per day of history")
+    parser.add_argument("--lines", type=int, default=8, help="ingredients used per bake")
+    parser.add_argument("--days", type=int, default=14, help="days to forecast")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.utils import timezone
+    from inventory.models import Ingredient
+    from recipes.forecast import HISTORY_DAYS, daily_usage, forecast_demand, project
+    from recipes.models import Bake, BakeLine, Recipe
+    from recipes.versions import create_version
+    from users.tenancy import default_membership
+
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    organization = default_membership(user).organization
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, organization=organization, name=f"Ingredient {i}", quantity=1000, unit="g",
+                   cost="4.99", expiration_date="2026-01-01", low_stock_threshold=10)
+        for i in range(args.ingredients)
+    ], batch_size=5000)
+    recipe = Recipe.objects.create(user=user, organization=organization, name="Bench", servings=12)
+    version = create_version(recipe)
+
+    now = timezone.now()
+    rng = random.Random(1)
+    bakes = Bake.objects.bulk_create([
+        Bake(user=user, recipe=recipe, version=version, batch_scale=1)
+        for _ in range(HISTORY_DAYS * args.bakes)
+    ], batch_size=5000)
+    for number, bake in enumerate(bakes):
+        bake.created_at = now - timedelta(days=1 + number // args.bakes, minutes=number % args.bakes)
+    Bake.objects.bulk_update(bakes, ["created_at"], batch_size=5000)
+    BakeLine.objects.bulk_create([
+        BakeLine(bake=bake, ingredient=ingredient, amount=rng.uniform(10, 500))
+        for bake in bakes for ingredient in rng.sample(ingredients, args.lines)
+    ], batch_size=5000)
+    print(f"{args.ingredients} ingredients, {len(bakes)} bakes, {len(bakes) * args.lines} bake lines")
+
+    today = timezone.localdate()
+    rows = list(daily_usage(organization, today - timedelta(days=HISTORY_DAYS), today))
+    samples = {"daily usage query": [], "projection": [], "forecast, uncached": [], "forecast, cached": []}
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        list(daily_usage(organization, today - timedelta(days=HISTORY_DAYS), today))
+        samples["daily usage query"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        project(rows, today, args.days, 28)
+        samples["projection"].append(time.perf_counter() - started)
+
+        cache.clear()
+        started = time.perf_counter()
+        forecast_demand(organization, args.days)
+        samples["forecast, uncached"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        forecast_demand(organization, args.days)
+        samples["forecast, cached"].append(time.perf_counter() - started)
+    print(f"{len(rows)} (ingredient, day) rows")
+    for title, durations in samples.items():
+        report(title, durations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Rows per second of the ingredient and recipe lists, ModelSerializer vs the lean list serializers.
+
+    python -m benchmarks.lean --rows 10000
+"""
+import argparse
+import time
+
+from benchmarks import setup_django
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="ingredients to seed (recipes get a tenth)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Prefetch
+    from rest_framework.test import APIClient
+    from inventory.models import Ingredient
+    from inventory.serializers import IngredientListSerializer, IngredientSerializer
+    from recipes.models import Recipe, RecipeIngredient
+    from recipes.serializers import RecipeListSerializer, RecipeSerializer
+    from users.tenancy import default_membership
+
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    organization = default_membership(user).organization
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, organization=organization, name=f"Ingredient {i}", quantity=1000 + i, unit="g",
+                   cost="4.99", expiration_date="2026-01-01", low_stock_threshold=10)
+        for i in range(args.rows)
+    ], batch_size=5000)
+    recipes = Recipe.objects.bulk_create([
+        Recipe(user=user, organization=organization, name=f"Recipe {i}", description="Benchmark recipe", servings=12)
+        for i in range(args.rows // 10)
+    ], batch_size=5000)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[(i * 7 + j) % args.rows], amount=100, unit="g")
+        for i, recipe in enumerate(recipes) for j in range(8)
+    ], batch_size=5000)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    ingredient_rows = Ingredient.objects.filter(organization=organization)
+    recipe_rows = Recipe.objects.filter(organization=organization)
+    prefetched = recipe_rows.select_related("current_version").prefetch_related(
+        Prefetch("ingredients", queryset=RecipeIngredient.objects.select_related("ingredient", "component")))
+    cases = [
+        ("ingredients", len(ingredients), [
+            ("ModelSerializer", lambda: IngredientSerializer(ingredient_rows, many=True).data),
+            ("lean", lambda: IngredientListSerializer().many(ingredient_rows)),
+            ("GET /api/inventory/ingredients/", lambda: client.get("/api/inventory/ingredients/")),
+        ]),
+        ("recipes", len(recipes), [
+            ("ModelSerializer", lambda: RecipeSerializer(prefetched, many=True).data),
+            ("lean", lambda: RecipeListSerializer().many(recipe_rows)),
+            ("GET /api/recipes/", lambda: client.get("/api/recipes/")),
+        ]),
+    ]
+    print(f"{'list':<12} {'serializer':<34} {'rows':>6} {'time':>10} {'rows/s':>10}")
+    for name, rows, runs in cases:
+        for label, func in runs:
+            duration = best_of(func, args.repeat)
+            print(f"{name:<12} {label:<34} {rows:>6} {duration * 1000:>8.1f}ms {rows / duration:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Payload size and encode / decode time of the ingredient and recipe lists, JSON vs MessagePack.
+
+    python -m benchmarks.msgpack --rows 5000
+"""
+import argparse
+import json
+import time
+
+from benchmarks import setup_django
+
+
+def timed(func, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="ingredients to seed (recipes get a tenth)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Prefetch
+    from rest_framework.renderers import JSONRenderer
+    from bakershub.msgpack import unpack
+    from bakershub.renderers import MessagePackRenderer
+    from inventory.models import Ingredient
+    from inventory.serializers import IngredientSerializer
+    from recipes.models import Recipe, RecipeIngredient
+    from users.tenancy import default_membership
+    from recipes.serializers import RecipeSerializer
+
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    organization = default_membership(user).organization
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, organization=organization, name=f"Ingredient {i}", quantity=1000 + i, unit="g", cost="4.99",
+                   expiration_date="2026-01-01", low_stock_threshold=10)
+        for i in range(args.rows)
+    ])
+    recipes = Recipe.objects.bulk_create([
+        Recipe(user=user, organization=organization, name=f"Recipe {i}", description="Benchmark recipe", servings=12)
+        for i in range(args.rows // 10)
+    ])
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[(i * 7 + j) % args.rows], amount=100, unit="g")
+        for i, recipe in enumerate(recipes) for j in range(8)
+    ])
+
+    payloads = {
+        "ingredients": IngredientSerializer(Ingredient.objects.all(), many=True).data,
+        "recipes": RecipeSerializer(Recipe.objects.prefetch_related(
+            Prefetch("ingredients", queryset=RecipeIngredient.objects.select_related("ingredient"))), many=True).data,
+    }
+    formats = {
+        "json": (JSONRenderer().render, json.loads),
+        "msgpack": (MessagePackRenderer().render, unpack),
+    }
+    print(f"{'payload':<12} {'format':<8} {'rows':>6} {'bytes':>10} {'encode':>10} {'decode':>10}")
+    for name, data in payloads.items():
+        for label, (encode, decode) in formats.items():
+            body = encode(data)
+            print(f"{name:<12} {label:<8} {len(data):>6} {len(body):>10} "
+                  f"{timed(encode, data, args.repeat) * 1000:>8.1f}ms {timed(decode, body, args.repeat) * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
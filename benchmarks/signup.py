@@ -0,0 +1,66 @@
+"""Signup latency with a large existing user table.
+
+Compares the old `User.objects.filter(email=...).exists()` pre-check (a full
+scan of auth_user) with registration relying on the unique LOWER(email) index.
+Passwords use the MD5 hasher so the numbers show database work, not PBKDF2.
+
+    python -m benchmarks.signup --users 1000000
+"""
+import argparse
+import time
+
+from benchmarks import report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000, help="existing users to create first")
+    parser.add_argument("--signups", type=int, default=200, help="signups to time")
+    args = parser.parse_args()
+
+    setup_django(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from rest_framework.test import APIClient
+
+    started = time.perf_counter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        batch = 50_000
+        for start in range(0, args.users, batch):
+            cursor.executemany(
+                "INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, "
+                "is_staff, is_active, date_joined) VALUES ('!', 0, %s, '', '', %s, 0, 1, '2025-01-01')",
+                [(f"user{i}", f"user{i}@example.com") for i in range(start, min(start + batch, args.users))],
+            )
+    print(f"Seeded {args.users:,} users in {time.perf_counter() - started:.1f}s")
+
+    # the old pre-check: email has no usable index for an exact match
+    samples = []
+    for i in range(min(args.signups, 50)):
+        started = time.perf_counter()
+        User.objects.filter(email=f"new{i}@example.com").exists()
+        samples.append(time.perf_counter() - started)
+    report("old validate_email pre-check query", samples)
+
+    client = APIClient()
+    samples = []
+    for i in range(args.signups):
+        data = {"username": f"new{i}", "email": f"new{i}@example.com", "password": "bench-pass-123"}
+        started = time.perf_counter()
+        response = client.post("/api/users/register/", data, format="json")
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 201, response.content
+    report("signup (constraint enforced on insert)", samples)
+
+    samples = []
+    for i in range(min(args.signups, 50)):
+        data = {"username": f"dup{i}", "email": f"USER{i}@example.com", "password": "bench-pass-123"}
+        started = time.perf_counter()
+        response = client.post("/api/users/register/", data, format="json")
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 400, response.content
+    report("rejected duplicate email", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Worker cold start: time to load the WSGI application and latency of its first requests, per settings profile.
+
+Every sample is a fresh Python process, like a worker the autoscaler just started.
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks import setup_django
+
+# run in a fresh interpreter: load the app the way the WSGI server does, then time two requests
+WORKER = r"""
+import io, json, os, sys, time
+started = time.perf_counter()
+os.environ["DJANGO_SETTINGS_MODULE"] = sys.argv[1]
+from django.conf import settings
+settings.DATABASES["default"]["NAME"] = sys.argv[2]
+settings.ALLOWED_HOSTS = ["testserver"]
+for name, value in json.loads(sys.argv[4]).items():
+    setattr(settings, name, value)
+from bakershub.wsgi import application
+loaded = time.perf_counter()
+
+def get(path):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": "testserver",
+               "SERVER_PORT": "80", "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(),
+               "HTTP_AUTHORIZATION": "Token " + sys.argv[3], "HTTP_ACCEPT": "application/json"}
+    started = time.perf_counter()
+    statuses = []
+    body = b"".join(application(environ, lambda status, headers: statuses.append(status)))
+    assert statuses[0].startswith("200"), (statuses, body[:200])
+    return time.perf_counter() - started
+
+first = get("/api/recipes/")
+second = get("/api/inventory/ingredients/")
+print(json.dumps({"load": loaded - started, "first": first, "second": second,
+                  "modules": len(sys.modules)}))
+"""
+
+# (label, settings module, overrides)
+PROFILES = [
+    ("default", "bakershub.settings", {}),
+    ("api, no warm-up", "bakershub.settings_api", {"WARM_UP": False}),
+    ("api", "bakershub.settings_api", {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    database = setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+    from inventory.models import Ingredient
+    from recipes.models import Recipe, RecipeIngredient
+    from users.tenancy import default_membership
+
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    organization = default_membership(user).organization
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, organization=organization, name=f"Ingredient {i}", quantity=1000, unit="g",
+                   cost="4.99", low_stock_threshold=10)
+        for i in range(50)
+    ])
+    for i in range(10):
+        recipe = Recipe.objects.create(user=user, organization=organization, name=f"Recipe {i}", servings=12)
+        RecipeIngredient.objects.bulk_create([RecipeIngredient(recipe=recipe, ingredient=ingredients[(i + j) % 50],
+                                                               amount=100, unit="g") for j in range(5)])
+    token = Token.objects.create(user=user).key
+    connection.close()
+
+    print(f"{'settings':<24} {'load app':>10} {'1st request':>12} {'2nd request':>12} {'modules':>8}   (medians)")
+    for label, module, overrides in PROFILES:
+        command = [sys.executable, "-c", WORKER, module, database, token, json.dumps(overrides)]
+        samples = [json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+                   for _ in range(args.runs)]
+        median = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        print(f"{label:<24} {median['load'] * 1000:>8.1f}ms {median['first'] * 1000:>10.1f}ms "
+              f"{median['second'] * 1000:>10.1f}ms {median['modules']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Peak memory and time to first byte of buffered vs streamed list responses.
+
+Each measurement runs in its own process so peak RSS is not shared.
+
+    python -m benchmarks.streaming --rows 100000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks import setup_django
+
+URLS = {"ingredients": "/api/inventory/ingredients/", "recipes": "/api/recipes/"}
+
+
+def seed(rows):
+    database = setup_django()
+    from django.contrib.auth.models import User
+    from inventory.models import Ingredient
+    from recipes.models import Recipe, RecipeIngredient
+    from users.tenancy import default_membership
+    from rest_framework.authtoken.models import Token
+
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    organization = default_membership(user).organization
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, organization=organization, name=f"Ingredient {i}", quantity=1000 + i, unit="g", cost="4.99",
+                   expiration_date="2026-01-01", low_stock_threshold=10)
+        for i in range(rows)
+    ], batch_size=5000)
+    recipes = Recipe.objects.bulk_create([
+        Recipe(user=user, organization=organization, name=f"Recipe {i}", description="Benchmark recipe", servings=12)
+        for i in range(rows // 10)
+    ], batch_size=5000)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[(i * 7 + j) % rows], amount=100, unit="g")
+        for i, recipe in enumerate(recipes) for j in range(8)
+    ], batch_size=5000)
+    return database, Token.objects.create(user=user).key
+
+
+def peak_rss_kb(reset=False):
+    """Peak resident set size of this process, optionally resetting the peak first (Linux)."""
+    if reset:
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(database, token, url, stream):
+    setup_django(database)
+    from rest_framework.test import APIClient
+
+    client = APIClient(HTTP_AUTHORIZATION=f"Token {token}")
+    # warm up url resolving, auth and imports with a cheap 404
+    client.get(url + "0/")
+    baseline = peak_rss_kb(reset=True)
+    started = time.perf_counter()
+    if stream:
+        response = client.get(url + "?stream=1")
+        chunks = iter(response.streaming_content)
+        size = len(next(chunks))
+        first_byte = time.perf_counter() - started
+        size += sum(len(chunk) for chunk in chunks)
+    else:
+        response = client.get(url)
+        first_byte = time.perf_counter() - started
+        size = len(response.content)
+    total = time.perf_counter() - started
+    peak = peak_rss_kb() - baseline
+    print(json.dumps({"first_byte": first_byte, "total": total, "peak_kb": peak, "bytes": size}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="ingredients to seed (recipes get a tenth)")
+    parser.add_argument("--measure", nargs=4, metavar=("DATABASE", "TOKEN", "URL", "STREAM"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        database, token, url, stream = args.measure
+        measure(database, token, url, stream == "1")
+        return
+
+    database, token = seed(args.rows)
+    print(f"{'endpoint':<12} {'mode':<9} {'rows':>8} {'payload MB':>11} {'first byte':>11} {'total':>9} {'peak RSS +MB':>13}")
+    for name, url in URLS.items():
+        for stream in ("0", "1"):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.streaming", "--measure", database, token, url, stream],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rows = args.rows if name == "ingredients" else args.rows // 10
+            print(f"{name:<12} {'stream' if stream == '1' else 'buffered':<9} {rows:>8} "
+                  f"{result['bytes'] / 1e6:>11.1f} {result['first_byte'] * 1000:>9.0f}ms "
+                  f"{result['total']:>8.2f}s {result['peak_kb'] / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Write-offs of expired stock.
+
+Stock is expired once its expiration date has passed. The sweep zeroes the
+quantity of every expired ingredient, across all organizations, and records
+what was lost as a WasteRecord costed at the stock's price. Stock written off
+drops out of the partial expiry index (ingredients still in stock), so each
+run only reads what still needs writing off, whenever it expired or was
+restocked. Every run is logged as an ExpirySweep.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from outbox.events import emit_low_stock
+from recipes.cache import invalidate_ingredients
+from .models import ExpirySweep, Ingredient, WasteRecord
+
+# ingredients written off per transaction
+SWEEP_BATCH = 500
+
+def sweep_expired(today=None, batch_size=SWEEP_BATCH):
+    """Write off stock that expired before today, returns {"swept_through", "written_off", "cost"}."""
+    through = (today or timezone.localdate()) - timedelta(days=1)
+    expired = Ingredient.objects.filter(quantity__gt=0, expiration_date__lte=through)
+
+    ids = list(expired.order_by("pk").values_list("pk", flat=True))
+    written_off, total_cost = 0, 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            # locked in id order like bakes, and checked again since stock may have come in meanwhile
+            ingredients = list(expired.select_for_update().filter(pk__in=ids[start:start + batch_size]).order_by("pk"))
+            # cost is the price of the whole quantity held, all of which is lost
+            WasteRecord.objects.bulk_create([
+                WasteRecord(organization_id=ingredient.organization_id, ingredient=ingredient, name=ingredient.name,
+                            quantity=ingredient.quantity, unit=ingredient.unit, cost=ingredient.cost,
+                            expiration_date=ingredient.expiration_date, reason=WasteRecord.EXPIRED)
+                for ingredient in ingredients
+            ])
+            written = [ingredient.pk for ingredient in ingredients]
+            Ingredient.objects.filter(pk__in=written).update(quantity=0, updated_at=timezone.now())
+            invalidate_ingredients(written)
+            previous = [ingredient.quantity for ingredient in ingredients]
+            for ingredient in ingredients:
+                ingredient.quantity = 0
+            emit_low_stock(zip(ingredients, previous))
+        written_off += len(ingredients)
+        total_cost += sum(ingredient.cost for ingredient in ingredients)
+
+    # a run that stopped half way is picked up again by the next one
+    ExpirySweep.objects.create(swept_through=through, written_off=written_off)
+    return {"swept_through": through.isoformat(), "written_off": written_off, "cost": float(total_cost)}
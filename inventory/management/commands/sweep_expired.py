@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.expiry import SWEEP_BATCH, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Write off expired stock, recording it as waste."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH)
+
+    def handle(self, *args, **options):
+        result = sweep_expired(batch_size=max(options["batch_size"], 1))
+        self.stdout.write(f"Wrote off {result['written_off']} ingredient(s) expired through "
+                          f"{result['swept_through']}, costing {result['cost']:.2f}.")
@@ -0,0 +1,38 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Existing ingredients move to their owner's personal organization
+def fill_organization(apps, schema_editor):
+    Ingredient = apps.get_model("inventory", "Ingredient")
+    Membership = apps.get_model("users", "Membership")
+
+    organizations = dict(Membership.objects.filter(role="owner").order_by("-id").values_list("user_id", "organization_id"))
+    for user_id, organization_id in organizations.items():
+        Ingredient.objects.filter(user_id=user_id).update(organization_id=organization_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+        ("users", "0002_organizations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="organization",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="ingredients", to="users.organization"),
+        ),
+        migrations.RunPython(fill_organization, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="ingredient",
+            name="organization",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="ingredients", to="users.organization"),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(fields=["organization", "name"], name="inventory_ingredient_org_name"),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-19 15:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_ingredient_organization'),
+        ('users', '0002_organizations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('swept_through', models.DateField()),
+                ('written_off', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WasteRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('quantity', models.FloatField()),
+                ('unit', models.CharField(max_length=20)),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expiration_date', models.DateField(blank=True, null=True)),
+                ('reason', models.CharField(choices=[('expired', 'Expired')], default='expired', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['expiration_date'], name='inventory_ingredient_expiry'),
+        ),
+        migrations.AddField(
+            model_name='wasterecord',
+            name='ingredient',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waste', to='inventory.ingredient'),
+        ),
+        migrations.AddField(
+            model_name='wasterecord',
+            name='organization',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waste', to='users.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='wasterecord',
+            index=models.Index(fields=['organization', 'created_at'], name='inventory_waste_org_created'),
+        ),
+    ]
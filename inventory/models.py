@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from users.models import Organization
 
 # Create your models here.
 class Ingredient(models.Model):
+    # the organization sharing this stock, user is the member who added it
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="ingredients")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100) # ex Flour, sugar, etc
     quantity = models.FloatField()
@@ -12,6 +15,58 @@ class Ingredient(models.Model):
     low_stock_threshold = models.FloatField(default=0) # when to report low stock
     updated_at = models.DateTimeField(auto_now=True) # track last time ingredient was edited
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "name"], name="inventory_ingredient_org_name"),
+            # the expiry sweep looks up stock by expiration date across all organizations,
+            # stock already written off drops out of the index
+            models.Index(fields=["expiration_date"], condition=models.Q(quantity__gt=0),
+                         name="inventory_ingredient_expiry"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # ingredients created without an organization go to their creator's current one
+        if self.organization_id is None:
+            from users.tenancy import default_membership
+            self.organization = default_membership(self.user).organization
+        super().save(*args, **kwargs)
+
     # to display object nicely
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit})"
+
+
+# Stock written off, with what it cost
+class WasteRecord(models.Model):
+    EXPIRED = "expired"
+    REASON_CHOICES = [
+        (EXPIRED, "Expired"),
+    ]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="waste")
+    # kept when the ingredient is deleted, along with its name and unit at the time
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.SET_NULL, null=True, related_name="waste")
+    name = models.CharField(max_length=100)
+    quantity = models.FloatField()
+    unit = models.CharField(max_length=20)
+    cost = models.DecimalField(max_digits=10, decimal_places=2)
+    expiration_date = models.DateField(null=True, blank=True)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default=EXPIRED)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["organization", "created_at"], name="inventory_waste_org_created")]
+
+    # to display object nicely
+    def __str__(self):
+        return f"{self.name} ({self.quantity} {self.unit}, {self.reason})"
+
+
+# Log of one run of the expiry sweep
+class ExpirySweep(models.Model):
+    swept_through = models.DateField() # stock expiring on or before this day has been written off
+    written_off = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Expiry sweep through {self.swept_through} ({self.written_off} written off)"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Ingredient
+from bakershub.lean import LeanSerializer
+from .models import Ingredient, WasteRecord
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,3 +8,11 @@ class IngredientSerializer(serializers.ModelSerializer):
         # hiding user from request for security purposes
         fields = ['id', 'name', 'quantity', 'unit', 'cost', 'expiration_date', 'low_stock_threshold']
 
+# Same rows as IngredientSerializer for list reads, without model instances (see bakershub/lean.py)
+class IngredientListSerializer(LeanSerializer):
+    serializer_class = IngredientSerializer
+
+class WasteRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WasteRecord
+        fields = ['id', 'ingredient', 'name', 'quantity', 'unit', 'cost', 'expiration_date', 'reason', 'created_at']
@@ -0,0 +1,28 @@
+from jobs.registry import PermanentJobError, task
+from users.tenancy import get_membership
+from .expiry import sweep_expired
+from .models import Ingredient
+from .serializers import IngredientSerializer
+
+# Create many ingredients at once in the background
+@task("inventory.create_ingredients")
+def create_ingredients(job):
+    membership = get_membership(job.user, job.payload.get("organization"))
+    if membership is None or not membership.can_manage:
+        raise PermanentJobError("Only managers and owners of the organization can add ingredients.")
+
+    serializer = IngredientSerializer(data=job.payload.get("ingredients"), many=True)
+    if not serializer.is_valid():
+        raise PermanentJobError(f"Invalid ingredients: {serializer.errors}")
+
+    created = Ingredient.objects.bulk_create(
+        [Ingredient(user=job.user, organization=membership.organization, **item) for item in serializer.validated_data]
+    )
+    return {"created": len(created), "ids": [ingredient.id for ingredient in created]}
+
+# Write off expired stock of every organization, for a scheduler to queue daily
+@task("inventory.sweep_expired")
+def sweep_expired_stock(job):
+    if not job.user.is_staff:
+        raise PermanentJobError("Only staff can run the expiry sweep.")
+    return sweep_expired()
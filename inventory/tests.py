@@ -1,8 +1,16 @@
+from datetime import date
+import io
+from django.core.management import call_command
 from django.test import TestCase
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
-from .models import Ingredient
+from .models import ExpirySweep, Ingredient, WasteRecord
+from .expiry import sweep_expired
+from .serializers import IngredientListSerializer, IngredientSerializer
+from rest_framework.renderers import JSONRenderer
+from recipes.models import Recipe, RecipeIngredient
 from rest_framework import status
+from bakershub.msgpack import pack, unpack
 
 
 class IngredientTests(TestCase):
@@ -134,4 +142,228 @@ class IngredientTests(TestCase):
         """Test deducting from an ingredient that doesn't exist produces an error and 404 status."""
         response = self.client.post(f"/api/inventory/ingredients/3/deduct/", { "amount": 10}, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertIn("error", response.data)
\ No newline at end of file
+        self.assertIn("error", response.data)
+
+    def test_ingredient_recipes_cost_impact(self):
+        """Test listing dependent recipes with the cost delta of a hypothetical price change."""
+        flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=3.00,
+                                          low_stock_threshold=200)
+        sugar = Ingredient.objects.create(user=self.user, name="Sugar", quantity=1000, unit="grams", cost=2.50,
+                                          low_stock_threshold=200)
+        cake = Recipe.objects.create(user=self.user, name="Cake", description="", servings=12)
+        RecipeIngredient.objects.create(recipe=cake, ingredient=flour, amount=350, unit="grams")
+        RecipeIngredient.objects.create(recipe=cake, ingredient=sugar, amount=150, unit="grams")
+        bread = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=bread, ingredient=flour, amount=500, unit="grams")
+        candy = Recipe.objects.create(user=self.user, name="Candy", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=candy, ingredient=sugar, amount=500, unit="grams")
+
+        response = self.client.get(f"/api/inventory/ingredients/{flour.id}/recipes/?change=0.15")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hypothetical"], {"cost": 3.45, "quantity": 1000.0})
+        recipes = {r["name"]: r for r in response.data["recipes"]}
+        self.assertEqual(sorted(recipes), ["Bread", "Cake"])
+        self.assertEqual(recipes["Cake"]["total_cost"], 1.42)
+        self.assertEqual(recipes["Cake"]["new_total_cost"], 1.58)
+        self.assertEqual(recipes["Cake"]["cost_delta"], 0.16)
+        self.assertEqual(recipes["Bread"]["cost_delta"], 0.22)
+        self.assertEqual(recipes["Bread"]["new_cost_per_serving"], 0.43)
+
+        # a bigger pack at the same price halves flour's share of the cost
+        response = self.client.get(f"/api/inventory/ingredients/{flour.id}/recipes/?quantity=2000")
+        recipes = {r["name"]: r for r in response.data["recipes"]}
+        self.assertEqual(recipes["Bread"]["new_total_cost"], 0.75)
+
+        # recipes using it through a sub-recipe are costed too, and unrelated ones not even loaded
+        platter = Recipe.objects.create(user=self.user, name="Platter", description="", servings=10)
+        RecipeIngredient.objects.create(recipe=platter, component=bread, amount=2, unit="batch")
+        with self.assertNumQueries(8):
+            response = self.client.get(f"/api/inventory/ingredients/{flour.id}/recipes/?cost=6")
+        recipes = {r["name"]: r for r in response.data["recipes"]}
+        self.assertEqual(sorted(recipes), ["Bread", "Cake", "Platter"])
+        self.assertEqual(recipes["Platter"]["cost_delta"], 3.0)
+
+    def test_ingredient_recipes_invalid_params(self):
+        """Test that an invalid hypothetical price produces an error and 400 status."""
+        ingredient = Ingredient.objects.create(user=self.user, name="Sugar", quantity=100, unit="grams", cost=1.50,
+                                               low_stock_threshold=20)
+        for query in ["cost=abc", "quantity=nan", "quantity=inf", "cost=Infinity", "change=nan", "cost=1e30",
+                      "change=1e30", "quantity=1e-300", "cost=-1", "change=-2", "cost=999999&change=1"]:
+            response = self.client.get(f"/api/inventory/ingredients/{ingredient.id}/recipes/?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+        response = self.client.get("/api/inventory/ingredients/999/recipes/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_ingredients_streaming(self):
+        """Test that the streamed ingredient list matches the regular JSON response byte for byte."""
+        for i in range(7):
+            Ingredient.objects.create(user=self.user, name=f"Spice  {i}", quantity=i, unit="g", cost=1.25,
+                                      expiration_date="2025-12-31" if i % 2 else None, low_stock_threshold=1)
+        regular = self.client.get('/api/inventory/ingredients/')
+        streamed = self.client.get('/api/inventory/ingredients/?stream=1')
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(b"".join(streamed.streaming_content), regular.content)
+
+    def test_list_ingredients_msgpack(self):
+        """Test that the ingredient list is negotiated as MessagePack with the same data as JSON."""
+        Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=2.49,
+                                  expiration_date="2025-12-31", low_stock_threshold=100)
+        regular = self.client.get('/api/inventory/ingredients/')
+        packed = self.client.get('/api/inventory/ingredients/?stream=1', HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(packed.status_code, status.HTTP_200_OK)
+        self.assertEqual(packed["Content-Type"], "application/msgpack")
+        self.assertFalse(packed.streaming)
+        self.assertEqual(unpack(packed.content), regular.json())
+        self.assertEqual(unpack(packed.content)[0]["cost"], "2.49")
+        self.assertLess(len(packed.content), len(regular.content))
+
+    def test_create_ingredient_msgpack(self):
+        """Test that an ingredient can be created from a MessagePack body and bad bodies are rejected."""
+        response = self.client.post('/api/inventory/ingredients/', pack(self.ingredient_data),
+                                    content_type="application/msgpack", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(unpack(response.content)["expiration_date"], "2025-12-31")
+        self.assertEqual(Ingredient.objects.get().name, "Butter")
+
+        response = self.client.post('/api/inventory/ingredients/', b"\x82\xa4name",
+                                    content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_shopping_list(self):
+        """Test that a production plan's needs, sub-recipes included, are bought beyond the stock buffer."""
+        flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=3.00,
+                                          low_stock_threshold=200)
+        sugar = Ingredient.objects.create(user=self.user, name="Sugar", quantity=1000, unit="grams", cost=2.50,
+                                          low_stock_threshold=200)
+        cake = Recipe.objects.create(user=self.user, name="Cake", description="", servings=12)
+        RecipeIngredient.objects.create(recipe=cake, ingredient=flour, amount=350, unit="grams")
+        RecipeIngredient.objects.create(recipe=cake, ingredient=sugar, amount=150, unit="grams")
+        dough = Recipe.objects.create(user=self.user, name="Dough", description="", servings=1)
+        RecipeIngredient.objects.create(recipe=dough, ingredient=flour, amount=100, unit="grams")
+        bread = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=bread, ingredient=flour, amount=500, unit="grams")
+        RecipeIngredient.objects.create(recipe=bread, component=dough, amount=2, unit="batch")
+
+        plan = [{"recipe": cake.id, "batch_scale": 2}, {"recipe": bread.id}, {"recipe": cake.id}]
+        response = self.client.post("/api/inventory/shopping-list/", {"plan": plan}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # flour: 3 x 350 + 500 + 2 x 100 needed, 800 held above the threshold; sugar: 450 needed
+        self.assertEqual(response.data["items"], [{
+            "ingredient": flour.id, "name": "Flour", "unit": "grams", "required": 1750.0, "quantity": 1000.0,
+            "low_stock_threshold": 200.0, "purchase": 950.0, "estimated_cost": 2.85,
+        }])
+        self.assertEqual(response.data["total_cost"], 2.85)
+
+        other = Recipe.objects.create(user=User.objects.create_user(username="other", password="testpass"),
+                                      name="Other", description="", servings=1)
+        response = self.client.post("/api/inventory/shopping-list/", {"plan": [{"recipe": other.id}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for plan in [None, [], [{"recipe": cake.id, "batch_scale": 0}], [{"batch_scale": 1}], ["x"]]:
+            response = self.client.post("/api/inventory/shopping-list/", {"plan": plan}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list_rejects_non_finite_scale(self):
+        """Test that a batch scale that isn't a finite number produces an error and 400 status."""
+        recipe = Recipe.objects.create(user=self.user, name="Cake", description="", servings=8)
+        for scale in ["nan", "inf", "-inf", "1e400"]:
+            response = self.client.post("/api/inventory/shopping-list/",
+                                        {"plan": [{"recipe": recipe.id, "batch_scale": scale}]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+        # 1e400 in a JSON body is a float infinity
+        response = self.client.post("/api/inventory/shopping-list/", '{"plan": [{"recipe": 1e400}]}',
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lean_list_matches_serializer(self):
+        """Test that the lean list rows render to the same bytes as IngredientSerializer, in JSON and MessagePack."""
+        for name, quantity, cost, expiration in [("Flour", 1000, "3.00", "2025-12-31"), ("Crème fraîche", 0.1, "0", None),
+                                                 ("Saffron", 1e-7, "999999.99", "2030-02-28"), ("Salt", -2.5, "0.10", None)]:
+            Ingredient.objects.create(user=self.user, name=name, quantity=quantity, unit="g", cost=cost,
+                                      expiration_date=expiration, low_stock_threshold=quantity / 3)
+        queryset = Ingredient.objects.order_by("id")
+        expected = IngredientSerializer(queryset, many=True).data
+        lean = IngredientListSerializer().many(queryset)
+        self.assertEqual(JSONRenderer().render(lean), JSONRenderer().render(expected))
+        self.assertEqual(pack(lean), pack(expected))
+
+        response = self.client.get('/api/inventory/ingredients/')
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_adjust_inventory(self):
+        """Test that deliveries and counts are applied together, refreshing the costs of recipes using them."""
+        flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=3.00)
+        sugar = Ingredient.objects.create(user=self.user, name="Sugar", quantity=500, unit="grams", cost=2.50)
+        cake = Recipe.objects.create(user=self.user, name="Cake", description="", servings=12)
+        RecipeIngredient.objects.create(recipe=cake, ingredient=flour, amount=500, unit="grams")
+        self.assertEqual(self.client.get(f"/api/recipes/{cake.id}/").data["total_cost"], 1.5)
+
+        adjustments = [{"ingredient": flour.id, "delta": 1000}, {"ingredient": sugar.id, "count": 420},
+                       {"ingredient": flour.id, "delta": -500}]
+        response = self.client.post("/api/inventory/adjust/", {"adjustments": adjustments}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ingredients"], [{"id": flour.id, "new_quantity": 1500.0},
+                                                        {"id": sugar.id, "new_quantity": 420.0}])
+        flour.refresh_from_db()
+        self.assertEqual(flour.quantity, 1500)
+        self.assertEqual(self.client.get(f"/api/recipes/{cake.id}/").data["total_cost"], 1.0)
+
+    def test_adjust_inventory_rejected(self):
+        """Test that every rejected entry is reported and nothing is applied."""
+        flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=100, unit="grams", cost=3.00)
+        other = Ingredient.objects.create(user=User.objects.create_user(username="other", password="testpass"),
+                                          name="Butter", quantity=100, unit="grams", cost=4.00)
+        adjustments = [{"ingredient": flour.id, "delta": 50}, {"ingredient": other.id, "delta": 5},
+                       {"ingredient": flour.id, "delta": -500}, {"ingredient": flour.id, "count": -1},
+                       {"ingredient": flour.id}, {"ingredient": "abc", "count": 3}, "x"]
+        response = self.client.post("/api/inventory/adjust/", {"adjustments": adjustments}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item["index"] for item in response.data["rejected"]], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(response.data["rejected"][0]["error"], "Ingredient Not Found.")
+        flour.refresh_from_db()
+        self.assertEqual(flour.quantity, 100)
+        for body in [{}, {"adjustments": []}, {"adjustments": "x"}]:
+            response = self.client.post("/api/inventory/adjust/", body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # 1e400 in a JSON body is a float infinity
+        body = '{"adjustments": [{"ingredient": %d, "delta": 1}, {"ingredient": 1e400, "delta": 1}]}' % flour.id
+        response = self.client.post("/api/inventory/adjust/", body, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item["index"] for item in response.data["rejected"]], [1])
+
+    def test_sweep_expired(self):
+        """Test that expired stock is written off as waste once, including stock entered after a sweep already expired."""
+        milk = Ingredient.objects.create(user=self.user, name="Milk", quantity=2, unit="l", cost=3.10,
+                                         expiration_date="2026-03-01", low_stock_threshold=1)
+        cream = Ingredient.objects.create(user=self.user, name="Cream", quantity=1, unit="l", cost=4.20,
+                                          expiration_date="2026-03-05", low_stock_threshold=1)
+        flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=0, unit="g", cost=1.00,
+                                          expiration_date="2026-02-01", low_stock_threshold=1)
+
+        result = sweep_expired(today=date(2026, 3, 2))
+        self.assertEqual(result, {"swept_through": "2026-03-01", "written_off": 1, "cost": 3.1})
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 0)
+        waste = WasteRecord.objects.get()
+        self.assertEqual((waste.ingredient, waste.quantity, str(waste.cost), waste.reason), (milk, 2, "3.10", "expired"))
+        self.assertEqual(sweep_expired(today=date(2026, 3, 2))["written_off"], 0)
+
+        # restocked, or entered, after the last sweep with an expiration date it already covered
+        Ingredient.objects.filter(pk=flour.pk).update(quantity=500)
+        Ingredient.objects.create(user=self.user, name="Butter", quantity=5, unit="g", cost=2.00,
+                                  expiration_date="2026-02-27")
+        call_command("sweep_expired", stdout=io.StringIO())
+        flour.refresh_from_db()
+        cream.refresh_from_db()
+        self.assertEqual((flour.quantity, cream.quantity), (0, 0))
+        self.assertFalse(Ingredient.objects.filter(quantity__gt=0).exists())
+        self.assertEqual(ExpirySweep.objects.count(), 3)
+
+        response = self.client.get("/api/inventory/waste/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(item["name"] for item in response.data), ["Butter", "Cream", "Flour", "Milk"])
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username="other", password="testpass"))
+        self.assertEqual(other.get("/api/inventory/waste/").data, [])
@@ -1,9 +1,14 @@
 from django.urls import path
-from .views import IngredientDetailView, IngredientListCreateView, add_inventory, deduct_inventory
+from .views import (IngredientDetailView, IngredientListCreateView, WasteRecordListView, add_inventory, adjust_inventory,
+                    deduct_inventory, ingredient_recipes, shopping_list)
 
 urlpatterns = [
     path('ingredients/', IngredientListCreateView.as_view(), name='ingredient-list-create'),
     path('ingredients/<int:pk>/', IngredientDetailView.as_view(), name='ingredient-detail'),
     path('ingredients/<int:pk>/add/', add_inventory, name='add-inventory'),
     path('ingredients/<int:pk>/deduct/', deduct_inventory, name='deduct-inventory'),
+    path('ingredients/<int:pk>/recipes/', ingredient_recipes, name='ingredient-recipes'),
+    path('adjust/', adjust_inventory, name='adjust-inventory'),
+    path('shopping-list/', shopping_list, name='shopping-list'),
+    path('waste/', WasteRecordListView.as_view(), name='waste-list'),
 ]
\ No newline at end of file
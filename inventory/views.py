@@ -1,40 +1,72 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from .models import Ingredient
-from .serializers import IngredientSerializer
+from bakershub.lean import LeanListMixin
+from bakershub.streaming import StreamingListMixin
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from users.permissions import CanManageCatalog, IsOrganizationMember
+from users.tenancy import request_organization
+from .models import Ingredient, WasteRecord
+from .serializers import IngredientListSerializer, IngredientSerializer, WasteRecordSerializer
 from decimal import Decimal, InvalidOperation
+import math
+from recipes.cache import invalidate_ingredients
+from recipes.components import dependent_ids, plan_batches
+from recipes.costing import (COST_RANGE, MARGIN_RANGE, QUANTITY_RANGE, CostMatrix, compare_totals, line_cost, round_cost,
+                             valid_cost, valid_margin, valid_quantity)
+from recipes.models import Recipe, RecipeIngredient
+from outbox.events import emit_low_stock
+
+# most recipe entries a shopping list plan may have
+SHOPPING_PLAN_LIMIT = 1000
+# most entries a bulk stock adjustment may have
+ADJUST_LIMIT = 1000
 
 # Create Ingredient View
-class IngredientListCreateView(generics.ListCreateAPIView):
+class IngredientListCreateView(StreamingListMixin, LeanListMixin, generics.ListCreateAPIView):
     serializer_class = IngredientSerializer
+    lean_serializer_class = IngredientListSerializer
     # ensure only users logged in can access the view
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanManageCatalog]
 
     def get_queryset(self):
-        # only show ingredients for logged in user
-        return Ingredient.objects.filter(user=self.request.user)
+        # only show ingredients of the user's organization
+        return Ingredient.objects.filter(organization=request_organization(self.request))
 
     # specify what user to be assigned
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, organization=request_organization(self.request))
 
 # Get Ingredient View
 class IngredientDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = IngredientSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanManageCatalog]
+
+    def get_queryset(self):
+        # only show ingredients of the user's organization
+        return Ingredient.objects.filter(organization=request_organization(self.request))
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.quantity
+        with transaction.atomic():
+            emit_low_stock([(serializer.save(), previous)])
+
+# Stock written off, newest first
+class WasteRecordListView(generics.ListAPIView):
+    serializer_class = WasteRecordSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOrganizationMember]
 
     def get_queryset(self):
-        # only show ingredients for logged in user
-        return Ingredient.objects.filter(user=self.request.user)
+        return WasteRecord.objects.filter(organization=request_organization(self.request)).order_by("-created_at", "-id")
 
 # Add Amount to Ingredient
 @api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
 def add_inventory(request, pk):
     """Add a specified amount to an ingredient's quantity."""
     try:
-        ingredient = Ingredient.objects.get(pk=pk, user=request.user)
         try:
             amount = float(request.data.get("amount"))
         except (TypeError, ValueError):
@@ -43,18 +75,20 @@ def add_inventory(request, pk):
         if amount <= 0:
             return Response({"error": "Amount must be positive."}, status=status.HTTP_400_BAD_REQUEST)
 
-        ingredient.quantity += amount
-        ingredient.save()
+        # other staff may be moving the same stock, update the locked row
+        with transaction.atomic():
+            ingredient = Ingredient.objects.select_for_update().get(pk=pk, organization=request_organization(request))
+            ingredient.quantity += amount
+            ingredient.save()
         return Response({"message": "Inventory added.", "new_quantity": float(ingredient.quantity)})
 
     except Ingredient.DoesNotExist:
         return Response({"error": "Ingredient Not Found."}, status=status.HTTP_404_NOT_FOUND)
 
 # Deduct Amount from Ingredient (Internal Helper)
-def deduct_inventory_internal(user, ingredient_id, req_amount):
+def deduct_inventory_internal(organization, ingredient_id, req_amount):
     """Deduct a specified amount from an ingredient's quantity."""
     try:
-        ingredient = Ingredient.objects.get(pk=ingredient_id, user=user)
         try:
             amount = float(req_amount)
         except (TypeError, ValueError):
@@ -63,11 +97,16 @@ def deduct_inventory_internal(user, ingredient_id, req_amount):
         if amount <= 0:
             return {"error": "Amount must be positive.", "status" : status.HTTP_400_BAD_REQUEST}
 
-        if ingredient.quantity < amount:
-            return {"error": "Not enough inventory to deduct.", "status" : status.HTTP_400_BAD_REQUEST}
+        # lock the row so two members deducting at once can't both pass the stock check
+        with transaction.atomic():
+            ingredient = Ingredient.objects.select_for_update().get(pk=ingredient_id, organization=organization)
+            if ingredient.quantity < amount:
+                return {"error": "Not enough inventory to deduct.", "status" : status.HTTP_400_BAD_REQUEST}
 
-        ingredient.quantity -= amount
-        ingredient.save()
+            previous = ingredient.quantity
+            ingredient.quantity -= amount
+            ingredient.save()
+            emit_low_stock([(ingredient, previous)])
         return {"message": "Inventory added.", "new_quantity": float(ingredient.quantity)}
 
     except Ingredient.DoesNotExist:
@@ -75,14 +114,198 @@ def deduct_inventory_internal(user, ingredient_id, req_amount):
 
 # Deduct Amount from Ingredient (API View)
 @api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
 def deduct_inventory(request, pk):
     """Deduct a specified amount from an ingredient's quantity via HTTP POST."""
     amount = request.data.get("amount")
 
-    result = deduct_inventory_internal(request.user, pk, amount)
+    result = deduct_inventory_internal(request_organization(request), pk, amount)
 
     if "error" in result:
         return Response({"error": result["error"]}, status=result["status"])
 
-    return Response({"message": "Inventory deducted.", "new_quantity": result["new_quantity"]}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response({"message": "Inventory deducted.", "new_quantity": result["new_quantity"]}, status=status.HTTP_200_OK)
+
+# Recipes depending on an ingredient, with the cost impact of a hypothetical change
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def ingredient_recipes(request, pk):
+    """List every recipe using an ingredient and how its cost moves under a new price or quantity.
+
+    Optional query params: `cost` (new price), `quantity` (new stocked quantity) and
+    `change` (relative price change applied on top, ex 0.15 for +15%).
+    """
+    try:
+        ingredient = Ingredient.objects.get(pk=pk, organization=request_organization(request))
+    except Ingredient.DoesNotExist:
+        return Response({"error": "Ingredient Not Found."}, status=status.HTTP_404_NOT_FOUND)
+
+    params = request.query_params
+    try:
+        new_cost = Decimal(str(params.get("cost", ingredient.cost)))
+        new_quantity = float(params.get("quantity", ingredient.quantity))
+        change = Decimal(str(params.get("change", 0)))
+        # the change is bounded like a margin, from giving the ingredient away to 100x its price
+        if not valid_cost(new_cost) or not valid_margin(change):
+            raise ValueError
+        new_cost *= 1 + change
+        if not valid_cost(new_cost) or not valid_quantity(new_quantity):
+            raise ValueError
+    except (InvalidOperation, ValueError):
+        return Response({"error": f"Cost must be a number from {COST_RANGE[0]} to {COST_RANGE[1]}, quantity 0 or from "
+                                  f"{QUANTITY_RANGE[0]:g} to {QUANTITY_RANGE[1]:g} and change from {MARGIN_RANGE[0]} to "
+                                  f"{MARGIN_RANGE[1]}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # cost only the recipes using it, through a sub-recipe included
+    organization = request_organization(request)
+    using = dependent_ids(RecipeIngredient.objects.filter(ingredient=ingredient, recipe__isnull=False)
+                          .values_list("recipe_id", flat=True))
+    matrix = CostMatrix.for_organization(organization, using)
+    results = compare_totals(matrix.recipes, matrix.totals(), matrix.totals({ingredient.id: (new_quantity, new_cost)}))
+
+    return Response({
+        "ingredient": IngredientSerializer(ingredient).data,
+        "hypothetical": {"cost": float(round(new_cost, 2)), "quantity": new_quantity},
+        "recipes": results,
+    })
+
+# What to buy for a production plan
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def shopping_list(request):
+    """Purchases needed to bake a `plan`, a list of {"recipe": id, "batch_scale": 1} entries.
+
+    Each ingredient's purchase is what the plan needs beyond the stock held above
+    its low stock threshold, costed at its current price per unit.
+    """
+    organization = request_organization(request)
+    plan = {}
+    try:
+        entries = request.data.get("plan")
+        if not isinstance(entries, list) or not 0 < len(entries) <= SHOPPING_PLAN_LIMIT:
+            raise ValueError
+        for entry in entries:
+            recipe_id, scale = int(entry["recipe"]), float(entry.get("batch_scale", 1))
+            if not math.isfinite(scale) or scale <= 0:
+                raise ValueError
+            plan[recipe_id] = plan.get(recipe_id, 0) + scale
+    except (AttributeError, KeyError, OverflowError, TypeError, ValueError):
+        return Response({"error": f"Plan must be a list of up to {SHOPPING_PLAN_LIMIT} recipe and positive "
+                                  f"batch_scale entries."}, status=status.HTTP_400_BAD_REQUEST)
+
+    found = Recipe.objects.filter(pk__in=plan, organization=organization).values_list("id", flat=True)
+    missing = plan.keys() - set(found)
+    if missing:
+        return Response({"error": f"Recipe Not Found: {', '.join(map(str, sorted(missing)))}."},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    # one grouped query: every line weighted by the batches of its recipe, with one
+    # WHEN per distinct batch count since plans mostly repeat a few scales
+    batches = plan_batches(plan)
+    by_scale = {}
+    for recipe_id, amount in batches.items():
+        by_scale.setdefault(amount, []).append(recipe_id)
+    scale = Case(*[When(recipe_id__in=recipe_ids, then=Value(amount)) for amount, recipe_ids in by_scale.items()],
+                 default=Value(0.0), output_field=FloatField())
+    rows = (RecipeIngredient.objects
+            .filter(recipe_id__in=batches, ingredient__isnull=False, ingredient__organization=organization)
+            .values("ingredient_id", "ingredient__name", "ingredient__unit", "ingredient__quantity",
+                    "ingredient__low_stock_threshold", "ingredient__cost")
+            .annotate(required=Sum(F("amount") * scale))
+            .order_by("ingredient__name", "ingredient_id"))
+
+    items, total_cost = [], Decimal("0")
+    for row in rows:
+        quantity = row["ingredient__quantity"]
+        purchase = row["required"] - (quantity - row["ingredient__low_stock_threshold"])
+        if purchase <= 0:
+            continue
+        # None when the ingredient has no stock to price it from
+        cost = line_cost(purchase, quantity, row["ingredient__cost"])
+        total_cost += cost or 0
+        items.append({
+            "ingredient": row["ingredient_id"],
+            "name": row["ingredient__name"],
+            "unit": row["ingredient__unit"],
+            "required": round(row["required"], 3),
+            "quantity": quantity,
+            "low_stock_threshold": row["ingredient__low_stock_threshold"],
+            "purchase": round(purchase, 3),
+            "estimated_cost": None if cost is None else round_cost(cost),
+        })
+
+    return Response({"items": items, "total_cost": round_cost(total_cost)})
+
+# (ingredient_id, is_delta, amount) of one bulk adjustment entry
+def _parse_adjustment(entry):
+    if not isinstance(entry, dict) or ("delta" in entry) == ("count" in entry):
+        raise ValueError("Give an ingredient and either a delta or a count.")
+    try:
+        ingredient_id = int(entry.get("ingredient"))
+        amount = float(entry["delta"] if "delta" in entry else entry["count"])
+    except (OverflowError, TypeError, ValueError):
+        raise ValueError("Ingredient and amount must be valid numbers.")
+    if not math.isfinite(amount):
+        raise ValueError("Ingredient and amount must be valid numbers.")
+    return ingredient_id, "delta" in entry, amount
+
+# Adjust many ingredients at once, for deliveries and stocktakes
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def adjust_inventory(request):
+    """Apply `adjustments`, a list of {"ingredient": id, "delta": 5} or {"ingredient": id, "count": 120} entries.
+
+    A delta adds to (or, negative, takes from) the stock and a count replaces it, in
+    the order given. Either every entry is applied or none is, and the rejected
+    entries are reported together.
+    """
+    entries = request.data.get("adjustments")
+    if not isinstance(entries, list) or not 0 < len(entries) <= ADJUST_LIMIT:
+        return Response({"error": f"Adjustments must be a list of 1 to {ADJUST_LIMIT} entries."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    rejected, parsed = [], []
+    for index, entry in enumerate(entries):
+        try:
+            parsed.append((index, *_parse_adjustment(entry)))
+        except ValueError as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    with transaction.atomic():
+        # ownership checked and rows locked in one query, in id order like bakes
+        ingredients = Ingredient.objects.select_for_update().filter(
+            pk__in={ingredient_id for _, ingredient_id, _, _ in parsed}, organization=request_organization(request)
+        ).order_by("pk").in_bulk()
+
+        previous = {ingredient_id: ingredient.quantity for ingredient_id, ingredient in ingredients.items()}
+        for index, ingredient_id, is_delta, amount in parsed:
+            ingredient = ingredients.get(ingredient_id)
+            if ingredient is None:
+                rejected.append({"index": index, "ingredient": ingredient_id, "error": "Ingredient Not Found."})
+                continue
+            quantity = ingredient.quantity + amount if is_delta else amount
+            if quantity < 0:
+                rejected.append({"index": index, "ingredient": ingredient_id,
+                                 "error": "Not enough inventory to deduct." if is_delta else "Count can't be negative."})
+                continue
+            ingredient.quantity = quantity
+
+        if rejected:
+            rejected.sort(key=lambda item: item["index"])
+            return Response({"error": "No adjustments were applied.", "rejected": rejected},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # bulk_update skips auto_now and the save signals
+        now = timezone.now()
+        for ingredient in ingredients.values():
+            ingredient.updated_at = now
+        Ingredient.objects.bulk_update(ingredients.values(), ["quantity", "updated_at"])
+        invalidate_ingredients(ingredients)
+        emit_low_stock((ingredient, previous[ingredient_id]) for ingredient_id, ingredient in ingredients.items())
+
+    return Response({
+        "message": "Inventory adjusted.",
+        "ingredients": [{"id": ingredient.id, "new_quantity": float(ingredient.quantity)}
+                        for ingredient in sorted(ingredients.values(), key=lambda ingredient: ingredient.id)],
+    })
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import serve, serve_processes
+
+
+class Command(BaseCommand):
+    help = "Run background job workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1, help="Worker threads per process.")
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes to start.")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        threads = max(options["threads"], 1)
+        processes = max(options["processes"], 1)
+        self.stdout.write(f"Starting {processes} worker process(es) with {threads} thread(s) each.")
+
+        if processes == 1:
+            serve(threads, options["poll_interval"], options["burst"])
+        else:
+            serve_processes(processes, threads, options["poll_interval"], options["burst"])
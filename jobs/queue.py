@@ -0,0 +1,126 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import PermanentJobError, get_task
+
+logger = logging.getLogger(__name__)
+
+# how many due jobs a worker looks at per claim attempt before giving up
+CLAIM_BATCH = 10
+
+# Put a job on the queue
+def enqueue(user, task, payload=None, max_attempts=None, run_at=None):
+    return Job.objects.create(
+        user=user,
+        task=task,
+        payload=payload or {},
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+
+# Seconds to wait before the next attempt, doubling after every failure
+def retry_delay(attempts):
+    delay = settings.JOBS_RETRY_BACKOFF * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.JOBS_RETRY_BACKOFF_MAX)
+
+def claim_next_job(worker_id):
+    """Claim the oldest due job for worker_id, or return None when nothing is due.
+
+    Candidates are read with SELECT ... FOR UPDATE SKIP LOCKED where the database
+    supports it so concurrent workers never wait on each other's rows. The claim
+    itself is a conditional UPDATE on status, so on databases without row locks
+    (SQLite) two workers racing for the same row still only let one of them win.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+
+        for pk in candidates.values_list("pk", flat=True)[:CLAIM_BATCH]:
+            claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+    return None
+
+def _finish(job, **fields):
+    # only the worker holding the claim may record the outcome
+    fields["updated_at"] = timezone.now()
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(**fields)
+
+class Heartbeat:
+    """Refreshes a running job's locked_at from a side thread, so only jobs whose worker died look stale."""
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = interval or settings.JOBS_HEARTBEAT_INTERVAL
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, locked_by=self.job.locked_by).update(
+                        locked_at=timezone.now())
+                except OperationalError:
+                    # the task holds the database (ex SQLite lock), the next beat tries again
+                    logger.warning("Could not refresh the lock of job %s.", self.job.pk)
+        finally:
+            # the thread has its own connection
+            connection.close()
+
+def run_job(job):
+    """Run a claimed job and record its result, scheduling a retry if it failed."""
+    func = get_task(job.task)
+    try:
+        if func is None:
+            raise PermanentJobError(f"Unknown task '{job.task}'.")
+        with Heartbeat(job):
+            result = func(job)
+    except PermanentJobError as e:
+        _finish(job, status=Job.FAILED, error=str(e), locked_by="", locked_at=None)
+    except Exception as e:
+        if job.attempts < job.max_attempts:
+            # back off before trying again
+            _finish(job, status=Job.QUEUED, error=str(e), locked_by="", locked_at=None,
+                    run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)))
+        else:
+            _finish(job, status=Job.FAILED, error=str(e), locked_by="", locked_at=None)
+    else:
+        _finish(job, status=Job.SUCCEEDED, result=result, error="", locked_by="", locked_at=None)
+
+    job.refresh_from_db()
+    return job
+
+def requeue_stale_jobs():
+    """Release jobs whose worker died mid-run so another worker can pick them up."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, error="Worker stopped responding.", locked_by="", locked_at=None,
+        updated_at=timezone.now(),
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by="", locked_at=None, updated_at=timezone.now())
+    return requeued + failed
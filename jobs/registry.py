@@ -0,0 +1,24 @@
+_tasks = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a task when retrying cannot succeed (bad input, not enough stock, ...)."""
+
+
+# Register a function as a background task under the given name
+def task(name):
+    def decorator(func):
+        if name in _tasks and _tasks[name] is not func:
+            raise ValueError(f"Task '{name}' is already registered.")
+        _tasks[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    """Return the function registered under name, or None."""
+    return _tasks.get(name)
+
+
+def registered_tasks():
+    return sorted(_tasks)
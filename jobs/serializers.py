@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .models import Job
+from .registry import get_task
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'task', 'payload', 'status', 'result', 'error', 'attempts', 'max_attempts', 'run_at', 'created_at', 'updated_at']
+        read_only_fields = ['status', 'result', 'error', 'attempts', 'max_attempts', 'run_at', 'created_at', 'updated_at']
+
+    # only allow tasks that a worker knows how to run
+    def validate_task(self, value):
+        if get_task(value) is None:
+            raise serializers.ValidationError(f"Unknown task '{value}'.")
+        return value
+
+    # tasks read their arguments by name
+    def validate_payload(self, value):
+        if value is not None and not isinstance(value, dict):
+            raise serializers.ValidationError("Payload must be an object.")
+        return value
@@ -0,0 +1,149 @@
+import time
+from datetime import timedelta
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from inventory.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from .models import Job
+from .queue import claim_next_job, enqueue, requeue_stale_jobs, run_job
+from .registry import task
+from .worker import Worker
+from rest_framework import status
+
+
+@task("tests.flaky")
+def flaky(job):
+    raise RuntimeError("temporary failure")
+
+
+@task("tests.slow")
+def slow(job):
+    time.sleep(job.payload["seconds"])
+    return {"requeued": requeue_stale_jobs()}
+
+
+# Testing suite for the background job queue and worker
+class JobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="baker", password="testpass")
+        self.client.force_authenticate(user=self.user)
+
+        self.flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=3.00,
+                                               expiration_date="2025-12-31", low_stock_threshold=200)
+        self.recipe = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.flour, amount=400, unit="grams")
+
+    def test_async_bake_is_queued_then_run_by_worker(self):
+        """Test that an async bake returns 202 and only deducts once a worker runs it."""
+        response = self.client.post(f"/api/recipes/{self.recipe.id}/bake/", {"batch_scale": 2, "async": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.quantity, 1000)
+
+        self.assertTrue(Worker(name="test").run_once())
+
+        poll = self.client.get(response.data["status_url"])
+        self.assertEqual(poll.status_code, status.HTTP_200_OK)
+        self.assertEqual(poll.data["status"], Job.SUCCEEDED)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.quantity, 200)
+
+    def test_create_ingredients_job(self):
+        """Test queueing a bulk ingredient creation through the jobs endpoint."""
+        payload = {"ingredients": [
+            {"name": f"Spice {i}", "quantity": 10, "unit": "g", "cost": "1.00"} for i in range(5)
+        ]}
+        response = self.client.post("/api/jobs/", {"task": "inventory.create_ingredients", "payload": payload}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+
+        Worker(name="test").run_once()
+        job = Job.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result["created"], 5)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 6)
+
+    def test_unknown_task_rejected(self):
+        """Test that only registered tasks can be queued."""
+        response = self.client.post("/api/jobs/", {"task": "nope"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expiry_sweep_job_is_staff_only(self):
+        """Test that only staff can queue the cross-organization expiry sweep."""
+        self.flour.expiration_date = timezone.localdate() - timedelta(days=1)
+        self.flour.save()
+        job = enqueue(self.user, "inventory.sweep_expired")
+        run_job(claim_next_job("test"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+        staff = User.objects.create_user(username="ops", password="testpass", is_staff=True)
+        job = enqueue(staff, "inventory.sweep_expired")
+        run_job(claim_next_job("test"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result["written_off"], 1)
+
+    def test_failed_bake_is_not_retried(self):
+        """Test that a bake failing for lack of stock fails permanently."""
+        job = enqueue(self.user, "recipes.bake", {"recipe": self.recipe.id, "batch_scale": 10})
+        run_job(claim_next_job("test"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("Not enough Flour", job.error)
+
+    @override_settings(JOBS_RETRY_BACKOFF=5)
+    def test_retry_with_backoff(self):
+        """Test that a crashing task is requeued with a growing delay until attempts run out."""
+        job = enqueue(self.user, "tests.flaky", max_attempts=2)
+        job = run_job(claim_next_job("test"))
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+
+        # not due yet, so nothing is claimed
+        self.assertIsNone(claim_next_job("test"))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = run_job(claim_next_job("test"))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        """Test that a running job is invisible to other workers."""
+        enqueue(self.user, "recipes.cost_catalog")
+        self.assertIsNotNone(claim_next_job("worker-1"))
+        self.assertIsNone(claim_next_job("worker-2"))
+
+    @override_settings(JOBS_LOCK_TIMEOUT=60)
+    def test_stale_job_is_requeued(self):
+        """Test that a job left running by a dead worker goes back on the queue."""
+        job = enqueue(self.user, "recipes.cost_catalog")
+        claim_next_job("dead-worker")
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job = run_job(claim_next_job("worker-2"))
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result[0]["total_cost"], 1.2)
+
+    def test_jobs_are_private(self):
+        """Test that users can only poll their own jobs."""
+        other = User.objects.create_user(username="other", password="pass123")
+        job = enqueue(other, "recipes.cost_catalog")
+        response = self.client.get(f"/api/jobs/{job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# the heartbeat writes from its own thread and connection, so the job rows must be committed
+class HeartbeatTests(TransactionTestCase):
+    @override_settings(JOBS_LOCK_TIMEOUT=0.3, JOBS_HEARTBEAT_INTERVAL=0.05)
+    def test_long_running_job_is_not_requeued(self):
+        """Test that a job running past the lock timeout keeps its claim while its worker is alive."""
+        user = User.objects.create_user(username="baker", password="testpass")
+        job = enqueue(user, "tests.slow", {"seconds": 0.6})
+        job = run_job(claim_next_job("test"))
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"requeued": 0})
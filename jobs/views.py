@@ -0,0 +1,30 @@
+from rest_framework import generics, permissions
+from users.tenancy import ORGANIZATION_HEADER
+from .models import Job
+from .queue import enqueue
+from .serializers import JobSerializer
+
+# Queue a job / list the user's jobs
+class JobListCreateView(generics.ListCreateAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # only show jobs for logged in user, newest first
+        return Job.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        payload = dict(serializer.validated_data.get('payload') or {})
+        # tasks work in the organization the job was queued from, they check the membership when they run
+        organization = self.request.META.get(ORGANIZATION_HEADER)
+        if organization:
+            payload.setdefault('organization', organization)
+        serializer.instance = enqueue(self.request.user, serializer.validated_data['task'], payload)
+
+# Poll a single job's status and result
+class JobDetailView(generics.RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
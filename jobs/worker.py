@@ -0,0 +1,87 @@
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.db import OperationalError, close_old_connections, connection, connections
+
+from .queue import claim_next_job, requeue_stale_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Polls the job table and runs claimed jobs one at a time."""
+
+    def __init__(self, name=None, poll_interval=1.0):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+
+    # Claim and run a single job, returns False when the queue had nothing due
+    # and None when the database was too busy to tell
+    def run_once(self):
+        close_old_connections()
+        try:
+            job = claim_next_job(self.name)
+        except OperationalError:
+            # another writer holds the database (ex SQLite lock), try again next poll
+            logger.warning("Worker %s could not claim a job, retrying.", self.name)
+            return None
+        if job is None:
+            return False
+        run_job(job)
+        return True
+
+    def run(self, stop_event, burst=False):
+        """Process jobs until stop_event is set, or the queue is empty when burst is True."""
+        try:
+            while not stop_event.is_set():
+                processed = self.run_once()
+                if processed:
+                    continue
+                if burst and processed is False:
+                    break
+                requeue_stale_jobs()
+                stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+# Run a pool of worker threads in the current process
+def serve(threads=1, poll_interval=1.0, burst=False, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    pool = [
+        threading.Thread(target=Worker(poll_interval=poll_interval).run, args=(stop_event, burst), daemon=True)
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            for thread in pool:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in pool:
+            thread.join()
+
+# Run `processes` worker processes, each with its own pool of threads
+def serve_processes(processes, threads=1, poll_interval=1.0, burst=False):
+    # connections must not be shared with forked children
+    connections.close_all()
+    children = [
+        multiprocessing.Process(target=serve, args=(threads, poll_interval, burst))
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.join()
@@ -0,0 +1,136 @@
+"""Delivery of outbox events to the ordering system.
+
+The dispatcher claims the oldest due events in batches and POSTs each batch
+as one JSON document to OUTBOX_URL, signed with OUTBOX_SECRET when set:
+
+    {"events": [{"id": 1, "type": "bake.completed", "organization": 3,
+                 "created_at": "...", "attempt": 1, "data": {...}}]}
+
+Any 2xx answer marks the batch delivered. Anything else, a timeout or a
+refused connection included, sends it back to the queue with a delay that
+doubles on every attempt, up to OUTBOX_MAX_ATTEMPTS before an event is
+marked failed. Claiming an event pushes its next_attempt_at past the time
+a delivery may take, so other dispatchers skip it while it's in flight and
+it comes back by itself if its dispatcher dies. Delivery is at least once:
+receivers drop event ids they have already seen.
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import threading
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Bakershub-Signature"
+
+# Seconds to wait before the next attempt, doubling after every failure
+def retry_delay(attempts):
+    delay = settings.OUTBOX_RETRY_BACKOFF * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.OUTBOX_RETRY_BACKOFF_MAX)
+
+def claim_batch(size=None):
+    """Claim up to size due events, oldest first, for one delivery attempt."""
+    now = timezone.now()
+    # long enough for the request to time out before anyone else retries the batch
+    lease = now + timedelta(seconds=settings.OUTBOX_TIMEOUT * 3)
+    with transaction.atomic():
+        due = Event.objects.filter(status=Event.PENDING, next_attempt_at__lte=now).order_by("next_attempt_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        events = list(due[:size or settings.OUTBOX_BATCH_SIZE])
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(
+            next_attempt_at=lease, attempts=F("attempts") + 1)
+    for event in events:
+        event.attempts += 1
+    return events
+
+def encode(events):
+    return json.dumps({"events": [{
+        "id": event.id,
+        "type": event.kind,
+        "organization": event.organization_id,
+        "created_at": event.created_at,
+        "attempt": event.attempts,
+        "data": event.payload,
+    } for event in events]}, cls=DjangoJSONEncoder).encode()
+
+def sign(body, secret):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def send(events):
+    """POST a batch to the receiver, raises OSError or HTTPException when it isn't accepted."""
+    body = encode(events)
+    headers = {"Content-Type": "application/json", "User-Agent": "bakershub-outbox"}
+    if settings.OUTBOX_SECRET:
+        headers[SIGNATURE_HEADER] = sign(body, settings.OUTBOX_SECRET)
+    request = urllib.request.Request(settings.OUTBOX_URL, data=body, headers=headers, method="POST")
+    # urlopen raises HTTPError (an OSError) for error statuses
+    with urllib.request.urlopen(request, timeout=settings.OUTBOX_TIMEOUT) as response:
+        response.read()
+
+def _failed(events, error):
+    now = timezone.now()
+    by_attempts = {}
+    for event in events:
+        by_attempts.setdefault(event.attempts, []).append(event.pk)
+    for attempts, ids in by_attempts.items():
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            Event.objects.filter(pk__in=ids).update(status=Event.FAILED, error=error)
+        else:
+            Event.objects.filter(pk__in=ids).update(
+                error=error, next_attempt_at=now + timedelta(seconds=retry_delay(attempts)))
+
+def dispatch_once(size=None):
+    """Claim and deliver one batch, returns how many events it had."""
+    events = claim_batch(size)
+    if not events:
+        return 0
+    try:
+        send(events)
+    except (OSError, http.client.HTTPException) as e:
+        logger.warning("Delivering %d event(s) failed: %s", len(events), e)
+        _failed(events, str(e) or e.__class__.__name__)
+    else:
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(
+            status=Event.DELIVERED, delivered_at=timezone.now(), error="")
+    return len(events)
+
+
+class Dispatcher:
+    """Delivers outbox events until stopped, batches back to back while there's a backlog."""
+
+    def __init__(self, batch_size=None, poll_interval=1.0):
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval
+
+    def run(self, stop_event=None, burst=False):
+        """Dispatch until stop_event is set, or nothing is due when burst is True."""
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                close_old_connections()
+                try:
+                    sent = dispatch_once(self.batch_size)
+                except OperationalError:
+                    # another writer holds the database (ex SQLite lock), try again next poll
+                    logger.warning("Dispatcher could not claim events, retrying.")
+                    sent = None
+                if sent == self.batch_size:
+                    continue
+                if burst and sent == 0:
+                    break
+                stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
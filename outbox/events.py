@@ -0,0 +1,32 @@
+"""Events for the ordering system, written to the outbox.
+
+Events are rows saved by the code making the change, so they are committed
+or rolled back with it: a bake that fails leaves no bake event behind and a
+bake that commits always has one. Sending them is left to the dispatcher
+(outbox/dispatcher.py), so requests never wait on the receiver.
+"""
+from .models import Event
+
+BAKE_COMPLETED = "bake.completed"
+LOW_STOCK = "inventory.low_stock"
+
+def emit(organization_id, kind, payload):
+    return Event.objects.create(organization_id=organization_id, kind=kind, payload=payload)
+
+def low_stock_event(ingredient, previous_quantity):
+    """Unsaved low stock event when ingredient just fell to or below its threshold, otherwise None."""
+    threshold = ingredient.low_stock_threshold
+    if not ingredient.quantity <= threshold < previous_quantity:
+        return None
+    return Event(organization_id=ingredient.organization_id, kind=LOW_STOCK, payload={
+        "ingredient": ingredient.id,
+        "name": ingredient.name,
+        "quantity": ingredient.quantity,
+        "unit": ingredient.unit,
+        "low_stock_threshold": threshold,
+    })
+
+def emit_low_stock(changes):
+    """Save the low stock events of (ingredient, previous_quantity) changes."""
+    events = [event for event in (low_stock_event(ingredient, previous) for ingredient, previous in changes) if event]
+    return Event.objects.bulk_create(events)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from outbox.dispatcher import Dispatcher
+
+
+class Command(BaseCommand):
+    help = "Deliver outbox events to the ordering system."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait between polls when no event is due.")
+        parser.add_argument("--burst", action="store_true", help="Exit once no event is due.")
+
+    def handle(self, *args, **options):
+        if not settings.OUTBOX_URL:
+            raise CommandError("Set OUTBOX_URL (BAKERSHUB_OUTBOX_URL) to the receiver of the events.")
+        self.stdout.write(f"Dispatching events to {settings.OUTBOX_URL}.")
+        try:
+            Dispatcher(max(options["batch_size"], 1), options["poll_interval"]).run(burst=options["burst"])
+        except KeyboardInterrupt:
+            pass
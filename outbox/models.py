@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+from users.models import Organization
+
+# Create your models here.
+class Event(models.Model):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (DELIVERED, "Delivered"),
+        (FAILED, "Failed"),
+    ]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="events")
+    kind = models.CharField(max_length=100) # ex inventory.low_stock
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # earliest time the dispatcher may send the event, pushed back while a batch is in flight
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the dispatcher polls for the oldest due pending events
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_event_due_idx"),
+        ]
+
+    # to display object nicely
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
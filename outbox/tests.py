@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from inventory.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from .dispatcher import SIGNATURE_HEADER, dispatch_once, sign
+from .events import BAKE_COMPLETED, LOW_STOCK
+from .models import Event
+from rest_framework import status
+
+
+# Local stand-in for the ordering system, answering every POST with `status` after `delay` seconds
+class Receiver(HTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ReceiverHandler)
+        self.status, self.delay, self.requests = 200, 0, []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/events"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((dict(self.headers), body))
+        time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# Testing suite for the event outbox and its dispatcher
+@override_settings(OUTBOX_SECRET="s3cret", OUTBOX_RETRY_BACKOFF=5, OUTBOX_MAX_ATTEMPTS=2, OUTBOX_TIMEOUT=1)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="baker", password="testpass")
+        self.client.force_authenticate(user=self.user)
+        self.flour = Ingredient.objects.create(user=self.user, name="Flour", quantity=1000, unit="grams", cost=3.00,
+                                               low_stock_threshold=300)
+        self.recipe = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.flour, amount=400, unit="grams")
+        self.receiver = Receiver()
+        self.addCleanup(self.receiver.stop)
+        self.enterContext(override_settings(OUTBOX_URL=self.receiver.url))
+
+    def test_events_are_written_with_the_change(self):
+        """Test that a bake records its events without calling the receiver, and a failed bake records none."""
+        self.receiver.delay = 2
+        started = time.perf_counter()
+        response = self.client.post(f"/api/recipes/{self.recipe.id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(self.receiver.requests, [])
+        # only crossing the threshold raises the alert
+        self.client.post(f"/api/recipes/{self.recipe.id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(list(Event.objects.order_by("id").values_list("kind", flat=True)),
+                         [BAKE_COMPLETED, LOW_STOCK, BAKE_COMPLETED])
+        self.assertEqual(Event.objects.get(kind=LOW_STOCK).payload["quantity"], 200)
+
+        response = self.client.post(f"/api/recipes/{self.recipe.id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Event.objects.count(), 3)
+
+    def test_dispatch_delivers_signed_batches(self):
+        """Test that due events are sent in one signed batch and marked delivered."""
+        self.client.post(f"/api/inventory/ingredients/{self.flour.id}/deduct/", {"amount": 800}, format="json")
+        self.client.post(f"/api/recipes/{self.recipe.id}/bake/", {"batch_scale": 0.25}, format="json")
+        self.assertEqual(dispatch_once(), 2)
+
+        headers, body = self.receiver.requests[0]
+        self.assertEqual(headers[SIGNATURE_HEADER], sign(body, "s3cret"))
+        events = json.loads(body)["events"]
+        self.assertEqual([event["type"] for event in events], [LOW_STOCK, BAKE_COMPLETED])
+        self.assertEqual(events[1]["data"]["used"], [{"ingredient": self.flour.id, "amount": 100}])
+        self.assertEqual(Event.objects.filter(status=Event.DELIVERED).count(), 2)
+        self.assertEqual(dispatch_once(), 0)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        """Test that an unhealthy receiver gets the batch again later, until the attempts run out."""
+        self.client.post(f"/api/inventory/ingredients/{self.flour.id}/deduct/", {"amount": 800}, format="json")
+        self.receiver.status = 503
+        with self.assertLogs("outbox.dispatcher", "WARNING"):
+            self.assertEqual(dispatch_once(), 1)
+        event = Event.objects.get()
+        self.assertEqual((event.status, event.attempts), (Event.PENDING, 1))
+        self.assertIn("503", event.error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertEqual(dispatch_once(), 0)
+
+        # a timeout counts as a failure too, and it was the last attempt
+        Event.objects.update(next_attempt_at=timezone.now())
+        self.receiver.status, self.receiver.delay = 200, 1.5
+        with self.assertLogs("outbox.dispatcher", "WARNING"):
+            dispatch_once()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (Event.FAILED, 2))
+
+    def test_dispatch_backlog_in_batches(self):
+        """Test that a backlog goes out in batches of the given size."""
+        for quantity in range(5):
+            Ingredient.objects.create(user=self.user, name=f"Spice {quantity}", quantity=10, unit="g", cost=1.00,
+                                      low_stock_threshold=5)
+        for ingredient in Ingredient.objects.filter(name__startswith="Spice"):
+            self.client.post(f"/api/inventory/ingredients/{ingredient.id}/deduct/", {"amount": 6}, format="json")
+        while dispatch_once(2):
+            pass
+        self.assertEqual([len(json.loads(body)["events"]) for _, body in self.receiver.requests], [2, 2, 1])
+        self.assertFalse(Event.objects.exclude(status=Event.DELIVERED).exists())
@@ -0,0 +1,44 @@
+"""Read-through cache of serialized recipe details.
+
+Entries live in the "recipes" cache (a size-bounded LRU, see CACHES in
+settings) keyed by recipe id, and remember the owning organization so they
+are only ever served back to its members. recipes/signals.py drops an entry whenever the recipe,
+one of its RecipeIngredient rows or a referenced Ingredient changes, and along
+with it the entries of every recipe using it as a sub-recipe. Code that
+writes through queryset.update() or bulk_update() skips those signals and must
+call invalidate_recipes() itself.
+"""
+from django.core.cache import caches
+from django.db import transaction
+
+from .components import dependent_ids
+from .models import RecipeIngredient
+
+def detail_key(recipe_id):
+    return f"recipe-detail:{recipe_id}"
+
+def get_cached_detail(organization_id, recipe_id):
+    """Return the cached serialized recipe for its organization, or None."""
+    entry = caches["recipes"].get(detail_key(recipe_id))
+    if entry is None or entry[0] != organization_id:
+        return None
+    return entry[1]
+
+def cache_detail(recipe, data):
+    caches["recipes"].set(detail_key(recipe.pk), (recipe.organization_id, data))
+
+def invalidate_recipes(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    # the costs of every recipe built on these ones change with them
+    keys = [detail_key(recipe_id) for recipe_id in dependent_ids(recipe_ids)]
+    cache = caches["recipes"]
+    cache.delete_many(keys)
+    # a concurrent request may cache the old state again before this transaction commits
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+def invalidate_ingredients(ingredient_ids):
+    """Drop the details of every recipe using one of ingredient_ids, their quantity and cost feed the costs."""
+    invalidate_recipes(RecipeIngredient.objects.filter(ingredient_id__in=list(ingredient_ids), recipe__isnull=False)
+                       .values_list("recipe_id", flat=True))
@@ -0,0 +1,151 @@
+"""Sub-recipes: recipe lines whose component is another recipe.
+
+A component line's amount is a number of batches of the component recipe, ex
+0.5 of "Sweet Dough". Recipes and their components form a DAG (cycles are
+rejected when a recipe is saved). RecipeGraph loads every recipe below a set
+of roots with one recursive query plus one query for their lines, however
+deep the components nest, and flattens each recipe into the total amount of
+every ingredient in one batch. Flattened recipes are memoized, so a component
+shared by many recipes (or many times in one) is only worked out once.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import Recipe, RecipeIngredient
+
+
+class RecipeCycleError(ValueError):
+    pass
+
+def _recursive_ids(recipe_ids, down=True):
+    """Ids of recipe_ids and every recipe below them (down) or using them (up), in one query."""
+    recipe_ids = [int(recipe_id) for recipe_id in set(recipe_ids)]
+    if not recipe_ids:
+        return set()
+    lines = RecipeIngredient._meta.db_table
+    # UNION rather than UNION ALL stops at recipes already visited, even on a cycle
+    join, select = ("l.recipe_id = t.id", "l.component_id") if down else ("l.component_id = t.id", "l.recipe_id")
+    sql = (
+        f"WITH RECURSIVE t(id) AS ("
+        f"SELECT id FROM {Recipe._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(recipe_ids))}) "
+        f"UNION SELECT {select} FROM {lines} l JOIN t ON {join} "
+        f"WHERE l.component_id IS NOT NULL AND l.recipe_id IS NOT NULL"
+        f") SELECT id FROM t"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, recipe_ids)
+        # the given ids are kept even when the recipe is already deleted
+        return set(recipe_ids) | {row[0] for row in cursor.fetchall()}
+
+def component_ids(recipe_ids):
+    """recipe_ids and every recipe they contain, at any depth."""
+    return _recursive_ids(recipe_ids, down=True)
+
+def dependent_ids(recipe_ids):
+    """recipe_ids and every recipe containing them, at any depth."""
+    return _recursive_ids(recipe_ids, down=False)
+
+def plan_batches(plan):
+    """Batches of every recipe a production plan makes, sub-recipes included, as {recipe_id: batches}.
+
+    plan maps recipe ids to batches. A component line adds its amount times the
+    batches of the recipe using it to the component, in topological order so a
+    component shared by several recipes is only passed on once it is complete.
+    """
+    ids = component_ids(plan)
+    children, parents = {}, {}
+    for recipe_id, component_id, amount in (RecipeIngredient.objects
+                                            .filter(recipe_id__in=ids, component__isnull=False)
+                                            .values_list("recipe_id", "component_id", "amount")):
+        children.setdefault(recipe_id, []).append((component_id, amount))
+        parents[component_id] = parents.get(component_id, 0) + 1
+
+    batches = {recipe_id: float(scale) for recipe_id, scale in plan.items()}
+    ready = [recipe_id for recipe_id in ids if not parents.get(recipe_id)]
+    while ready:
+        recipe_id = ready.pop()
+        for component_id, amount in children.get(recipe_id, ()):
+            batches[component_id] = batches.get(component_id, 0.0) + batches.get(recipe_id, 0.0) * amount
+            parents[component_id] -= 1
+            if not parents[component_id]:
+                ready.append(component_id)
+    return batches
+
+
+class RecipeGraph:
+    """Live lines of a set of recipes, flattened into per-batch ingredient amounts on demand."""
+
+    def __init__(self, lines=()):
+        # recipe_id -> [(ingredient_id, component_id, amount)]
+        self.lines = {}
+        self.loaded = set()
+        self._flat = {}
+        self.add_lines(lines)
+
+    def add_lines(self, lines):
+        """Add (recipe_id, ingredient_id, component_id, amount) rows."""
+        for recipe_id, ingredient_id, component_id, amount in lines:
+            self.lines.setdefault(recipe_id, []).append((ingredient_id, component_id, amount))
+            self.loaded.add(recipe_id)
+
+    def load(self, recipe_ids):
+        """Load recipe_ids and everything below them, skipping recipes already loaded (two queries)."""
+        missing = set(recipe_ids) - self.loaded
+        if not missing:
+            return
+        ids = component_ids(missing) - self.loaded
+        self.add_lines(RecipeIngredient.objects.filter(recipe_id__in=ids)
+                       .values_list("recipe_id", "ingredient_id", "component_id", "amount"))
+        # recipes without any line are loaded too
+        self.loaded |= ids
+
+    def flatten(self, recipe_id):
+        """Total amount of every ingredient in one batch of recipe_id, as {ingredient_id: Decimal}."""
+        if recipe_id in self._flat:
+            return self._flat[recipe_id]
+
+        # iterative depth-first post-order, so deep nesting can't hit the recursion limit
+        visiting = set()
+        stack = [(recipe_id, False)]
+        while stack:
+            current, children_done = stack.pop()
+            if current in self._flat:
+                continue
+            if children_done:
+                totals = {}
+                for ingredient_id, component_id, amount in self.lines.get(current, ()):
+                    amount = Decimal(str(amount))
+                    if component_id is None:
+                        totals[ingredient_id] = totals.get(ingredient_id, 0) + amount
+                    else:
+                        for leaf_id, leaf_amount in self._flat[component_id].items():
+                            totals[leaf_id] = totals.get(leaf_id, 0) + leaf_amount * amount
+                self._flat[current] = totals
+                visiting.discard(current)
+                continue
+
+            if current in visiting:
+                raise RecipeCycleError(f"Recipe {current} contains itself.")
+            visiting.add(current)
+            stack.append((current, True))
+            for _, component_id, _ in self.lines.get(current, ()):
+                if component_id is not None and component_id not in self._flat:
+                    if component_id in visiting:
+                        raise RecipeCycleError(f"Recipe {component_id} contains itself.")
+                    stack.append((component_id, False))
+        return self._flat[recipe_id]
+
+    def expand(self, lines):
+        """Leaf (ingredient_id, amount) entries of (ingredient_id, component_id, amount) lines.
+
+        Ingredient lines are passed through untouched and component lines are
+        replaced by their flattened ingredients, scaled by the batches used.
+        """
+        self.load({component_id for _, component_id, _ in lines if component_id is not None})
+        for ingredient_id, component_id, amount in lines:
+            if component_id is None:
+                yield ingredient_id, amount
+            else:
+                for leaf_id, leaf_amount in self.flatten(component_id).items():
+                    yield leaf_id, leaf_amount * Decimal(str(amount))
@@ -0,0 +1,164 @@
+from array import array
+from decimal import Decimal, InvalidOperation
+
+# Cost of using `amount` of an ingredient whose stocked `quantity` cost `cost`,
+# None when the ingredient can't be costed (no stock or no cost)
+def line_cost(amount, quantity, cost):
+    try:
+        # Converting to decimal before calculations
+        # Amount of ingredient / Total amount of ingredient in inventory
+        return (Decimal(str(amount)) / Decimal(str(quantity))) * Decimal(str(cost))
+    except (ZeroDivisionError, InvalidOperation):
+        return None
+
+# Round a Decimal total the way the API reports costs
+def round_cost(total):
+    return float(round(total, 2))
+
+def cost_per_serving(total_cost, servings):
+    try:
+        return round(total_cost / servings, 2)
+    except (ZeroDivisionError, InvalidOperation):
+        return 0.0
+
+# Price for a total cost at a profit margin, ex 0.25 for 25% on top of cost
+# margins a price may be suggested for, from giving the recipe away to 100x its cost
+MARGIN_RANGE = (Decimal("-1"), Decimal("100"))
+
+def valid_margin(margin):
+    return margin.is_finite() and MARGIN_RANGE[0] <= margin <= MARGIN_RANGE[1]
+
+# costs and stocked quantities a what-if may assume: a cost fits Ingredient.cost, and a stocked
+# quantity is either none at all or not so small that the costs it divides overflow
+COST_RANGE = (Decimal("0"), Decimal("999999.99"))
+QUANTITY_RANGE = (1e-6, 1e12)
+
+def valid_cost(cost):
+    return cost.is_finite() and COST_RANGE[0] <= cost <= COST_RANGE[1]
+
+def valid_quantity(quantity):
+    return quantity == 0 or QUANTITY_RANGE[0] <= quantity <= QUANTITY_RANGE[1]
+
+def suggested_price(total_cost, margin):
+    return float(round(Decimal(str(total_cost)) * (1 + margin), 2))
+
+# Old vs new cost rows for the given recipes, as returned by the what-if endpoints
+def compare_totals(recipes, old_totals, new_totals):
+    """recipes yields (id, name, servings); totals map recipe id to an unrounded Decimal."""
+    results = []
+    for recipe_id, name, servings in recipes:
+        old_total = old_totals.get(recipe_id, Decimal("0.00"))
+        new_total = new_totals.get(recipe_id, Decimal("0.00"))
+        results.append({
+            "id": recipe_id,
+            "name": name,
+            "servings": servings,
+            "total_cost": round_cost(old_total),
+            "new_total_cost": round_cost(new_total),
+            "cost_delta": round_cost(new_total - old_total),
+            "cost_per_serving": cost_per_serving(round_cost(old_total), servings),
+            "new_cost_per_serving": cost_per_serving(round_cost(new_total), servings),
+        })
+    return results
+
+
+class CostMatrix:
+    """A user's whole catalog as a sparse recipe x ingredient matrix of amounts.
+
+    Rows are stored in compressed sparse row form (indptr / indices / amounts)
+    next to per-ingredient quantity and cost vectors, all converted to Decimal
+    once. Costing the catalog is then a single pass over the non-zero entries
+    using the same per-line formula as RecipeSerializer.get_total_cost, so the
+    cents always agree with the serializer, and price changes only swap entries
+    of the ingredient vectors.
+    """
+
+    def __init__(self, recipes, lines, ingredients):
+        # recipes: (id, name, servings), lines: (recipe_id, ingredient_id, amount),
+        # ingredients: (id, quantity, cost)
+        self.recipes = list(recipes)
+        self.columns = {}
+        self.quantities = []
+        self.costs = []
+        for ingredient_id, quantity, cost in ingredients:
+            self.columns[ingredient_id] = len(self.quantities)
+            self.quantities.append(quantity)
+            self.costs.append(cost)
+
+        rows = {recipe[0]: [] for recipe in self.recipes}
+        for recipe_id, ingredient_id, amount in lines:
+            rows[recipe_id].append((self.columns[ingredient_id], Decimal(str(amount))))
+
+        self.indptr = array("q", [0])
+        self.indices = array("q")
+        self.amounts = []
+        for recipe in self.recipes:
+            for column, amount in rows[recipe[0]]:
+                self.indices.append(column)
+                self.amounts.append(amount)
+            self.indptr.append(len(self.indices))
+
+    @classmethod
+    def for_organization(cls, organization, recipe_ids=None):
+        """Load the matrix for an organization's recipes, sub-recipes flattened into their ingredients.
+
+        The whole catalog takes three queries. With recipe_ids only those recipes are rows, loaded
+        in four queries however deep their components nest.
+        """
+        from inventory.models import Ingredient
+        from .components import RecipeGraph
+        from .models import Recipe, RecipeIngredient
+
+        recipes = Recipe.objects.filter(organization=organization)
+        if recipe_ids is None:
+            # components belong to the same organization, so their lines are part of the same query
+            graph = RecipeGraph(RecipeIngredient.objects.filter(recipe__organization=organization)
+                                .values_list("recipe_id", "ingredient_id", "component_id", "amount"))
+        else:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            graph = RecipeGraph()
+            graph.load(recipe_ids)
+        recipes = list(recipes.order_by("name", "id").values_list("id", "name", "servings"))
+        graph.loaded.update(recipe[0] for recipe in recipes)
+        lines = [
+            (recipe[0], ingredient_id, amount)
+            for recipe in recipes
+            for ingredient_id, amount in graph.expand(graph.lines.get(recipe[0], []))
+        ]
+        if recipe_ids is None:
+            ingredients = Ingredient.objects.filter(recipeingredient__recipe__organization=organization).distinct()
+        else:
+            ingredients = Ingredient.objects.filter(pk__in={ingredient_id for _, ingredient_id, _ in lines})
+        return cls(recipes, lines, ingredients.values_list("id", "quantity", "cost"))
+
+    # Per-ingredient Decimal vectors, None where the ingredient can't be costed
+    def _vectors(self, overrides):
+        quantities, costs = list(self.quantities), list(self.costs)
+        for ingredient_id, (quantity, cost) in overrides.items():
+            column = self.columns.get(ingredient_id)
+            if column is not None:
+                quantities[column], costs[column] = quantity, cost
+
+        vector = []
+        for quantity, cost in zip(quantities, costs):
+            try:
+                quantity, cost = Decimal(str(quantity)), Decimal(str(cost))
+                vector.append((quantity, cost) if quantity != 0 else None)
+            except InvalidOperation:
+                vector.append(None)
+        return vector
+
+    def totals(self, overrides=None):
+        """Unrounded total cost per recipe id, overrides maps ingredient_id to (quantity, cost)."""
+        vector = self._vectors(overrides or {})
+        indptr, indices, amounts = self.indptr, self.indices, self.amounts
+        totals = {}
+        for row, recipe in enumerate(self.recipes):
+            total = Decimal("0.00")
+            for entry in range(indptr[row], indptr[row + 1]):
+                pair = vector[indices[entry]]
+                if pair is not None:
+                    # same formula as line_cost: (amount / quantity) * cost
+                    total += (amounts[entry] / pair[0]) * pair[1]
+            totals[recipe[0]] = total
+        return totals
@@ -0,0 +1,89 @@
+"""Ingredient demand forecasts from bake history.
+
+The database sums what bakes used per ingredient and day over the last
+HISTORY_WEEKS whole weeks, in one grouped query. Each ingredient's forecast
+is its moving average daily use over the last `window` days, shaped by its
+weekday seasonality: how much more or less than average it is used on each
+day of the week. The work grows with the number of (ingredient, day) rows
+that had bakes, never with ingredients x days of history, and each
+ingredient's week is worked out once however many days are forecast.
+
+Only whole days (up to yesterday) are used, so a forecast is cached until
+midnight. Current stock levels are added on every call.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import Ingredient
+from .models import BakeLine
+
+HISTORY_WEEKS = 8
+HISTORY_DAYS = HISTORY_WEEKS * 7
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def daily_usage(organization, start, end):
+    """(ingredient_id, date, amount) totals of bakes from start up to, not including, end."""
+    return (BakeLine.objects
+            .filter(ingredient__organization=organization,
+                    bake__created_at__gte=_day_start(start), bake__created_at__lt=_day_start(end))
+            .annotate(day=TruncDate("bake__created_at"))
+            .values("ingredient_id", "day").annotate(total=Sum("amount")).order_by()
+            .values_list("ingredient_id", "day", "total"))
+
+def project(rows, today, days, window):
+    """Forecast the next `days` days from today, as {ingredient_id: (daily_average, [amount per day], total)}."""
+    recent_start = today - timedelta(days=window)
+    # ingredient_id -> [use on each weekday, Monday first] and use within the window
+    weekdays, recent = {}, {}
+    for ingredient_id, day, amount in rows:
+        weekdays.setdefault(ingredient_id, [0.0] * 7)[day.weekday()] += amount
+        if day >= recent_start:
+            recent[ingredient_id] = recent.get(ingredient_id, 0.0) + amount
+
+    ahead = [(today + timedelta(days=offset)).weekday() for offset in range(days)]
+    projected = {}
+    for ingredient_id, by_weekday in weekdays.items():
+        average = recent.get(ingredient_id, 0.0) / window
+        # every weekday occurs HISTORY_WEEKS times in the history, the factors average to 1
+        total = sum(by_weekday)
+        week = [average * 7 * used / total for used in by_weekday]
+        daily = [week[weekday] for weekday in ahead]
+        projected[ingredient_id] = (round(average, 3), [round(amount, 3) for amount in daily], round(sum(daily), 3))
+    return projected
+
+def forecast_demand(organization, days=7, window=28):
+    """Per-ingredient forecast rows for the organization, ingredients never baked with are left out."""
+    today = timezone.localdate()
+    key = f"demand-forecast:{organization.id}:{today.isoformat()}:{days}:{window}"
+    projected = cache.get(key)
+    if projected is None:
+        rows = daily_usage(organization, today - timedelta(days=HISTORY_DAYS), today)
+        projected = project(rows, today, days, window)
+        until_midnight = (_day_start(today + timedelta(days=1)) - timezone.now()).total_seconds()
+        cache.set(key, projected, max(int(until_midnight), 1))
+
+    forecast = []
+    ingredients = (Ingredient.objects.filter(organization=organization).order_by("name", "id")
+                   .values_list("id", "name", "unit", "quantity"))
+    for ingredient_id, name, unit, quantity in ingredients:
+        if ingredient_id not in projected:
+            continue
+        average, daily, total = projected[ingredient_id]
+        forecast.append({
+            "ingredient": ingredient_id,
+            "name": name,
+            "unit": unit,
+            "quantity": quantity,
+            "daily_average": average,
+            "forecast": daily,
+            "total": total,
+            # what to order to get through the period
+            "shortfall": round(max(total - quantity, 0), 3),
+        })
+    return forecast
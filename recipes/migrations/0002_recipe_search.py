@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-19 13:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, description, ingredients, "
+    "content='recipes_recipesearchdocument', content_rowid='recipe_id', tokenize='porter unicode61')",
+    "CREATE TRIGGER recipes_recipe_fts_ai AFTER INSERT ON recipes_recipesearchdocument BEGIN "
+    "INSERT INTO recipes_recipe_fts(rowid, name, description, ingredients) "
+    "VALUES (new.recipe_id, new.name, new.description, new.ingredients); END",
+    "CREATE TRIGGER recipes_recipe_fts_ad AFTER DELETE ON recipes_recipesearchdocument BEGIN "
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, description, ingredients) "
+    "VALUES ('delete', old.recipe_id, old.name, old.description, old.ingredients); END",
+    "CREATE TRIGGER recipes_recipe_fts_au AFTER UPDATE ON recipes_recipesearchdocument BEGIN "
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, description, ingredients) "
+    "VALUES ('delete', old.recipe_id, old.name, old.description, old.ingredients); "
+    "INSERT INTO recipes_recipe_fts(rowid, name, description, ingredients) "
+    "VALUES (new.recipe_id, new.name, new.description, new.ingredients); END",
+]
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_ai",
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_ad",
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_au",
+    "DROP TABLE IF EXISTS recipes_recipe_fts",
+]
+
+# must stay identical to recipes.search.PG_DOCUMENT
+POSTGRES_GIN = [
+    "CREATE INDEX recipes_search_document_gin ON recipes_recipesearchdocument USING GIN (("
+    "setweight(to_tsvector('english', name), 'A') || "
+    "setweight(to_tsvector('english', ingredients), 'B') || "
+    "setweight(to_tsvector('english', description), 'C')))",
+]
+
+POSTGRES_GIN_DROP = ["DROP INDEX IF EXISTS recipes_search_document_gin"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def build_documents(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    RecipeSearchDocument = apps.get_model("recipes", "RecipeSearchDocument")
+
+    names = {}
+    for recipe_id, ingredient_name in RecipeIngredient.objects.values_list("recipe_id", "ingredient__name"):
+        names.setdefault(recipe_id, []).append(ingredient_name)
+
+    RecipeSearchDocument.objects.bulk_create([
+        RecipeSearchDocument(recipe_id=recipe.id, user_id=recipe.user_id, name=recipe.name,
+                             description=recipe.description, ingredients=" ".join(names.get(recipe.id, [])))
+        for recipe in Recipe.objects.all()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='recipes.recipe')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('ingredients', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FTS, "postgresql": POSTGRES_GIN}),
+            run_for_vendor({"sqlite": SQLITE_FTS_DROP, "postgresql": POSTGRES_GIN_DROP}),
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
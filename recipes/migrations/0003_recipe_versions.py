@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-19 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Every existing recipe starts out at version 1 with its current lines
+def create_first_versions(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    RecipeVersion = apps.get_model("recipes", "RecipeVersion")
+    Lines = RecipeVersion.lines.through
+
+    recipes = list(Recipe.objects.all())
+    RecipeVersion.objects.bulk_create([
+        RecipeVersion(recipe_id=recipe.id, number=1, name=recipe.name, description=recipe.description,
+                      servings=recipe.servings)
+        for recipe in recipes
+    ], batch_size=500)
+    version_ids = dict(RecipeVersion.objects.values_list("recipe_id", "id"))
+    Lines.objects.bulk_create([
+        Lines(recipeversion_id=version_ids[recipe_id], recipeingredient_id=line_id)
+        for line_id, recipe_id in RecipeIngredient.objects.values_list("id", "recipe_id")
+    ], batch_size=500)
+    for recipe in recipes:
+        recipe.current_version_id = version_ids[recipe.id]
+    Recipe.objects.bulk_update(recipes, ["current_version"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='recipe',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='recipes.recipe'),
+        ),
+        migrations.CreateModel(
+            name='RecipeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('servings', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lines', models.ManyToManyField(related_name='versions', to='recipes.recipeingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', '-number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Bake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_scale', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bakes', to='recipes.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bakes', to='recipes.recipeversion')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='current_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recipes.recipeversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeversion',
+            constraint=models.UniqueConstraint(fields=('recipe', 'number'), name='recipes_version_number_uniq'),
+        ),
+        migrations.RunPython(create_first_versions, migrations.RunPython.noop),
+    ]
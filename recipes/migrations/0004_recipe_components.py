@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('recipes', '0003_recipe_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='component',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='used_in', to='recipes.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='ingredient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('component__isnull', True), ('ingredient__isnull', False)), models.Q(('component__isnull', False), ('ingredient__isnull', True)), _connector='OR'), name='recipes_line_ingredient_xor_component'),
+        ),
+    ]
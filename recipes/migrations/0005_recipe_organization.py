@@ -0,0 +1,77 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# the full-text index is created by migration 0002 and rebuilt here
+search = importlib.import_module("recipes.migrations.0002_recipe_search")
+
+
+# Existing recipes move to their owner's personal organization
+def fill_organization(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Membership = apps.get_model("users", "Membership")
+
+    organizations = dict(Membership.objects.filter(role="owner").order_by("-id").values_list("user_id", "organization_id"))
+    for user_id, organization_id in organizations.items():
+        Recipe.objects.filter(user_id=user_id).update(organization_id=organization_id)
+
+
+def build_documents(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    RecipeSearchDocument = apps.get_model("recipes", "RecipeSearchDocument")
+
+    names = {}
+    for recipe_id, ingredient_name, component_name in (RecipeIngredient.objects.filter(recipe__isnull=False)
+                                                       .values_list("recipe_id", "ingredient__name", "component__name")):
+        names.setdefault(recipe_id, []).append(ingredient_name or component_name)
+
+    RecipeSearchDocument.objects.bulk_create([
+        RecipeSearchDocument(recipe_id=recipe.id, organization_id=recipe.organization_id, name=recipe.name,
+                             description=recipe.description, ingredients=" ".join(names.get(recipe.id, [])))
+        for recipe in Recipe.objects.all()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_recipe_components"),
+        ("users", "0002_organizations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="organization",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="recipes", to="users.organization"),
+        ),
+        migrations.RunPython(fill_organization, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="recipe",
+            name="organization",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="recipes", to="users.organization"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["organization", "name"], name="recipes_recipe_org_name"),
+        ),
+        # search documents are derived data: recreate them keyed by organization instead of user
+        migrations.RunPython(search.run_for_vendor({"sqlite": search.SQLITE_FTS_DROP}),
+                             search.run_for_vendor({"sqlite": search.SQLITE_FTS})),
+        migrations.DeleteModel(name="RecipeSearchDocument"),
+        migrations.CreateModel(
+            name="RecipeSearchDocument",
+            fields=[
+                ("recipe", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="search_document", serialize=False, to="recipes.recipe")),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True)),
+                ("ingredients", models.TextField(blank=True)),
+                ("organization", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="users.organization")),
+            ],
+        ),
+        migrations.RunPython(search.run_for_vendor({"sqlite": search.SQLITE_FTS, "postgresql": search.POSTGRES_GIN}),
+                             search.run_for_vendor({"sqlite": search.SQLITE_FTS_DROP})),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_ingredient_organization'),
+        ('recipes', '0005_recipe_organization'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BakeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bake',
+            index=models.Index(fields=['created_at'], name='recipes_bake_created_at'),
+        ),
+        migrations.AddField(
+            model_name='bakeline',
+            name='bake',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='recipes.bake'),
+        ),
+        migrations.AddField(
+            model_name='bakeline',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bake_lines', to='inventory.ingredient'),
+        ),
+    ]
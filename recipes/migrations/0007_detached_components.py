@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 15:50
+
+import recipes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_waste_records'),
+        ('recipes', '0006_bake_lines'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='recipeingredient',
+            name='recipes_line_ingredient_xor_component',
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='component_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='component',
+            field=models.ForeignKey(blank=True, null=True, on_delete=recipes.models.detach_component, related_name='used_in', to='recipes.recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('component__isnull', True), ('ingredient__isnull', False)), models.Q(('component__isnull', False), ('ingredient__isnull', True)), models.Q(('component__isnull', True), ('ingredient__isnull', True), ('recipe__isnull', True)), _connector='OR'), name='recipes_line_ingredient_xor_component'),
+        ),
+    ]
@@ -1,24 +1,121 @@
 from django.db import models
 from django.contrib.auth.models import User
 from inventory.models import Ingredient
+from users.models import Organization
 
 # Create your models here.
 class Recipe(models.Model):
+    # the organization sharing this recipe, user is the member who created it
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="recipes")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     servings = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True) # track when recipe was created
+    # latest snapshot, kept on the row so reading it never scans the history
+    current_version = models.ForeignKey("RecipeVersion", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    class Meta:
+        indexes = [models.Index(fields=["organization", "name"], name="recipes_recipe_org_name")]
+
+    def save(self, *args, **kwargs):
+        # recipes created without an organization go to their creator's current one
+        if self.organization_id is None:
+            from users.tenancy import default_membership
+            self.organization = default_membership(self.user).organization
+        super().save(*args, **kwargs)
 
     # to display object nicely
     def __str__(self):
         return f"{self.name} ({self.servings} servings)"
 
+# Deleting a sub-recipe deletes the live lines using it, while lines only saved versions
+# still use lose the reference and keep the sub-recipe's name (see recipes/signals.py)
+def detach_component(collector, field, sub_objs, using):
+    lines = list(sub_objs)
+    models.CASCADE(collector, field, [line for line in lines if line.recipe_id is not None], using)
+    collector.add_field_update(field, None, [line for line in lines if line.recipe_id is None])
+
+# One line of a recipe. Lines are never edited once saved: an edit detaches the
+# old row (recipe=NULL) so only the versions using it still see it (see recipes/versions.py)
 class RecipeIngredient(models.Model):
-    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="ingredients")
-    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="ingredients", null=True, blank=True)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, null=True, blank=True)
+    # a sub-recipe instead of an ingredient, amount is then a number of batches (see recipes/components.py)
+    component = models.ForeignKey(Recipe, on_delete=detach_component, null=True, blank=True, related_name="used_in")
+    # name of the sub-recipe once it's deleted, for the versions that used it
+    component_name = models.CharField(max_length=100, blank=True)
     amount = models.FloatField()
     unit = models.CharField(max_length=20)
 
+    class Meta:
+        constraints = [
+            # only a detached line may have lost its sub-recipe
+            models.CheckConstraint(
+                condition=models.Q(ingredient__isnull=False, component__isnull=True)
+                | models.Q(ingredient__isnull=True, component__isnull=False)
+                | models.Q(recipe__isnull=True, ingredient__isnull=True, component__isnull=True),
+                name="recipes_line_ingredient_xor_component",
+            ),
+        ]
+
+    def __str__(self):
+        if self.ingredient_id:
+            item = self.ingredient.name
+        else:
+            item = self.component.name if self.component_id else self.component_name
+        return f"{self.amount} {self.unit} of {item} in {self.recipe.name if self.recipe else 'an earlier version'}"
+
+# Immutable snapshot of a recipe, lines are shared with the other versions they didn't change in
+class RecipeVersion(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="versions")
+    number = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    servings = models.PositiveIntegerField()
+    lines = models.ManyToManyField(RecipeIngredient, related_name="versions")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["recipe", "-number"]
+        constraints = [
+            models.UniqueConstraint(fields=["recipe", "number"], name="recipes_version_number_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} v{self.number}"
+
+# A recipe baked at a given version
+class Bake(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="bakes")
+    version = models.ForeignKey(RecipeVersion, on_delete=models.CASCADE, related_name="bakes")
+    batch_scale = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # demand forecasts read the last weeks of bakes
+        indexes = [models.Index(fields=["created_at"], name="recipes_bake_created_at")]
+
+    def __str__(self):
+        return f"{self.version} x{self.batch_scale}"
+
+# Amount of an ingredient a bake took from stock, the history demand forecasts are made from
+class BakeLine(models.Model):
+    bake = models.ForeignKey(Bake, on_delete=models.CASCADE, related_name="lines")
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name="bake_lines")
+    amount = models.FloatField()
+
+    def __str__(self):
+        return f"{self.amount} {self.ingredient.unit} of {self.ingredient.name}"
+
+# Flattened text of a recipe used by the full-text index (see recipes/search.py)
+class RecipeSearchDocument(models.Model):
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    ingredients = models.TextField(blank=True) # names of the linked ingredients
+
     def __str__(self):
-        return f"{self.amount} {self.unit} of {self.ingredient.name} in {self.recipe.name}"
\ No newline at end of file
+        return f"Search document for {self.name}"
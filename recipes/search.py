@@ -0,0 +1,103 @@
+"""Full-text recipe search.
+
+Every recipe has a RecipeSearchDocument row holding its name, description and
+ingredient names (the names of its sub-recipes, for component lines). The database indexes those rows natively:
+
+* SQLite: an FTS5 table (recipes_recipe_fts) mirrors the documents through
+  triggers and is ranked with bm25().
+* PostgreSQL: a GIN index over a weighted tsvector expression, ranked with
+  ts_rank().
+
+Other databases fall back to a plain scan of the document table.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, Q, When
+
+from .models import Recipe, RecipeIngredient, RecipeSearchDocument
+
+# default and maximum number of search results returned
+SEARCH_LIMIT = 50
+SEARCH_LIMIT_MAX = 200
+
+TOKEN_RE = re.compile(r"\w+")
+
+# must stay identical to the expression indexed in migration 0002
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', name), 'A') || "
+    "setweight(to_tsvector('english', ingredients), 'B') || "
+    "setweight(to_tsvector('english', description), 'C')"
+)
+
+# Rebuild the search documents for the given recipes
+def index_recipes(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+
+    names = {}
+    for recipe_id, ingredient_name, component_name in (RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+                                                       .values_list("recipe_id", "ingredient__name", "component__name")):
+        names.setdefault(recipe_id, []).append(ingredient_name or component_name)
+
+    # deleted recipes simply lose their document
+    RecipeSearchDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSearchDocument.objects.bulk_create([
+        RecipeSearchDocument(recipe_id=recipe.id, organization_id=recipe.organization_id, name=recipe.name,
+                             description=recipe.description, ingredients=" ".join(names.get(recipe.id, [])))
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).only("id", "organization_id", "name", "description")
+    ])
+
+def search_recipe_ids(organization, query, limit=SEARCH_LIMIT, ingredient_id=None):
+    """Return the ids of the organization's recipes matching every word of query, best match first.
+
+    With ingredient_id, only recipes using that ingredient are searched, before the limit applies.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
+    limit = max(1, min(limit, SEARCH_LIMIT_MAX))
+
+    using, using_params = "", []
+    if ingredient_id is not None:
+        using = f"AND {{}} IN (SELECT recipe_id FROM {RecipeIngredient._meta.db_table} WHERE ingredient_id = %s) "
+        using_params = [ingredient_id]
+
+    if connection.vendor == "sqlite":
+        # prefix match on every word, weighting name over ingredients over description
+        match = " ".join(f'"{token}"*' for token in tokens)
+        sql = (
+            "SELECT d.recipe_id FROM recipes_recipe_fts f "
+            "JOIN recipes_recipesearchdocument d ON d.recipe_id = f.rowid "
+            "WHERE recipes_recipe_fts MATCH %s AND d.organization_id = %s " + using.format("d.recipe_id") +
+            "ORDER BY bm25(recipes_recipe_fts, 10.0, 1.0, 4.0) LIMIT %s"
+        )
+        params = [match, organization.pk, *using_params, limit]
+    elif connection.vendor == "postgresql":
+        match = " & ".join(f"{token}:*" for token in tokens)
+        sql = (
+            f"SELECT recipe_id FROM recipes_recipesearchdocument "
+            f"WHERE ({PG_DOCUMENT}) @@ to_tsquery('english', %s) AND organization_id = %s " + using.format("recipe_id") +
+            f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('english', %s)) DESC LIMIT %s"
+        )
+        params = [match, organization.pk, *using_params, match, limit]
+    else:
+        documents = RecipeSearchDocument.objects.filter(organization=organization)
+        if ingredient_id is not None:
+            documents = documents.filter(
+                recipe_id__in=RecipeIngredient.objects.filter(ingredient_id=ingredient_id).values("recipe_id"))
+        for token in tokens:
+            documents = documents.filter(Q(name__icontains=token) | Q(ingredients__icontains=token)
+                                         | Q(description__icontains=token))
+        return list(documents.values_list("recipe_id", flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+# Keep the ranking of ids when filtering a queryset by them
+def order_by_ids(queryset, ids):
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)]))
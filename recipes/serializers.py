@@ -1,14 +1,33 @@
 from rest_framework import serializers
-from .models import Recipe, RecipeIngredient
+from .models import Recipe, RecipeIngredient, RecipeVersion
 from inventory.models import Ingredient
 from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from collections import namedtuple
+from operator import itemgetter
+from .components import RecipeGraph, component_ids
+from .costing import cost_per_serving, line_cost, round_cost
+from .search import index_recipes
+from .versions import create_version, ensure_version, replace_lines
+from users.tenancy import request_organization
+from bakershub.lean import LeanSerializer
+
+# an ingredient and the amount of it a recipe uses, sub-recipes included
+CostLine = namedtuple("CostLine", ["ingredient", "amount"])
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     ingredient_name = serializers.ReadOnlyField(source='ingredient.name')
+    component_name = serializers.ReadOnlyField(source='component.name')
 
     class Meta:
         model = RecipeIngredient
-        fields = ['id', 'ingredient', 'ingredient_name', 'amount', 'unit']
+        fields = ['id', 'ingredient', 'ingredient_name', 'component', 'component_name', 'amount', 'unit']
+
+    def validate(self, attrs):
+        if bool(attrs.get('ingredient')) == bool(attrs.get('component')):
+            raise serializers.ValidationError("Each line needs either an ingredient or a component recipe.")
+        return attrs
 
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(many=True)
@@ -17,45 +36,109 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     # warnings serializer for skipped ingredients
     warnings = serializers.SerializerMethodField()
+    version = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'description', 'servings', 'created_at', 'ingredients', 'total_cost', 'cost_per_serving', 'warnings']
+        fields = ['id', 'name', 'description', 'servings', 'created_at', 'version', 'ingredients', 'total_cost', 'cost_per_serving', 'warnings']
+
+    # Ingredients and components must belong to the organization, and components must not contain the recipe being edited
+    def validate_ingredients(self, items):
+        components = {item['component'] for item in items if item.get('component')}
+        request = self.context.get('request')
+        if request is not None:
+            organization_id = request_organization(request).id
+            if any(item['ingredient'].organization_id != organization_id for item in items if item.get('ingredient')):
+                raise serializers.ValidationError("Ingredient not found.")
+            if any(component.organization_id != organization_id for component in components):
+                raise serializers.ValidationError("Component recipe not found.")
+        if self.instance is not None and components and self.instance.pk in component_ids(c.pk for c in components):
+            raise serializers.ValidationError("A recipe can't contain itself, directly or through its components.")
+        return items
 
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+
+            # bulk_create() skips the per line signals, the recipe is indexed once here and
+            # create_version() drops its cached detail
+            RecipeIngredient.objects.bulk_create([RecipeIngredient(recipe=recipe, **item) for item in ingredients_data])
+            index_recipes([recipe.pk])
+
+            create_version(recipe)
+        # the response reads the lines and their ingredients for every cost field
+        prefetch_related_objects([recipe], Prefetch(
+            "ingredients", queryset=RecipeIngredient.objects.select_related("ingredient", "component")))
+        return recipe
 
-        for item in ingredients_data:
-            RecipeIngredient.objects.create(recipe=recipe, **item)
+    # Every edit that changes something becomes a new version, unchanged lines are shared with the previous one
+    def update(self, instance, validated_data):
+        ingredients_data = validated_data.pop('ingredients', None)
+        with transaction.atomic():
+            # one edit of a recipe at a time so version numbers never collide
+            recipe = Recipe.objects.select_for_update().select_related("current_version").get(pk=instance.pk)
+            ensure_version(recipe)
 
+            changed = [field for field, value in validated_data.items() if getattr(recipe, field) != value]
+            for field in changed:
+                setattr(recipe, field, validated_data[field])
+            if changed:
+                recipe.save(update_fields=changed)
+            if ingredients_data is not None and replace_lines(recipe, ingredients_data):
+                changed.append('ingredients')
+            if changed:
+                create_version(recipe)
         return recipe
 
+    # Lines the costs are computed from
+    def recipe_lines(self, obj):
+        return self.costing_lines(obj.ingredients.all())
+
+    # Replace component lines by the ingredients of their sub-recipes
+    def costing_lines(self, lines):
+        if all(line.component_id is None for line in lines):
+            return lines
+
+        # one graph per serializer, so every row of a list shares the flattened components
+        if not hasattr(self, '_graph'):
+            self._graph, self._ingredients = RecipeGraph(), {}
+        leaves = list(self._graph.expand([(line.ingredient_id, line.component_id, line.amount) for line in lines]))
+        self._ingredients.update((line.ingredient_id, line.ingredient) for line in lines if line.ingredient_id)
+        missing = {ingredient_id for ingredient_id, _ in leaves} - self._ingredients.keys()
+        if missing:
+            self._ingredients.update(Ingredient.objects.in_bulk(missing))
+        return [CostLine(self._ingredients[ingredient_id], amount) for ingredient_id, amount in leaves]
+
+    def get_version(self, obj):
+        return obj.current_version.number if obj.current_version_id else None
+
     # Get total cost of the recipe
     def get_total_cost(self, obj):
+        return self.lines_total_cost(self.recipe_lines(obj))
+
+    def lines_total_cost(self, lines):
         total = Decimal("0.00")
-        for item in obj.ingredients.all():
+        for item in lines:
             try:
-                # Converting to decimal before calculations
-                # Amount of ingredient / Total amount of ingredient in inventory
-                unit_cost = (Decimal(str(item.amount)) / Decimal(str(item.ingredient.quantity))) * Decimal(str(item.ingredient.cost))
-                total += unit_cost
-            except (ZeroDivisionError, InvalidOperation, AttributeError):
+                unit_cost = line_cost(item.amount, item.ingredient.quantity, item.ingredient.cost)
+            except AttributeError:
                 continue
-        return float(round(total, 2))
+            if unit_cost is not None:
+                total += unit_cost
+        return round_cost(total)
 
     # Get the cost of one serving of the recipe
     def get_cost_per_serving(self, obj):
-        try:
-            # Converting to decimal before calculations
-            return round(self.get_total_cost(obj) / obj.servings, 2)
-        except (ZeroDivisionError, InvalidOperation):
-            return 0.0
+        return cost_per_serving(self.get_total_cost(obj), obj.servings)
 
     # Get warnings when ingredient cost calculation was skipped due to errors with quantity or cost
     def get_warnings(self, obj):
+        return self.lines_warnings(self.recipe_lines(obj))
+
+    def lines_warnings(self, lines):
         warnings = []
-        for item in obj.ingredients.all():
+        for item in lines:
             try:
                 amount = Decimal(str(item.amount))
                 quantity = Decimal(str(item.ingredient.quantity))
@@ -64,4 +147,102 @@ class RecipeSerializer(serializers.ModelSerializer):
                     raise ValueError
             except (ZeroDivisionError, InvalidOperation, AttributeError, ValueError):
                 warnings.append(f"Ingredient '{item.ingredient.name}' was skipped due to invalid quantity or cost.")
-        return warnings
\ No newline at end of file
+        return warnings
+
+
+class RecipeVersionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecipeVersion
+        fields = ['number', 'name', 'description', 'servings', 'created_at']
+
+# A line of a past version, a sub-recipe deleted since is shown by the name it had
+class RecipeVersionLineSerializer(RecipeIngredientSerializer):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.ingredient_id is None and instance.component_id is None:
+            data['component_name'] = instance.component_name
+        return data
+
+# A past version with its own lines, costed at today's ingredient prices
+class RecipeVersionDetailSerializer(RecipeSerializer):
+    ingredients = RecipeVersionLineSerializer(source='lines', many=True, read_only=True)
+
+    class Meta:
+        model = RecipeVersion
+        fields = ['number', 'name', 'description', 'servings', 'created_at', 'ingredients', 'total_cost', 'cost_per_serving', 'warnings']
+
+    # lines of a deleted sub-recipe can't be costed, see get_warnings
+    def recipe_lines(self, obj):
+        return self.costing_lines([line for line in obj.lines.all() if line.ingredient_id or line.component_id])
+
+    def get_warnings(self, obj):
+        deleted = [f"Sub-recipe '{line.component_name}' was deleted and skipped." for line in obj.lines.all()
+                   if line.ingredient_id is None and line.component_id is None]
+        return deleted + super().get_warnings(obj)
+
+
+# Lean stand-ins for the recipe and line objects the costing methods read
+class LeanIngredient:
+    __slots__ = ("id", "name", "quantity", "cost")
+
+    def __init__(self, id, name, quantity, cost):
+        self.id, self.name, self.quantity, self.cost = id, name, quantity, cost
+
+class LeanLine:
+    __slots__ = ("ingredient_id", "component_id", "amount", "ingredient")
+
+    def __init__(self, ingredient_id, component_id, amount, ingredient):
+        self.ingredient_id, self.component_id = ingredient_id, component_id
+        self.amount, self.ingredient = amount, ingredient
+
+class RecipeIngredientListSerializer(LeanSerializer):
+    serializer_class = RecipeIngredientSerializer
+    # grouping and costing columns
+    extra_columns = ("recipe", "ingredient__quantity", "ingredient__cost")
+
+# Same rows as RecipeSerializer for list reads, lines and costs included, without model instances (see bakershub/lean.py)
+class RecipeListSerializer(LeanSerializer):
+    serializer_class = RecipeSerializer
+    computed_fields = ("ingredients", "total_cost", "cost_per_serving", "warnings")
+    sources = {"version": "current_version.number"}
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.lines = RecipeIngredientListSerializer(context)
+        # the costing methods of the regular serializer, sharing its flattened sub-recipes across rows
+        self.costing = RecipeSerializer(context=self.context)
+        self.computed = {}
+        self.id_column, self.servings_column = self.index["id"], self.index["servings"]
+        self.line_values = itemgetter(*(self.lines.index[column] for column in (
+            "recipe", "ingredient", "ingredient__name", "component", "amount", "ingredient__quantity", "ingredient__cost")))
+
+    # load the lines of a batch of recipes in one query and cost every recipe once
+    def prepare(self, rows):
+        grouped = {row[self.id_column]: ([], []) for row in rows}
+        lines = RecipeIngredient.objects.filter(recipe_id__in=grouped).order_by("id")
+        for row in lines.values_list(*self.lines.columns):
+            recipe_id, ingredient_id, name, component_id, amount, quantity, cost = self.line_values(row)
+            ingredient = LeanIngredient(ingredient_id, name, quantity, cost) if ingredient_id is not None else None
+            data, costing = grouped[recipe_id]
+            data.append(self.lines.to_representation(row))
+            costing.append(LeanLine(ingredient_id, component_id, amount, ingredient))
+
+        self.computed = {}
+        for row in rows:
+            data, costing = grouped[row[self.id_column]]
+            costing = self.costing.costing_lines(costing)
+            total_cost = self.costing.lines_total_cost(costing)
+            per_serving = cost_per_serving(total_cost, row[self.servings_column])
+            self.computed[row[self.id_column]] = (data, total_cost, per_serving, self.costing.lines_warnings(costing))
+
+    def get_ingredients(self, row):
+        return self.computed[row[self.id_column]][0]
+
+    def get_total_cost(self, row):
+        return self.computed[row[self.id_column]][1]
+
+    def get_cost_per_serving(self, row):
+        return self.computed[row[self.id_column]][2]
+
+    def get_warnings(self, row):
+        return self.computed[row[self.id_column]][3]
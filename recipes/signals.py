@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from inventory.models import Ingredient
+from .cache import invalidate_recipes
+from .models import Recipe, RecipeIngredient
+from .search import index_recipes
+
+# Keep search documents and cached details in sync with recipe edits
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    invalidate_recipes([instance.pk])
+    recipe_ids = [instance.pk]
+    if not created:
+        # recipes using this one as a component list its name among their ingredients
+        recipe_ids += RecipeIngredient.objects.filter(component=instance, recipe__isnull=False).values_list("recipe_id", flat=True)
+    index_recipes(recipe_ids)
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+# Lines detached by earlier edits only belong to the recipe's versions, remove them with it
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    RecipeIngredient.objects.filter(recipe__isnull=True, versions__recipe=instance).delete()
+    # versions of other recipes using it keep its name (see detach_component)
+    RecipeIngredient.objects.filter(recipe__isnull=True, component=instance).update(component_name=instance.name)
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    # detached lines are history, no live recipe shows them
+    if instance.recipe_id is None:
+        return
+    invalidate_recipes([instance.recipe_id])
+    index_recipes([instance.recipe_id])
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    if instance.recipe_id is None:
+        return
+    invalidate_recipes([instance.recipe_id])
+    # when the recipe itself (or its owner) is being deleted the document goes with it
+    origin_model = getattr(origin, "model", type(origin))
+    if origin_model in (RecipeIngredient, Ingredient) or (origin_model is Recipe and instance.component_id == getattr(origin, "pk", None)):
+        index_recipes([instance.recipe_id])
+
+# Remember the indexed name so only renames trigger a reindex
+@receiver(post_init, sender=Ingredient)
+def ingredient_loaded(sender, instance, **kwargs):
+    instance._indexed_name = instance.name
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        # quantity and cost feed every dependent recipe's costs
+        recipe_ids = set(RecipeIngredient.objects.filter(ingredient_id=instance.pk, recipe__isnull=False)
+                         .values_list("recipe_id", flat=True))
+        invalidate_recipes(recipe_ids)
+        if instance.name != instance._indexed_name:
+            index_recipes(recipe_ids)
+    instance._indexed_name = instance.name
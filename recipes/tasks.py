@@ -0,0 +1,39 @@
+from jobs.registry import PermanentJobError, task
+from users.tenancy import get_membership
+from django.db.models import Prefetch
+from .models import Recipe, RecipeIngredient
+from .serializers import RecipeSerializer
+from .views import bake_recipe_internal
+
+# Bake a recipe in the background
+@task("recipes.bake")
+def bake(job):
+    try:
+        batch_scaler = float(job.payload.get("batch_scale", 1))
+    except (TypeError, ValueError):
+        raise PermanentJobError("Multiplier must be a positive number.")
+
+    membership = get_membership(job.user, job.payload.get("organization"))
+    if membership is None:
+        raise PermanentJobError("Not a member of this organization.")
+
+    result = bake_recipe_internal(membership.organization, job.user, job.payload.get("recipe"), batch_scaler,
+                                  job.payload.get("version"))
+    if "error" in result:
+        raise PermanentJobError(result["error"])
+    return result
+
+# Cost every recipe of the user in the background
+@task("recipes.cost_catalog")
+def cost_catalog(job):
+    membership = get_membership(job.user, job.payload.get("organization"))
+    if membership is None:
+        raise PermanentJobError("Not a member of this organization.")
+
+    recipes = Recipe.objects.filter(organization=membership.organization).select_related("current_version").prefetch_related(
+        Prefetch("ingredients", queryset=RecipeIngredient.objects.select_related("ingredient", "component")))
+    serializer = RecipeSerializer(recipes, many=True)
+    return [
+        {key: recipe[key] for key in ("id", "name", "total_cost", "cost_per_serving", "warnings")}
+        for recipe in serializer.data
+    ]
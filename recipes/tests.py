@@ -1,13 +1,26 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 from inventory.models import Ingredient
-from .models import Recipe, RecipeIngredient
+from .models import Bake, BakeLine, Recipe, RecipeIngredient, RecipeSearchDocument, RecipeVersion
+from .components import RecipeGraph
+from .views import RecipeListCreateView
+from .serializers import RecipeListSerializer, RecipeSerializer
+from rest_framework.renderers import JSONRenderer
+from django.db.models import Prefetch
 from rest_framework import status
+from django.core.cache import cache, caches
+from django.utils import timezone
+from datetime import timedelta
+from bakershub.msgpack import pack, unpack
+from users.models import Membership
 
 # Testing suite for Recipes including tests for creating, reading, updating, and deleting
 class RecipeTest(TestCase):
     def setUp(self):
+        caches["recipes"].clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username="baker", password="testpass")
         # force authenticate the user created
@@ -59,6 +72,26 @@ class RecipeTest(TestCase):
         self.assertIn(self.flour.id, ingredient_ids)
         self.assertIn(self.sugar.id, ingredient_ids)
 
+    def test_create_recipe_queries_dont_grow_with_lines(self):
+        """Test that the lines of a new recipe are saved, indexed and serialized in a fixed number of queries."""
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(user=self.user, organization=self.flour.organization, name=f"Spice {i}", quantity=100,
+                       unit="grams", cost=1.00) for i in range(20)
+        ])
+        counts = []
+        for size in (2, 20):
+            data = {"name": f"Cake {size}", "servings": 4, "ingredients": [
+                {"ingredient": ingredient.id, "amount": 5, "unit": "grams"} for ingredient in ingredients[:size]
+            ]}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/recipes/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data["ingredients"]), size)
+            counts.append(len(queries))
+        # only validating each line's ingredient id costs a query
+        self.assertEqual(counts[1] - counts[0], 18)
+        self.assertEqual(RecipeSearchDocument.objects.get(recipe_id=response.data["id"]).ingredients.count("Spice"), 20)
+
     def test_list_user_recipes(self):
         """Test that only recipes belonging to the authenticated user are returned."""
         self.client.post('/api/recipes/', self.recipe_data, format='json')
@@ -238,3 +271,448 @@ class RecipeTest(TestCase):
         self.assertEqual(bake_response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn("error", bake_response.data)
 
+
+    def test_search_recipes_by_name_description_and_ingredient(self):
+        """Test full-text search matches names, descriptions and ingredient names of the user's recipes only."""
+        self.client.post("/api/recipes/", self.recipe_data, format='json')
+        Recipe.objects.create(user=self.user, name="Sourdough", description="Tangy loaf with a chewy crumb", servings=8)
+        other_user = User.objects.create_user(username="otheruser", password="pass123")
+        Recipe.objects.create(user=other_user, name="Test Cake", description="", servings=2)
+
+        response = self.client.get("/api/recipes/?q=cake")
+        self.assertEqual([r['name'] for r in response.data], ["Test Cake"])
+
+        response = self.client.get("/api/recipes/?q=chewy loaf")
+        self.assertEqual([r['name'] for r in response.data], ["Sourdough"])
+
+        response = self.client.get("/api/recipes/?q=sug")
+        self.assertEqual([r['name'] for r in response.data], ["Test Cake"])
+
+        response = self.client.get("/api/recipes/?q=brioche")
+        self.assertEqual(response.data, [])
+
+    def test_search_ranks_name_matches_first(self):
+        """Test that a match on the recipe name outranks a match on the description."""
+        Recipe.objects.create(user=self.user, name="Plain Bun", description="Not quite a brioche", servings=8)
+        Recipe.objects.create(user=self.user, name="Brioche", description="Buttery", servings=8)
+        response = self.client.get("/api/recipes/?q=brioche")
+        self.assertEqual([r['name'] for r in response.data], ["Brioche", "Plain Bun"])
+
+        response = self.client.get("/api/recipes/?q=brioche&limit=1")
+        self.assertEqual(len(response.data), 1)
+
+    def test_search_follows_ingredient_changes(self):
+        """Test that renaming or removing an ingredient updates the search index."""
+        self.client.post('/api/recipes/', self.recipe_data, format='json')
+        self.flour.name = "Rye"
+        self.flour.save()
+        self.assertEqual(len(self.client.get("/api/recipes/?q=rye").data), 1)
+        self.assertEqual(len(self.client.get("/api/recipes/?q=flour").data), 0)
+
+        self.flour.delete()
+        self.assertEqual(len(self.client.get("/api/recipes/?q=rye").data), 0)
+
+    def test_recipes_using_ingredient(self):
+        """Test listing the recipes that use a given ingredient."""
+        self.client.post('/api/recipes/', self.recipe_data, format='json')
+        bread = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=bread, ingredient=self.flour, amount=250, unit="g")
+
+        response = self.client.get(f"/api/recipes/?ingredient={self.flour.id}")
+        self.assertEqual(sorted(r['name'] for r in response.data), ["Bread", "Test Cake"])
+        response = self.client.get(f"/api/recipes/?ingredient={self.sugar.id}")
+        self.assertEqual([r['name'] for r in response.data], ["Test Cake"])
+        response = self.client.get("/api/recipes/?ingredient=²")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_search_limit_counts_recipes_using_ingredient(self):
+        """Test that the search limit applies after the ingredient filter, not before it."""
+        Recipe.objects.create(user=self.user, name="Brioche", description="", servings=8)
+        bun = Recipe.objects.create(user=self.user, name="Brioche Bun", description="", servings=8)
+        RecipeIngredient.objects.create(recipe=bun, ingredient=self.flour, amount=250, unit="g")
+        response = self.client.get(f"/api/recipes/?q=brioche&limit=1&ingredient={self.flour.id}")
+        self.assertEqual([r['name'] for r in response.data], ["Brioche Bun"])
+
+    def test_simulate_costing_for_price_sheet(self):
+        """Test that simulating price changes returns old and new costs for every recipe without saving."""
+        self.client.post("/api/recipes/", self.recipe_data, format='json')
+        bread = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=bread, ingredient=self.flour, amount=500, unit="g")
+
+        changes = {str(self.flour.id): {"cost": 3.45}, str(self.sugar.id): {"quantity": 500}}
+        response = self.client.post("/api/recipes/costing/simulate/", {"changes": changes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipes = {r["name"]: r for r in response.data["recipes"]}
+        self.assertEqual(recipes["Test Cake"]["total_cost"], 1.42)
+        self.assertEqual(recipes["Test Cake"]["new_total_cost"], 1.96)
+        self.assertEqual(recipes["Test Cake"]["new_cost_per_serving"], 0.16)
+        self.assertEqual(recipes["Bread"]["total_cost"], 1.5)
+        self.assertEqual(recipes["Bread"]["new_total_cost"], 1.72)
+
+        # the simulated prices match what the serializer reports once they are real
+        self.flour.cost, self.sugar.quantity = 3.45, 500
+        self.flour.save()
+        self.sugar.save()
+        for recipe in self.client.get("/api/recipes/").data:
+            self.assertEqual(recipe["total_cost"], recipes[recipe["name"]]["new_total_cost"])
+
+    def test_simulate_costing_reports_all_rejected_changes(self):
+        """Test that every invalid change is reported together and nothing is costed."""
+        other_user = User.objects.create_user(username="otheruser", password="pass123")
+        theirs = Ingredient.objects.create(user=other_user, name="Salt", quantity=10, unit="g", cost=1)
+        changes = {str(self.flour.id): {"cost": "abc"}, str(theirs.id): {"cost": 1}, "x": {"cost": 1}, "²": {"cost": 1},
+                   str(self.sugar.id): {"cost": 2}}
+        response = self.client.post("/api/recipes/costing/simulate/", {"changes": changes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data["errors"]), sorted([str(self.flour.id), str(theirs.id), "x", "²"]))
+
+        # values that aren't finite numbers are rejected too
+        changes = {str(self.sugar.id): {"quantity": "nan"}, str(self.flour.id): {"cost": "Infinity"}}
+        response = self.client.post("/api/recipes/costing/simulate/", {"changes": changes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data["errors"]), 2)
+
+        # and so are values too large or small to cost, and MessagePack keys that aren't strings
+        changes = {str(self.sugar.id): {"quantity": 1e-300}, str(self.flour.id): {"cost": "1e30"},
+                   None: {"cost": 1}, float("inf"): {"cost": 1}}
+        response = self.client.post("/api/recipes/costing/simulate/", pack({"changes": changes}),
+                                    content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data["errors"]), sorted([str(self.sugar.id), str(self.flour.id), "None", "inf"]))
+
+    def test_price_list_for_catalog(self):
+        """Test the price board returns suggested prices for every recipe at each margin, with overrides."""
+        self.client.post("/api/recipes/", self.recipe_data, format='json')
+        bread = Recipe.objects.create(user=self.user, name="Bread", description="", servings=4)
+        RecipeIngredient.objects.create(recipe=bread, ingredient=self.flour, amount=500, unit="g")
+
+        response = self.client.get(f"/api/recipes/prices/?margins=0.25,0.5&overrides={bread.id}:1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["margins"], [0.25, 0.5])
+        recipes = {r["name"]: r for r in response.data["recipes"]}
+        self.assertEqual(recipes["Test Cake"]["prices"], [{"margin": 0.25, "suggested_price": 1.78},
+                                                          {"margin": 0.5, "suggested_price": 2.13}])
+        self.assertEqual(recipes["Bread"]["prices"], [{"margin": 1.0, "suggested_price": 3.0}])
+
+        # the board agrees with the detail view
+        detail = self.client.get(f"/api/recipes/{recipes['Test Cake']['id']}/?margin=0.25")
+        self.assertEqual(detail.data["suggested_price"], 1.78)
+
+    def test_price_list_csv_export(self):
+        """Test exporting the price board as CSV with one row per recipe and margin."""
+        self.client.post("/api/recipes/", self.recipe_data, format='json')
+        response = self.client.get("/api/recipes/prices/?margins=0.25,0.5&export=csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], "id,name,servings,total_cost,cost_per_serving,margin,suggested_price")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith("Test Cake,12,1.42,0.12,0.25,1.78"))
+
+    def test_price_list_invalid_margins(self):
+        """Test that missing or invalid margins produce an error and 400 status."""
+        for query in ["", "?margins=abc", "?margins=0.2&overrides=1-0.3", "?margins=1e30",
+                      "?margins=0.2&overrides=1:-5"]:
+            response = self.client.get(f"/api/recipes/prices/{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+
+    def test_recipe_detail_served_from_cache(self):
+        """Test that a repeated detail GET is answered from the cache, with the margin applied on top."""
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        first = self.client.get(f"/api/recipes/{recipe_id}/")
+        # only the membership lookup that picks the organization
+        with self.assertNumQueries(1):
+            second = self.client.get(f"/api/recipes/{recipe_id}/?margin=0.25")
+        self.assertEqual(second.data["total_cost"], first.data["total_cost"])
+        self.assertEqual(second.data["suggested_price"], 1.78)
+        self.assertNotIn("suggested_price", self.client.get(f"/api/recipes/{recipe_id}/").data)
+
+    def test_recipe_detail_cache_invalidated_by_changes(self):
+        """Test that editing the recipe, its lines or an ingredient refreshes the cached detail."""
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").data["total_cost"], 1.42)
+
+        self.flour.cost = 6.00
+        self.flour.save()
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").data["total_cost"], 2.48)
+
+        # baking changes stocked quantities and so the per-unit costs
+        self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").data["total_cost"], 3.67)
+
+        RecipeIngredient.objects.filter(recipe_id=recipe_id, ingredient=self.sugar).get().delete()
+        self.assertEqual(len(self.client.get(f"/api/recipes/{recipe_id}/").data["ingredients"]), 1)
+
+        self.client.patch(f"/api/recipes/{recipe_id}/", {"name": "Renamed"}, format='json')
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").data["name"], "Renamed")
+
+    def test_recipe_detail_cache_is_private(self):
+        """Test that a cached recipe is not served to another user."""
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        self.client.get(f"/api/recipes/{recipe_id}/")
+        other_user = User.objects.create_user(username="otheruser", password="pass123")
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_recipes_streaming(self):
+        """Test that the streamed recipe list matches the regular JSON response, including chunk boundaries."""
+        for i in range(5):
+            self.recipe_data["name"] = f"Cake {i}"
+            self.client.post("/api/recipes/", self.recipe_data, format='json')
+        regular = self.client.get('/api/recipes/')
+        RecipeListCreateView.stream_chunk_size = 2
+        try:
+            streamed = self.client.get('/api/recipes/?stream=1')
+            self.assertEqual(b"".join(streamed.streaming_content), regular.content)
+        finally:
+            RecipeListCreateView.stream_chunk_size = 500
+        self.assertEqual(b"".join(self.client.get('/api/recipes/?stream=1&q=zzz').streaming_content), b"[]")
+
+    def test_recipe_msgpack_round_trip(self):
+        """Test that a recipe can be created and read back as MessagePack, nested ingredients included."""
+        response = self.client.post("/api/recipes/", pack(self.recipe_data), content_type="application/msgpack",
+                                    HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe_id = unpack(response.content)["id"]
+        regular = self.client.get(f"/api/recipes/{recipe_id}/?margin=0.25")
+        packed = self.client.get(f"/api/recipes/{recipe_id}/?margin=0.25&format=msgpack")
+        self.assertEqual(packed["Content-Type"], "application/msgpack")
+        self.assertEqual(unpack(packed.content), regular.json())
+        self.assertEqual(len(unpack(packed.content)["ingredients"]), 2)
+
+    def test_edit_creates_version_sharing_unchanged_lines(self):
+        """Test that an edit creates a new version which shares the lines it didn't change."""
+        response = self.client.post("/api/recipes/", self.recipe_data, format='json')
+        recipe_id = response.data['id']
+        self.assertEqual(response.data["version"], 1)
+        flour_line = next(line for line in response.data["ingredients"] if line["ingredient"] == self.flour.id)
+
+        # more sugar, same flour
+        self.recipe_data["ingredients"][1]["amount"] = 300
+        response = self.client.put(f"/api/recipes/{recipe_id}/", self.recipe_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+        self.assertIn(flour_line["id"], [line["id"] for line in response.data["ingredients"]])
+
+        v1, v2 = RecipeVersion.objects.get(number=1), RecipeVersion.objects.get(number=2)
+        self.assertEqual(sorted(v1.lines.values_list("amount", flat=True)), [150, 350])
+        self.assertEqual(sorted(v2.lines.values_list("amount", flat=True)), [300, 350])
+        # three rows in total: the shared flour line and both sugar lines
+        self.assertEqual(RecipeIngredient.objects.count(), 3)
+        self.assertEqual(RecipeIngredient.objects.filter(recipe_id=recipe_id).count(), 2)
+
+        # an edit that changes nothing keeps the current version
+        response = self.client.patch(f"/api/recipes/{recipe_id}/", {"servings": 12}, format='json')
+        self.assertEqual(response.data["version"], 2)
+
+        response = self.client.get(f"/api/recipes/{recipe_id}/versions/")
+        self.assertEqual([v["number"] for v in response.data], [2, 1])
+        response = self.client.get(f"/api/recipes/{recipe_id}/versions/1/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(line["amount"] for line in response.data["ingredients"]), [150, 350])
+        self.assertEqual(response.data["total_cost"], 1.42)
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/versions/3/").status_code, status.HTTP_404_NOT_FOUND)
+
+        # deleting the recipe also removes the lines only its history used
+        self.client.delete(f"/api/recipes/{recipe_id}/")
+        self.assertEqual(RecipeIngredient.objects.count(), 0)
+
+    def test_bake_records_version(self):
+        """Test that bakes reference the version baked and an earlier version can be baked."""
+        response = self.client.post("/api/recipes/", self.recipe_data, format='json')
+        recipe_id = response.data['id']
+        self.client.patch(f"/api/recipes/{recipe_id}/", {"ingredients": [
+            {"ingredient": self.flour.id, "amount": 500, "unit": "grams"}]}, format='json')
+
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.data["version"], 2)
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"version": 1}, format="json")
+        self.assertEqual(response.data["version"], 1)
+        self.flour.refresh_from_db()
+        self.sugar.refresh_from_db()
+        self.assertEqual((self.flour.quantity, self.sugar.quantity), (150, 850))
+        self.assertEqual(list(Bake.objects.order_by("id").values_list("version__number", flat=True)), [2, 1])
+
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"version": 7}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # 1e400 in a JSON body is a float infinity
+        for body in ['{"version": 1e400}', '{"batch_scale": 1e400}', '{"batch_scale": "nan"}']:
+            response = self.client.post(f"/api/recipes/{recipe_id}/bake/", body, content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bake_uses_lines_written_outside_the_serializer(self):
+        """Test that a line added straight through the ORM is baked as well as costed, in a new version."""
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        salt = Ingredient.objects.create(user=self.user, name="Salt", quantity=100, unit="g", cost=1.00)
+        RecipeIngredient.objects.create(recipe_id=recipe_id, ingredient=salt, amount=5, unit="g")
+
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+        salt.refresh_from_db()
+        self.assertEqual(salt.quantity, 95)
+        # baking again reuses the snapshot
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.data["version"], 2)
+
+    def test_sub_recipe_costing_and_bake(self):
+        """Test that sub-recipes are costed and baked through their ingredients."""
+        dough = self.client.post("/api/recipes/", {"name": "Dough", "servings": 1, "ingredients": [
+            {"ingredient": self.flour.id, "amount": 200, "unit": "grams"}]}, format='json').data
+        glaze = self.client.post("/api/recipes/", {"name": "Glaze", "servings": 1, "ingredients": [
+            {"ingredient": self.sugar.id, "amount": 100, "unit": "grams"},
+            {"component": dough["id"], "amount": 0.5, "unit": "batch"}]}, format='json').data
+        response = self.client.post("/api/recipes/", {"name": "Bun", "servings": 4, "ingredients": [
+            {"component": dough["id"], "amount": 2, "unit": "batch"},
+            {"component": glaze["id"], "amount": 1, "unit": "batch"}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        bun_id = response.data["id"]
+        self.assertEqual(response.data["ingredients"][0]["component_name"], "Dough")
+        # 500 g flour at 3.00 / 1000 g and 100 g sugar at 2.50 / 1000 g
+        self.assertEqual(response.data["total_cost"], 1.75)
+
+        # the graph under a recipe loads in a bounded number of queries however deep it is
+        with self.assertNumQueries(2):
+            leaves = dict(RecipeGraph().expand([(None, bun_id, 1)]))
+        self.assertEqual(leaves, {self.flour.id: 500, self.sugar.id: 100})
+
+        # a price change reaches the cached detail of recipes using the ingredient through a component
+        self.client.get(f"/api/recipes/{bun_id}/")
+        self.client.patch(f"/api/inventory/ingredients/{self.flour.id}/", {"cost": 6.00}, format='json')
+        self.assertEqual(self.client.get(f"/api/recipes/{bun_id}/").data["total_cost"], 3.25)
+        prices = self.client.get("/api/recipes/prices/?margins=0").data["recipes"]
+        self.assertEqual({row["name"]: row["total_cost"] for row in prices}, {"Bun": 3.25, "Dough": 1.2, "Glaze": 0.85})
+
+        response = self.client.post(f"/api/recipes/{bun_id}/bake/", {"batch_scale": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.flour.refresh_from_db()
+        self.sugar.refresh_from_db()
+        self.assertEqual((self.flour.quantity, self.sugar.quantity), (500, 900))
+
+    def test_sub_recipe_in_use_is_not_deleted(self):
+        """Test that a sub-recipe used by a recipe can't be deleted, while earlier versions only keep its name."""
+        dough = self.client.post("/api/recipes/", {"name": "Dough", "servings": 1, "ingredients": [
+            {"ingredient": self.flour.id, "amount": 200, "unit": "grams"}]}, format='json').data
+        pie = self.client.post("/api/recipes/", {"name": "Pie", "servings": 4, "ingredients": [
+            {"ingredient": self.sugar.id, "amount": 10, "unit": "grams"},
+            {"component": dough["id"], "amount": 0.5, "unit": "batch"}]}, format='json').data
+
+        response = self.client.delete(f"/api/recipes/{dough['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["used_in"], [{"id": pie["id"], "name": "Pie"}])
+        self.assertEqual(self.client.get(f"/api/recipes/{pie['id']}/").data["total_cost"], pie["total_cost"])
+
+        # once the pie stops using it, only version 1 does and the dough can go
+        self.client.patch(f"/api/recipes/{pie['id']}/", {"ingredients": [
+            {"ingredient": self.sugar.id, "amount": 10, "unit": "grams"}]}, format='json')
+        self.assertEqual(self.client.delete(f"/api/recipes/{dough['id']}/").status_code, status.HTTP_204_NO_CONTENT)
+
+        version = self.client.get(f"/api/recipes/{pie['id']}/versions/1/").data
+        self.assertEqual(len(version["ingredients"]), 2)
+        self.assertEqual(version["ingredients"][1]["component_name"], "Dough")
+        self.assertEqual(version["total_cost"], self.client.get(f"/api/recipes/{pie['id']}/").data["total_cost"])
+        self.assertEqual(version["warnings"], ["Sub-recipe 'Dough' was deleted and skipped."])
+        # it can't be baked without the dough, the current version still can
+        response = self.client.post(f"/api/recipes/{pie['id']}/bake/", {"version": 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Dough", response.data["error"])
+        self.assertEqual(self.client.post(f"/api/recipes/{pie['id']}/bake/", {}, format='json').status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(f"/api/recipes/{pie['id']}/").status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(RecipeIngredient.objects.exists())
+
+    def test_sub_recipe_cycles_rejected(self):
+        """Test that a recipe can't contain itself, directly or through its components."""
+        dough = self.client.post("/api/recipes/", {"name": "Dough", "servings": 1, "ingredients": [
+            {"ingredient": self.flour.id, "amount": 200, "unit": "grams"}]}, format='json').data
+        bun = self.client.post("/api/recipes/", {"name": "Bun", "servings": 4, "ingredients": [
+            {"component": dough["id"], "amount": 2, "unit": "batch"}]}, format='json').data
+
+        for component in (dough["id"], bun["id"]):
+            response = self.client.patch(f"/api/recipes/{dough['id']}/", {"ingredients": [
+                {"component": component, "amount": 1, "unit": "batch"}]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/recipes/", {"name": "Empty", "servings": 1, "ingredients": [
+            {"amount": 1, "unit": "batch"}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = User.objects.create_user(username="other", password="testpass")
+        secret = Recipe.objects.create(user=other, name="Secret", servings=1)
+        response = self.client.post("/api/recipes/", {"name": "Copy", "servings": 1, "ingredients": [
+            {"component": secret.id, "amount": 1, "unit": "batch"}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipes_scoped_to_organization(self):
+        """Test that teammates share recipes, search and bakes, while other bakers see none of them."""
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        self.client.get(f"/api/recipes/{recipe_id}/")
+        organization = Recipe.objects.get(pk=recipe_id).organization
+
+        outsider = User.objects.create_user(username="outsider", password="testpass")
+        self.client.force_authenticate(user=outsider)
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/api/recipes/?search=cake").data, [])
+
+        Membership.objects.create(organization=organization, user=outsider, role=Membership.STAFF)
+        self.assertEqual(self.client.get(f"/api/recipes/{recipe_id}/").data["total_cost"], 1.42)
+        self.assertEqual([row["id"] for row in self.client.get("/api/recipes/?search=cake").data], [recipe_id])
+        response = self.client.patch(f"/api/recipes/{recipe_id}/", {"servings": 6}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.quantity, 650)
+
+    def test_demand_forecast(self):
+        """Test that bakes record what they used and the forecast follows the average and weekday pattern."""
+        cache.clear()
+        recipe_id = self.client.post("/api/recipes/", self.recipe_data, format='json').data['id']
+        for scale, days_ago in [(1, 7), (0.5, 1)]:
+            self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": scale}, format='json')
+            Bake.objects.filter(created_at__gt=timezone.now() - timedelta(hours=1)).update(
+                created_at=timezone.now() - timedelta(days=days_ago))
+        self.assertEqual(sorted(BakeLine.objects.filter(ingredient=self.flour).values_list("amount", flat=True)),
+                         [175, 350])
+
+        response = self.client.get("/api/recipes/forecast/?days=7&window=7")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        flour, sugar = response.data["ingredients"]
+        # 525 used over the week, on today's weekday and yesterday's
+        self.assertEqual(flour["daily_average"], 75)
+        self.assertEqual(flour["forecast"], [350, 0, 0, 0, 0, 0, 175])
+        self.assertEqual((flour["total"], flour["quantity"], flour["shortfall"]), (525, 475, 50))
+        self.assertEqual((sugar["total"], sugar["shortfall"]), (225, 0))
+
+        # today's bakes only count from tomorrow
+        self.client.post(f"/api/recipes/{recipe_id}/bake/", {"batch_scale": 0.5}, format='json')
+        flour = self.client.get("/api/recipes/forecast/?days=7&window=7").data["ingredients"][0]
+        self.assertEqual((flour["total"], flour["shortfall"]), (525, 225))
+        for query in ["?days=0", "?days=abc", "?window=3", "?window=365"]:
+            self.assertEqual(self.client.get(f"/api/recipes/forecast/{query}").status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_lean_list_matches_serializer(self):
+        """Test that the lean list rows, lines and costs included, render to the same bytes as RecipeSerializer."""
+        self.client.post("/api/recipes/", self.recipe_data, format='json')
+        free = Ingredient.objects.create(user=self.user, name="Water", quantity=0, unit="ml", cost=0)
+        dough = self.client.post("/api/recipes/", {"name": "Dough", "servings": 3, "ingredients": [
+            {"ingredient": self.flour.id, "amount": 100.5, "unit": "grams"},
+            {"ingredient": free.id, "amount": 50, "unit": "ml"}]}, format='json').data["id"]
+        self.client.post("/api/recipes/", {"name": "Bun", "description": "Two doughs", "servings": 4, "ingredients": [
+            {"component": dough, "amount": 2, "unit": "batch"},
+            {"ingredient": self.sugar.id, "amount": 10, "unit": "grams"}]}, format='json')
+        # no lines and no version at all
+        Recipe.objects.create(user=self.user, name="Empty", servings=1)
+
+        queryset = Recipe.objects.order_by("id")
+        expected = RecipeSerializer(queryset.select_related("current_version").prefetch_related(
+            Prefetch("ingredients", queryset=RecipeIngredient.objects.select_related("ingredient", "component"))),
+            many=True).data
+        lean = RecipeListSerializer().many(queryset)
+        self.assertEqual(JSONRenderer().render(lean), JSONRenderer().render(expected))
+        self.assertEqual(pack(lean), pack(expected))
+        self.assertEqual(self.client.get("/api/recipes/").content, JSONRenderer().render(expected))
+        self.assertEqual(b"".join(self.client.get("/api/recipes/?stream=1").streaming_content),
+                         JSONRenderer().render(expected))
@@ -1,8 +1,14 @@
 from django.urls import path
-from .views import RecipeDetailView, RecipeListCreateView, bake_recipe
+from .views import (RecipeDetailView, RecipeListCreateView, bake_recipe, demand_forecast, price_list,
+                    recipe_version_detail, recipe_versions, simulate_costing)
 
 urlpatterns = [
     path('', RecipeListCreateView.as_view(), name='recipe-list-create'),
     path('<int:pk>/', RecipeDetailView.as_view(), name='recipe-detail'),
-    path('<int:pk>/bake/', bake_recipe, name='bake-recipe')
+    path('<int:pk>/bake/', bake_recipe, name='bake-recipe'),
+    path('<int:pk>/versions/', recipe_versions, name='recipe-versions'),
+    path('<int:pk>/versions/<int:number>/', recipe_version_detail, name='recipe-version-detail'),
+    path('costing/simulate/', simulate_costing, name='costing-simulate'),
+    path('prices/', price_list, name='price-list'),
+    path('forecast/', demand_forecast, name='demand-forecast'),
 ]
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Copy-on-write recipe versions.
+
+A RecipeVersion snapshots a recipe's fields and links to its RecipeIngredient
+rows instead of copying them. The live lines of a recipe (recipe.ingredients)
+are the lines of its current version: ensure_version() snapshots them again
+first when they were written around replace_lines(). An edit keeps the rows it
+didn't change, so the new version shares them with the previous one. Changed or
+removed rows are detached (recipe=NULL) rather than updated, so older versions
+keep seeing them. A new version therefore costs one row plus one link per line,
+not a copy of every line.
+"""
+from django.db.models import Max
+
+from .cache import invalidate_recipes
+from .models import Recipe, RecipeIngredient, RecipeVersion
+from .search import index_recipes
+
+def create_version(recipe):
+    """Snapshot the recipe's fields and live lines as its new current version."""
+    if recipe.current_version_id:
+        number = recipe.current_version.number + 1
+    else:
+        number = (recipe.versions.aggregate(Max("number"))["number__max"] or 0) + 1
+    version = RecipeVersion.objects.create(recipe=recipe, number=number, name=recipe.name,
+                                           description=recipe.description, servings=recipe.servings)
+    Lines = RecipeVersion.lines.through
+    Lines.objects.bulk_create([
+        Lines(recipeversion_id=version.id, recipeingredient_id=line_id)
+        for line_id in recipe.ingredients.values_list("id", flat=True)
+    ])
+
+    Recipe.objects.filter(pk=recipe.pk).update(current_version=version)
+    recipe.current_version = version
+    # update() skips the signals, the cached detail shows the version number
+    invalidate_recipes([recipe.pk])
+    return version
+
+# Recipes written straight through the ORM have no version until one is needed, and lines
+# added or removed that way only reach a version here
+def ensure_version(recipe):
+    """The recipe's current version, snapshotted again first if its live lines no longer match it."""
+    version = recipe.current_version
+    if version is not None and (set(recipe.ingredients.values_list("id", flat=True))
+                                == set(version.lines.values_list("id", flat=True))):
+        return version
+    return create_version(recipe)
+
+def replace_lines(recipe, items):
+    """Make items (dicts of ingredient or component, amount, unit) the recipe's live lines, sharing unchanged rows.
+
+    Returns True when anything changed.
+    """
+    unchanged = {}
+    for line_id, *key in recipe.ingredients.values_list("id", "ingredient_id", "component_id", "amount", "unit"):
+        unchanged.setdefault(tuple(key), []).append(line_id)
+
+    new_lines = []
+    for item in items:
+        ingredient, component = item.get("ingredient"), item.get("component")
+        ids = unchanged.get((ingredient and ingredient.pk, component and component.pk, item["amount"], item["unit"]))
+        if ids:
+            ids.pop()
+        else:
+            new_lines.append(RecipeIngredient(recipe=recipe, **item))
+    detached = [line_id for ids in unchanged.values() for line_id in ids]
+    if not new_lines and not detached:
+        return False
+
+    RecipeIngredient.objects.filter(pk__in=detached).update(recipe=None)
+    RecipeIngredient.objects.bulk_create(new_lines)
+    # update() and bulk_create() skip the signals
+    invalidate_recipes([recipe.pk])
+    index_recipes([recipe.pk])
+    return True
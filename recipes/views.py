@@ -1,85 +1,357 @@
-from asyncio.base_subprocess import ReadSubprocessPipeProto
-from shutil import ExecError
 from rest_framework import generics, permissions, status
 
+from bakershub.lean import LeanListMixin
+from bakershub.routers import replica_reads, reset_replica_reads
+from bakershub.streaming import StreamingListMixin
 from inventory.views import deduct_inventory_internal
-from .models import Recipe, RecipeIngredient
-from .serializers import RecipeIngredientSerializer, RecipeSerializer
+from inventory.models import Ingredient
+from .cache import cache_detail, get_cached_detail
+from .components import RecipeGraph
+from .forecast import HISTORY_DAYS, forecast_demand
+from .costing import (COST_RANGE, MARGIN_RANGE, QUANTITY_RANGE, CostMatrix, compare_totals, cost_per_serving,
+                      round_cost, suggested_price, valid_cost, valid_margin, valid_quantity)
+from .models import Bake, BakeLine, Recipe, RecipeIngredient, RecipeVersion
+from .search import SEARCH_LIMIT, order_by_ids, search_recipe_ids
+from .serializers import RecipeIngredientSerializer, RecipeListSerializer, RecipeSerializer, RecipeVersionDetailSerializer, RecipeVersionSerializer
+from .versions import ensure_version
 from decimal import Decimal, InvalidOperation
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
+import csv
+import math
+from django.urls import reverse
+from jobs.queue import enqueue
+from outbox.events import BAKE_COMPLETED, emit
+from users.permissions import CanManageCatalog, IsOrganizationMember
+from users.tenancy import request_organization
 
 # Create your views here.
-class RecipeListCreateView(generics.ListCreateAPIView):
+class RecipeListCreateView(StreamingListMixin, LeanListMixin, generics.ListCreateAPIView):
     serializer_class = RecipeSerializer
+    lean_serializer_class = RecipeListSerializer
     # ensure only users logged in can access the view
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanManageCatalog]
 
     def get_queryset(self):
-        # only show ingredients for logged in user
-        return Recipe.objects.filter(user=self.request.user)
+        # only show recipes of the user's organization
+        organization = request_organization(self.request)
+        queryset = Recipe.objects.filter(organization=organization).select_related("current_version")
+        params = self.request.query_params
+
+        # recipes using a given ingredient
+        ingredient = params.get("ingredient")
+        if ingredient is not None:
+            try:
+                ingredient = int(ingredient)
+            except ValueError:
+                return queryset.none()
+            queryset = queryset.filter(ingredients__ingredient_id=ingredient).distinct()
+
+        # full-text search over names, descriptions and ingredient names, best match first
+        query = params.get("q", "").strip()
+        if query:
+            try:
+                limit = int(params.get("limit", SEARCH_LIMIT))
+            except ValueError:
+                limit = SEARCH_LIMIT
+            # the ingredient filter goes into the search so the limit only counts recipes using it
+            queryset = order_by_ids(queryset, search_recipe_ids(organization, query, limit, ingredient))
+        return queryset
 
     # specify what user to be assigned
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, organization=request_organization(self.request))
 
 class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RecipeSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanManageCatalog]
 
     def get_queryset(self):
-        # only show ingredients for logged in user
-        return Recipe.objects.filter(user=self.request.user)
+        # only show recipes of the user's organization
+        return Recipe.objects.filter(organization=request_organization(self.request)).select_related("current_version")
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        data = serializer.data.copy()
+        # serve the cached body when nothing it depends on changed, the cache hands out a fresh copy
+        data = get_cached_detail(request_organization(request).id, kwargs["pk"])
+        if data is None:
+            # the body is served from the cache long after this read, so it can't come from a replica
+            # lagging behind, reading the primary doesn't pin the client to it like a write does
+            token = replica_reads(False)
+            try:
+                instance = self.get_object()
+                data = dict(self.get_serializer(instance).data)
+            finally:
+                reset_replica_reads(token)
+            cache_detail(instance, data)
 
         # Get optional profit margin input
         margin = request.query_params.get("margin")
         if margin:
             try:
-                margin_decimal = Decimal(str(margin))
-                total_cost = Decimal(str(data.get("total_cost", 0)))
-                suggested_price = round(total_cost * (1 + margin_decimal), 2)
-                data["suggested_price"] = float(suggested_price)
+                margin = Decimal(str(margin))
+                if not valid_margin(margin):
+                    raise ValueError
+                data["suggested_price"] = suggested_price(data.get("total_cost", 0), margin)
             except (InvalidOperation, ValueError):
                 data["suggested_price"] = "Invalid margin"
 
         return Response(data)
 
+    def destroy(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        # a sub-recipe still in a recipe would silently drop out of its costs and bakes, earlier
+        # versions only keep its name (see detach_component)
+        users = (Recipe.objects.filter(ingredients__component=recipe)
+                 .distinct().order_by("name", "id").values_list("id", "name"))
+        if users:
+            return Response({"error": "Recipe is used as a sub-recipe, remove it from these recipes first.",
+                             "used_in": [{"id": recipe_id, "name": name} for recipe_id, name in users]},
+                            status=status.HTTP_409_CONFLICT)
+        self.perform_destroy(recipe)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# Bake a recipe, deduct amount from Ingredients given (Internal Helper)
+def bake_recipe_internal(organization, user, recipe_id, batch_scaler, version_number=None):
+    """Deduct a version's ingredients (the current one by default) scaled by batch_scaler, all or nothing."""
+    try:
+        recipe = Recipe.objects.select_related("current_version").get(pk=recipe_id, organization=organization)
+        version = recipe.versions.get(number=version_number) if version_number is not None else None
+    except Recipe.DoesNotExist:
+        return {"error": "Recipe Not Found.", "status": status.HTTP_404_NOT_FOUND}
+    except RecipeVersion.DoesNotExist:
+        return {"error": "Version Not Found.", "status": status.HTTP_404_NOT_FOUND}
+
+    try:
+        # transaction block with atomic
+        with transaction.atomic():
+            version = version or ensure_version(recipe)
+            # sub-recipes are baked from their ingredients, each ingredient deducted once
+            required = {}
+            lines = list(version.lines.values_list("ingredient_id", "component_id", "amount", "component_name"))
+            deleted = [name for ingredient_id, component_id, _, name in lines if ingredient_id is None and component_id is None]
+            if deleted:
+                raise Exception(f"Version {version.number} uses the deleted sub-recipe '{deleted[0]}'.")
+            for ingredient_id, amount in RecipeGraph().expand([line[:3] for line in lines]):
+                required[ingredient_id] = required.get(ingredient_id, 0) + float(amount) * batch_scaler
+            # staff share the stock: lock every row this bake touches up front, always in id order,
+            # so concurrent bakes queue behind each other instead of deadlocking or overselling
+            names = dict(Ingredient.objects.select_for_update().filter(pk__in=required, organization=organization)
+                         .order_by("pk").values_list("id", "name"))
+
+            for ingredient_id, required_amt in required.items():
+                result = deduct_inventory_internal(organization, ingredient_id, required_amt)
+
+                if "error" in result:
+                    # raise error in atomic block to rollback transactions automatically
+                    raise Exception(f"Not enough {names.get(ingredient_id)}: {result['error']}")
+            # remember which formulation was baked and what it used up
+            bake = Bake.objects.create(user=user, recipe=recipe, version=version, batch_scale=batch_scaler)
+            BakeLine.objects.bulk_create(BakeLine(bake=bake, ingredient_id=ingredient_id, amount=amount)
+                                         for ingredient_id, amount in required.items())
+            # the ordering system hears about it only if the bake commits
+            emit(organization.id, BAKE_COMPLETED, {
+                "bake": bake.id,
+                "recipe": recipe.id,
+                "name": recipe.name,
+                "version": version.number,
+                "batch_scale": batch_scaler,
+                "used": [{"ingredient": ingredient_id, "amount": amount} for ingredient_id, amount in required.items()],
+            })
+    except Exception as e:
+        return {"error": str(e), "status": status.HTTP_400_BAD_REQUEST}
+
+    return {"message": f"Successfully baked '{recipe.name}'!", "batch scale": batch_scaler, "version": version.number}
+
 # Bake a recipe, deduct amount from Ingredients given
 @api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
 def bake_recipe(request, pk):
-    """Bake a specific recipe, with 1/2, single, or double batch options."""
-    try:
-        recipe = Recipe.objects.get(pk=pk, user=request.user)
-    except Recipe.DoesNotExist:
+    """Bake a specific recipe, with 1/2, single, or double batch options, and optionally an earlier `version`."""
+    organization = request_organization(request)
+    recipe = Recipe.objects.filter(pk=pk, organization=organization).select_related("current_version").first()
+    if recipe is None:
         return Response({"error": "Recipe Not Found."}, status=status.HTTP_404_NOT_FOUND)
 
     # Get batch scaling from user
     batch_scaler = request.data.get('batch_scale', 1)
     try:
         batch_scaler = float(batch_scaler)
-        if batch_scaler <= 0:
+        if not math.isfinite(batch_scaler) or batch_scaler <= 0:
             raise ValueError
     except (ValueError, TypeError):
         return Response({"error": "Multiplier must be a positive number."}, status=status.HTTP_400_BAD_REQUEST)
 
+    version = request.data.get('version')
+    if version is not None:
+        try:
+            version = int(version)
+        except (OverflowError, ValueError, TypeError):
+            return Response({"error": "Version must be a version number."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # hand the bake to a background worker when asked to
+    if request.data.get('async'):
+        # pin the formulation so a later edit doesn't change what gets baked
+        if version is None:
+            version = ensure_version(recipe).number
+        job = enqueue(request.user, "recipes.bake", {"recipe": pk, "batch_scale": batch_scaler, "version": version,
+                                                     "organization": organization.id})
+        return Response({"message": "Bake queued.", "job": job.id, "status_url": reverse("job-detail", args=[job.id])},
+                        status=status.HTTP_202_ACCEPTED)
+
+    result = bake_recipe_internal(organization, request.user, pk, batch_scaler, version)
+
+    if "error" in result:
+        return Response({"error": result["error"]}, status=result["status"])
+
+    return Response(result, status=status.HTTP_200_OK)
+
+# History of a recipe
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def recipe_versions(request, pk):
+    """List the versions of a recipe, newest first."""
+    if not Recipe.objects.filter(pk=pk, organization=request_organization(request)).exists():
+        return Response({"error": "Recipe Not Found."}, status=status.HTTP_404_NOT_FOUND)
+    versions = RecipeVersion.objects.filter(recipe_id=pk)
+    return Response(RecipeVersionSerializer(versions, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def recipe_version_detail(request, pk, number):
+    """A recipe as it was at a given version, costed at today's ingredient prices."""
     try:
-        # transaction block with atomic
-        with transaction.atomic():
-            for item in recipe.ingredients.all():
-                required_amt = item.amount * batch_scaler
-                result = deduct_inventory_internal(request.user, item.ingredient_id, required_amt)
+        version = (RecipeVersion.objects
+                   .prefetch_related(Prefetch("lines",
+                                              queryset=RecipeIngredient.objects.select_related("ingredient", "component")))
+                   .get(recipe_id=pk, recipe__organization=request_organization(request), number=number))
+    except RecipeVersion.DoesNotExist:
+        return Response({"error": "Version Not Found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(RecipeVersionDetailSerializer(version).data)
 
-                if "error" in result:
-                    # raise error in atomic block to rollback transactions automatically
-                    raise Exception(f"Not enough {item.ingredient.name}: {result['error']}")
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+# What-if costing of the whole catalog for a batch of price changes
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def simulate_costing(request):
+    """Return old and new costs of every recipe for a map of ingredient_id -> {cost, quantity}, writing nothing."""
+    changes = request.data.get("changes")
+    if not isinstance(changes, dict) or not changes:
+        return Response({"error": "Changes must be a map of ingredient ids to new cost and/or quantity."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    organization = request_organization(request)
+    ids = {}
+    for key in changes:
+        try:
+            ids[key] = int(key)
+        except (OverflowError, TypeError, ValueError):
+            pass # reported as not found below
+    current = {
+        ingredient_id: (quantity, cost)
+        for ingredient_id, quantity, cost in Ingredient.objects.filter(pk__in=ids.values(), organization=organization)
+        .values_list("id", "quantity", "cost")
+    }
+
+    # collect every problem so the whole price sheet can be fixed in one go
+    overrides, errors = {}, {}
+    for key, change in changes.items():
+        ingredient_id = ids.get(key)
+        if ingredient_id not in current:
+            errors[key] = "Ingredient Not Found."
+            continue
+        if not isinstance(change, dict):
+            errors[key] = "Change must be an object with cost and/or quantity."
+            continue
+        quantity, cost = current[ingredient_id]
+        try:
+            cost = Decimal(str(change.get("cost", cost)))
+            quantity = float(change.get("quantity", quantity))
+            if not valid_cost(cost) or not valid_quantity(quantity):
+                raise ValueError
+        except (InvalidOperation, ValueError, TypeError):
+            errors[key] = (f"Cost must be a number from {COST_RANGE[0]} to {COST_RANGE[1]}, quantity 0 or from "
+                           f"{QUANTITY_RANGE[0]:g} to {QUANTITY_RANGE[1]:g}.")
+            continue
+        overrides[ingredient_id] = (quantity, cost)
+
+    if errors:
+        # MessagePack keys may be any value, reported as the text JSON can carry
+        errors = {str(key): error for key, error in errors.items()}
+        return Response({"error": "Some changes were rejected.", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    matrix = CostMatrix.for_organization(organization)
+    return Response({"recipes": compare_totals(matrix.recipes, matrix.totals(), matrix.totals(overrides))})
+
+# Suggested prices for the whole catalog at one or more margins
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def price_list(request):
+    """Price board for all of the user's recipes.
+
+    Query params: `margins` (comma separated, ex 0.25,0.5), optional `overrides`
+    (recipe_id:margin pairs, ex 12:0.4,15:0.3) replacing the margins for those
+    recipes, and `export=csv` to download the board as CSV.
+    """
+    try:
+        margins = [Decimal(m) for m in request.query_params.get("margins", "").split(",") if m.strip()]
+        overrides = {}
+        for pair in request.query_params.get("overrides", "").split(","):
+            if pair.strip():
+                recipe_id, margin = pair.split(":")
+                overrides[int(recipe_id)] = Decimal(margin)
+        if not margins or not all(valid_margin(m) for m in [*margins, *overrides.values()]):
+            raise ValueError
+    except (InvalidOperation, ValueError):
+        return Response({"error": f"Margins must be a comma separated list of numbers from {MARGIN_RANGE[0]} to "
+                                  f"{MARGIN_RANGE[1]}, overrides recipe_id:margin pairs."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # cost the whole catalog in one pass
+    matrix = CostMatrix.for_organization(request_organization(request))
+    totals = matrix.totals()
+
+    rows = []
+    for recipe_id, name, servings in matrix.recipes:
+        total_cost = round_cost(totals[recipe_id])
+        recipe_margins = [overrides[recipe_id]] if recipe_id in overrides else margins
+        rows.append({
+            "id": recipe_id,
+            "name": name,
+            "servings": servings,
+            "total_cost": total_cost,
+            "cost_per_serving": cost_per_serving(total_cost, servings),
+            "prices": [{"margin": float(m), "suggested_price": suggested_price(total_cost, m)} for m in recipe_margins],
+        })
+
+    if request.query_params.get("export") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="price-list.csv"'
+        writer = csv.writer(response)
+        writer.writerow(["id", "name", "servings", "total_cost", "cost_per_serving", "margin", "suggested_price"])
+        for row in rows:
+            for price in row["prices"]:
+                writer.writerow([row["id"], row["name"], row["servings"], row["total_cost"], row["cost_per_serving"],
+                                 price["margin"], price["suggested_price"]])
+        return response
+
+    return Response({"margins": [float(m) for m in margins], "recipes": rows})
+
+# Projected ingredient use from the bake history
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsOrganizationMember])
+def demand_forecast(request):
+    """Forecast each ingredient's use over the next `days` (default 7), from its average over the last `window` days
+    (default 28) and its weekday pattern. `shortfall` is the amount to order to get through the period."""
+    try:
+        days = int(request.query_params.get("days", 7))
+        window = int(request.query_params.get("window", 28))
+        if not 1 <= days <= 60 or not 7 <= window <= HISTORY_DAYS:
+            raise ValueError
+    except ValueError:
+        return Response({"error": f"Days must be between 1 and 60, window between 7 and {HISTORY_DAYS}."},
+                        status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({"message" : f"Successfully baked '{recipe.name}'!", "batch scale": batch_scaler}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response({"days": days, "window": window,
+                     "ingredients": forecast_demand(request_organization(request), days, window)})
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+
+class LoginBusy(Exception):
+    """Raised when every password hashing slot is taken."""
+
+
+class HashPool:
+    """Thread pool for password hashing with a bounded backlog.
+
+    PBKDF2 releases the GIL, so hashing on a few dedicated threads keeps a login
+    storm from occupying every request thread, and logins beyond the backlog are
+    turned away instead of queueing without limit.
+    """
+
+    def __init__(self, workers, backlog):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="login-hash")
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+
+    def run(self, func, *args, timeout=None):
+        # a full backlog answers at once, the timeout only bounds the hash itself
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise LoginBusy
+
+
+class SlidingWindowLimiter:
+    """Counts events per key over the last `window` seconds, in memory."""
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    # Seconds until key may try again, 0 when it is not blocked
+    def retry_after(self, key):
+        now = time.monotonic()
+        with self._lock:
+            events = self._recent(key, now)
+            if events is None or len(events) < self.limit:
+                return 0
+            return max(1, int(events[-self.limit] + self.window - now) + 1)
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            events = self._recent(key, now)
+            if events is None:
+                events = self._events[key] = deque(maxlen=self.limit)
+                # forget the least recently failing keys first
+                while len(self._events) > self.max_keys:
+                    self._events.popitem(last=False)
+            self._events.move_to_end(key)
+            events.append(now)
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._events.clear()
+            else:
+                self._events.pop(key, None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashPool(settings.LOGIN_HASH_WORKERS, settings.LOGIN_HASH_BACKLOG)
+        return _pool
+
+username_failures = SlidingWindowLimiter(settings.LOGIN_FAILURE_LIMIT, settings.LOGIN_FAILURE_WINDOW)
+ip_failures = SlidingWindowLimiter(settings.LOGIN_IP_FAILURE_LIMIT, settings.LOGIN_FAILURE_WINDOW)
+
+def check_credentials(username, password):
+    """Return the active user matching username and password, or None.
+
+    The user is loaded on the calling thread and only the password hash runs on
+    the hashing pool. Unknown usernames still pay for one hash so response time
+    does not reveal which accounts exist.
+    """
+    pool = get_hash_pool()
+    timeout = settings.LOGIN_HASH_TIMEOUT
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        pool.run(make_password, password, timeout=timeout)
+        return None
+
+    outdated = []
+    if not pool.run(check_password, password, user.password, outdated.append, timeout=timeout):
+        return None
+    if not user.is_active:
+        return None
+
+    # the hasher's settings changed since this password was stored, upgrade it
+    if outdated:
+        user.password = pool.run(make_password, password, timeout=timeout)
+        user.save(update_fields=["password"])
+    return user
+
+def get_token_key(user):
+    """Return the user's API token, creating it only on first login."""
+    key = Token.objects.filter(user=user).values_list("key", flat=True).first()
+    if key is not None:
+        return key
+    try:
+        with transaction.atomic():
+            return Token.objects.create(user=user).key
+    except IntegrityError:
+        # a concurrent login created it first
+        return Token.objects.filter(user=user).values_list("key", flat=True).get()
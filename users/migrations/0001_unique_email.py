@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# Emails are unique regardless of case. Blank emails are allowed and may repeat.
+CREATE_INDEX = (
+    "CREATE UNIQUE INDEX users_auth_user_email_ci_uniq ON auth_user (LOWER(email)) WHERE email <> ''"
+)
+DROP_INDEX = "DROP INDEX IF EXISTS users_auth_user_email_ci_uniq"
+
+
+# Accounts sharing an email (ignoring case) can't be merged automatically, stop before the index and name them
+def check_duplicate_emails(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    duplicates = (User.objects.exclude(email="").annotate(email_ci=Lower("email")).values("email_ci")
+                  .annotate(count=Count("id")).filter(count__gt=1).values_list("email_ci", flat=True))
+    conflicts = []
+    for email in duplicates.order_by("email_ci"):
+        usernames = User.objects.filter(email__iexact=email).order_by("id").values_list("username", flat=True)
+        conflicts.append(f"  {email}: {', '.join(usernames)}")
+    if conflicts:
+        raise RuntimeError("Can't make emails unique, these accounts share an email (ignoring case). Change or "
+                           "clear the email of all but one of each, then migrate again:\n" + "\n".join(conflicts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-19 14:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Every existing user gets a personal organization they own
+def create_personal_organizations(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Organization = apps.get_model("users", "Organization")
+    Membership = apps.get_model("users", "Membership")
+
+    for user in User.objects.filter(memberships__isnull=True).iterator():
+        organization = Organization.objects.create(name=user.username)
+        Membership.objects.create(organization=organization, user=user, role="owner")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_unique_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Membership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('owner', 'Owner'), ('manager', 'Manager'), ('staff', 'Staff')], default='staff', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='users.organization')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'organization'), name='users_membership_uniq')],
+            },
+        ),
+        migrations.RunPython(create_personal_organizations, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,35 @@
 from django.db import models
+from django.contrib.auth.models import User
 
-# Create your models here.
+# A bakery (or a single baker's own account), the owner of shared inventory and recipes
+class Organization(models.Model):
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+# A user's role in an organization
+class Membership(models.Model):
+    OWNER = "owner"
+    MANAGER = "manager"
+    STAFF = "staff"
+    ROLE_CHOICES = [(OWNER, "Owner"), (MANAGER, "Manager"), (STAFF, "Staff")]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="memberships")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=STAFF)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "organization"], name="users_membership_uniq"),
+        ]
+
+    # managers and owners edit the catalog and the team, staff bake and move stock
+    @property
+    def can_manage(self):
+        return self.role in (self.OWNER, self.MANAGER)
+
+    def __str__(self):
+        return f"{self.user} ({self.role}) in {self.organization}"
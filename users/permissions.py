@@ -0,0 +1,21 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .tenancy import request_membership
+
+class IsOrganizationMember(BasePermission):
+    """The user belongs to the organization the request works in."""
+    message = "You are not a member of this organization."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request_membership(request) is not None)
+
+class CanManageCatalog(IsOrganizationMember):
+    """Every member can read, only managers and owners can create, edit or delete."""
+
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        if request.method in SAFE_METHODS or request_membership(request).can_manage:
+            return True
+        self.message = "Only managers and owners can change this."
+        return False
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from .models import Membership, Organization
 
 class RegisterSerializer(serializers.ModelSerializer):
     # ensures password is only accepted in requests, but not shown in responses
@@ -8,18 +11,40 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'password']
-
-    # define how to validate email - allow only unique emails
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this email already exists.")
-        return value
+        # uniqueness of username and email is enforced by the database on insert
+        # (see users/migrations/0001_unique_email.py) instead of a query per field
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
 
     # define how to create user object
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password']
-        )
-        return user
\ No newline at end of file
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['username'],
+                    email=validated_data.get('email', ''),
+                    password=validated_data['password']
+                )
+        except IntegrityError:
+            # only look up which field clashed once the insert has failed
+            if User.objects.filter(username=validated_data['username']).exists():
+                raise serializers.ValidationError({"username": ["A user with that username already exists."]})
+            raise serializers.ValidationError({"email": ["A user with this email already exists."]})
+        return user
+
+class OrganizationSerializer(serializers.ModelSerializer):
+    # role of the requesting user, set when listing their organizations
+    role = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Organization
+        fields = ['id', 'name', 'role', 'created_at']
+        read_only_fields = ['created_at']
+
+class MembershipSerializer(serializers.ModelSerializer):
+    # members are added by username, invites are out of scope
+    username = serializers.SlugRelatedField(source='user', slug_field='username', queryset=User.objects.all())
+
+    class Meta:
+        model = Membership
+        fields = ['id', 'username', 'role', 'created_at']
+        read_only_fields = ['created_at']
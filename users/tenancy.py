@@ -0,0 +1,42 @@
+"""Which organization a request or a background job works in.
+
+Inventory and recipes belong to an organization, shared by its members. A
+request picks one with the X-Organization header (an organization id); without
+it the user's most recently joined organization is used, so a baker invited
+to a team works in the team right away. Users who belong to none get a
+personal organization on first use.
+"""
+from django.db import transaction
+
+from .models import Membership, Organization
+
+ORGANIZATION_HEADER = "HTTP_X_ORGANIZATION"
+
+def default_membership(user):
+    """The membership of the user's most recently joined organization, creating a personal one if needed."""
+    membership = (Membership.objects.filter(user=user).select_related("organization")
+                  .order_by("-created_at", "-id").first())
+    if membership is None:
+        with transaction.atomic():
+            organization = Organization.objects.create(name=user.username)
+            membership = Membership.objects.create(organization=organization, user=user, role=Membership.OWNER)
+    return membership
+
+def get_membership(user, organization_id=None):
+    """The user's membership of organization_id (their default organization when None), None if not a member."""
+    if organization_id in (None, ""):
+        return default_membership(user)
+    try:
+        organization_id = int(organization_id)
+    except (TypeError, ValueError):
+        return None
+    return Membership.objects.filter(user=user, organization_id=organization_id).select_related("organization").first()
+
+def request_membership(request):
+    """Membership for the organization a request works in, looked up once per request."""
+    if not hasattr(request, "_membership"):
+        request._membership = get_membership(request.user, request.META.get(ORGANIZATION_HEADER))
+    return request._membership
+
+def request_organization(request):
+    return request_membership(request).organization
@@ -2,12 +2,21 @@ from django.test import TestCase
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from django.conf import settings
+from inventory.models import Ingredient
+from .models import Membership, Organization
+from .auth import HashPool, LoginBusy, SlidingWindowLimiter, ip_failures, username_failures
+import threading
+import time
 
 # Create your tests here.
 class UserAuthTests(TestCase):
 
     # set up testing client
     def setUp(self):
+        username_failures.reset()
+        ip_failures.reset()
         self.client = APIClient()
         self.register_url = '/api/users/register/'
         self.login_url = '/api/users/login/'
@@ -45,4 +54,154 @@ class UserAuthTests(TestCase):
         bad_login = {"username": "testuser", "password": "wrongpass"}
         response = self.client.post(self.login_url, bad_login, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
-        self.assertIn("error", response.data)
\ No newline at end of file
+        self.assertIn("error", response.data)
+
+    def test_login_rejects_non_string_credentials(self):
+        """Test that a username or password that isn't a string is a bad request."""
+        for body in [{"username": ["testuser"], "password": "x"}, {"username": "testuser", "password": {"a": 1}}]:
+            response = self.client.post(self.login_url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_reuses_token(self):
+        """Test that logging in twice returns the same token without creating another."""
+        self.client.post(self.register_url, self.user_data, format='json')
+        login_data = {"username": "testuser", "password": "testpass123"}
+        first = self.client.post(self.login_url, login_data, format='json')
+        second = self.client.post(self.login_url, login_data, format='json')
+        self.assertEqual(first.data["token"], second.data["token"])
+        self.assertEqual(Token.objects.count(), 1)
+
+    def test_login_rate_limited_after_failures(self):
+        """Test that repeated failures for a username are rejected with 429 before checking the password."""
+        self.client.post(self.register_url, self.user_data, format='json')
+        username_failures.limit = 3
+        try:
+            bad_login = {"username": "testuser", "password": "wrongpass"}
+            for _ in range(3):
+                response = self.client.post(self.login_url, bad_login, format='json')
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            good_login = {"username": "testuser", "password": "testpass123"}
+            response = self.client.post(self.login_url, good_login, format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", response)
+            # the token endpoint older clients use is throttled too
+            response = self.client.post("/api/token/", good_login, format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            # other accounts are unaffected
+            response = self.client.post(self.login_url, {"username": "someone", "password": "x"}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        finally:
+            username_failures.limit = settings.LOGIN_FAILURE_LIMIT
+
+    def test_sliding_window_forgets_old_failures(self):
+        """Test that failures older than the window no longer count."""
+        limiter = SlidingWindowLimiter(limit=2, window=0.05)
+        limiter.hit("baker")
+        limiter.hit("baker")
+        self.assertGreater(limiter.retry_after("baker"), 0)
+        time.sleep(0.06)
+        self.assertEqual(limiter.retry_after("baker"), 0)
+
+    def test_hash_pool_rejects_when_full(self):
+        """Test that the hashing pool turns work away once its workers and backlog are taken."""
+        pool = HashPool(workers=1, backlog=0)
+        release = threading.Event()
+        blocker = threading.Thread(target=pool.run, args=(release.wait,))
+        blocker.start()
+        time.sleep(0.05)
+        # turned away at once rather than after the timeout
+        started = time.monotonic()
+        with self.assertRaises(LoginBusy):
+            pool.run(len, "x", timeout=5)
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+        blocker.join()
+        self.assertEqual(pool.run(len, "xy"), 2)
+
+    def test_register_duplicate_email_any_case(self):
+        """Test that an email can only be registered once, ignoring case."""
+        self.client.post(self.register_url, self.user_data, format='json')
+        duplicate = {"username": "other", "email": "Test@Example.com", "password": "testpass123"}
+        response = self.client.post(self.register_url, duplicate, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_register_duplicate_username(self):
+        """Test that a taken username is reported on the username field."""
+        self.client.post(self.register_url, self.user_data, format='json')
+        duplicate = {"username": "testuser", "email": "new@example.com", "password": "testpass123"}
+        response = self.client.post(self.register_url, duplicate, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("username", response.data)
+
+    def test_register_without_email(self):
+        """Test that several users may register without an email."""
+        for username in ["first", "second"]:
+            response = self.client.post(self.register_url, {"username": username, "password": "testpass123"}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+# Testing suite for organizations: shared catalogs, roles and membership management
+class OrganizationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", password="testpass")
+        self.baker = User.objects.create_user(username="baker", password="testpass")
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post('/api/users/organizations/', {"name": "Corner Bakery"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.organization = Organization.objects.get(pk=response.data["id"])
+        self.members_url = f'/api/users/organizations/{self.organization.id}/members/'
+        self.header = {"HTTP_X_ORGANIZATION": str(self.organization.id)}
+
+    def test_members_share_the_catalog(self):
+        """Test that staff see the organization's ingredients but only managers can change them."""
+        response = self.client.post(self.members_url, {"username": "baker", "role": "staff"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = {"name": "Flour", "quantity": 1000, "unit": "grams", "cost": 3.00,
+                "expiration_date": "2025-12-31", "low_stock_threshold": 200}
+        ingredient_id = self.client.post('/api/inventory/ingredients/', data, format='json', **self.header).data["id"]
+
+        self.client.force_authenticate(user=self.baker)
+        # the latest organization joined is the default one
+        names = [row["name"] for row in self.client.get('/api/inventory/ingredients/').data]
+        self.assertEqual(names, ["Flour"])
+        response = self.client.post('/api/inventory/ingredients/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # staff still move stock
+        response = self.client.post(f'/api/inventory/ingredients/{ingredient_id}/add/', {"amount": 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Ingredient.objects.get(pk=ingredient_id).quantity, 1005)
+
+    def test_other_organization_forbidden(self):
+        """Test that a header naming an organization the user doesn't belong to is refused."""
+        self.client.force_authenticate(user=self.baker)
+        response = self.client.get('/api/inventory/ingredients/', **self.header)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(self.members_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_member_roles(self):
+        """Test that managers only add staff, and the last owner can't be removed."""
+        self.client.post(self.members_url, {"username": "baker", "role": "manager"}, format='json')
+        User.objects.create_user(username="helper", password="testpass")
+
+        self.client.force_authenticate(user=self.baker)
+        response = self.client.post(self.members_url, {"username": "helper", "role": "owner"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(self.members_url, {"username": "helper"}, format='json')
+        self.assertEqual(response.data["role"], "staff")
+        response = self.client.post(self.members_url, {"username": "helper"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        owner = Membership.objects.get(organization=self.organization, user=self.owner)
+        response = self.client.delete(f"{self.members_url}{owner.id}/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.delete(f"{self.members_url}{owner.id}/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([row["username"] for row in self.client.get(self.members_url).data],
+                         ["owner", "baker", "helper"])
@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import RegisterView, LoginView
+from .views import (LoginView, OrganizationListCreateView, RegisterView, organization_member_detail,
+                    organization_members)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('organizations/', OrganizationListCreateView.as_view(), name='organization-list-create'),
+    path('organizations/<int:pk>/members/', organization_members, name='organization-members'),
+    path('organizations/<int:pk>/members/<int:member_pk>/', organization_member_detail, name='organization-member-detail'),
 ]
\ No newline at end of file
@@ -1,11 +1,14 @@
-from rest_framework import generics, status
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import generics, permissions, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.contrib.auth import authenticate
-from .serializers import RegisterSerializer
+from .auth import LoginBusy, check_credentials, get_token_key, ip_failures, username_failures
+from .models import Membership, Organization
+from .serializers import MembershipSerializer, OrganizationSerializer, RegisterSerializer
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny
-from rest_framework.authtoken.models import Token
 
 # Create your views here.
 class RegisterView(generics.CreateAPIView):
@@ -21,15 +24,93 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
-        user = authenticate(username=username, password=password)
+        client_ip = request.META.get('REMOTE_ADDR', '')
+        if not isinstance(username, (str, type(None))) or not isinstance(password, (str, type(None))):
+            return Response({"error": "Username and password must be strings."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # reject brute-force storms before spending any time hashing
+        retry_after = max(username_failures.retry_after(username), ip_failures.retry_after(client_ip))
+        if retry_after:
+            return Response({"error": "Too many failed login attempts. Try again later."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(retry_after)})
+
+        try:
+            user = check_credentials(username, password) if username and password else None
+        except LoginBusy:
+            return Response({"error": "Login service is busy. Try again shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         # return user info if user is authenticated, else return an error
         if user is not None:
-            token, _ = Token.objects.get_or_create(user=user)
+            username_failures.reset(username)
             return Response({
                 "message": "Login successful",
                 "username": user.username,
-                "token": token.key
+                "token": get_token_key(user)
             })
+        username_failures.hit(username)
+        ip_failures.hit(client_ip)
         return Response({"error": "Invalid Credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
+# List the user's organizations / create a new one owned by the user
+class OrganizationListCreateView(generics.ListCreateAPIView):
+    serializer_class = OrganizationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return (Organization.objects.filter(memberships__user=self.request.user)
+                .annotate(role=F("memberships__role")).order_by("name", "id"))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            organization = serializer.save()
+            Membership.objects.create(organization=organization, user=self.request.user, role=Membership.OWNER)
+        organization.role = Membership.OWNER
+
+# the caller's membership of pk, None if they don't belong to it
+def _own_membership(request, pk):
+    return Membership.objects.filter(organization_id=pk, user=request.user).first()
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def organization_members(request, pk):
+    """List the members of an organization, or add one by `username` and `role` (managers may only add staff)."""
+    own = _own_membership(request, pk)
+    if own is None:
+        return Response({"error": "Organization not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        members = Membership.objects.filter(organization_id=pk).select_related("user").order_by("created_at", "id")
+        return Response(MembershipSerializer(members, many=True).data)
+
+    if not own.can_manage:
+        return Response({"error": "Only managers and owners can add members."}, status=status.HTTP_403_FORBIDDEN)
+    serializer = MembershipSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    if own.role != Membership.OWNER and serializer.validated_data.get("role", Membership.STAFF) != Membership.STAFF:
+        return Response({"error": "Only owners can add managers and owners."}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        with transaction.atomic():
+            serializer.save(organization_id=pk)
+    except IntegrityError:
+        return Response({"error": "User is already a member."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+@api_view(['DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def organization_member_detail(request, pk, member_pk):
+    """Remove a member. Owners remove anyone but the last owner, managers only staff, anyone can leave."""
+    own = _own_membership(request, pk)
+    member = Membership.objects.filter(pk=member_pk, organization_id=pk).first()
+    if own is None or member is None:
+        return Response({"error": "Member not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    allowed = (member.user_id == request.user.id or own.role == Membership.OWNER
+               or (own.role == Membership.MANAGER and member.role == Membership.STAFF))
+    if not allowed:
+        return Response({"error": "You can't remove this member."}, status=status.HTTP_403_FORBIDDEN)
+    if (member.role == Membership.OWNER
+            and not Membership.objects.filter(organization_id=pk, role=Membership.OWNER).exclude(pk=member.pk).exists()):
+        return Response({"error": "An organization needs an owner."}, status=status.HTTP_400_BAD_REQUEST)
+    member.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)